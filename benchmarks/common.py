@@ -0,0 +1,158 @@
+"""
+Helpers shared by the benchmark scripts: headless QGIS start up, step timing, peak memory and JSON
+reports. Every benchmark case runs in its own Python process, so peak RSS belongs to that case only.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Info messages of child algorithms that do not start a step
+IGNORED_MESSAGES = ('GDAL command',)
+
+def peakRssBytes(children: bool = False):
+    """
+    Peak resident set size of the current process or, with children, the largest one of its finished
+    child processes (e.g. GDAL command line tools). None where the resource module is missing (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def startQgis():
+    """Starts a standalone QgsApplication with the Processing framework and this plugin's provider."""
+    from qgis.core import QgsApplication
+
+    application = QgsApplication([], False)
+    application.initQgis()
+
+    pluginsPath = os.path.join(QgsApplication.pkgDataPath(), 'python', 'plugins')
+    if pluginsPath not in sys.path:
+        sys.path.append(pluginsPath)
+
+    from processing.core.Processing import Processing
+    Processing.initialize()
+
+    if REPOSITORY_PATH not in sys.path:
+        sys.path.insert(0, REPOSITORY_PATH)
+
+    from src.algorithms.provider import Provider
+    provider = Provider()
+    QgsApplication.processingRegistry().addProvider(provider)
+    return application, provider
+
+def timingFeedback():
+    """
+    Feedback that records how long each step takes. A step starts at every info message or progress
+    text pushed by the algorithm (they mark the phases of all algorithms of this plugin) and lasts until
+    the next one. Messages of GDAL child algorithms are ignored.
+    """
+    from qgis.core import QgsProcessingFeedback
+
+    class TimingFeedback(QgsProcessingFeedback):
+
+        def __init__(self):
+            super().__init__()
+            self.start = time.perf_counter()
+            self.steps = [['start', self.start]]
+
+        def markStep(self, name: str):
+            if name.startswith(IGNORED_MESSAGES):
+                return
+            self.steps.append([name.strip().splitlines()[0][:120] if name.strip() else 'step', time.perf_counter()])
+
+        def pushInfo(self, info):
+            self.markStep(info)
+            super().pushInfo(info)
+
+        def setProgressText(self, text):
+            self.markStep(text)
+            super().setProgressText(text)
+
+        def stepTimes(self, end: float):
+            """[{'step', 'seconds'}] in the order the steps ran."""
+            boundaries = self.steps + [['end', end]]
+            return [
+                {'step': name, 'seconds': boundaries[index + 1][1] - startedAt}
+                for index, (name, startedAt) in enumerate(boundaries[:-1])
+            ]
+
+    return TimingFeedback()
+
+def runAlgorithm(algorithm: str, parameters: dict, context=None):
+    """Runs a Processing algorithm and returns (outputs, total seconds, step times)."""
+    import processing
+    from qgis.core import QgsProcessingContext, QgsProject
+
+    if context is None:
+        context = QgsProcessingContext()
+        context.setProject(QgsProject.instance())
+
+    feedback = timingFeedback()
+    started = time.perf_counter()
+    outputs = processing.run(algorithm, parameters, context=context, feedback=feedback)
+    ended = time.perf_counter()
+    return outputs, ended - started, feedback.stepTimes(ended)
+
+def runIsolated(module: str, case: dict, timeout: float, extraEnvironment: dict = None):
+    """
+    Runs one case in a new interpreter (python -m module --case <json>) and returns the JSON the case
+    printed on its last output line. Failures and timeouts are reported in the result instead of raising.
+    """
+    command = [sys.executable, '-m', module, '--case', json.dumps(case)]
+    try:
+        completed = subprocess.run(command, cwd=REPOSITORY_PATH, env={**os.environ, **(extraEnvironment or {})}, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {**case, 'status': 'timeout', 'timeoutSeconds': timeout}
+
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or len(lines) == 0:
+        return {**case, 'status': 'failed', 'returnCode': completed.returncode, 'stderr': completed.stderr[-4000:]}
+
+    return json.loads(lines[-1])
+
+def directorySize(path: str):
+    """Bytes of all files below path."""
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+        if os.path.isfile(os.path.join(directory, name))
+    )
+
+def printCaseResult(result: dict):
+    """Used by the case process to hand its result to runIsolated."""
+    sys.stdout.write('\n' + json.dumps(result) + '\n')
+    sys.stdout.flush()
+
+def environment():
+    from qgis.core import Qgis
+    import numpy as np
+
+    return {
+        'date': datetime.now(timezone.utc).isoformat(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'qgis': Qgis.version(),
+        'numpy': np.__version__
+    }
+
+def writeReport(path: str, benchmark: str, results: list):
+    report = {'benchmark': benchmark, 'environment': environment(), 'results': results}
+    with open(path, 'w') as reportFile:
+        json.dump(report, reportFile, indent=2)
+
+def parseList(text: str, kind=float):
+    return [kind(value) for value in text.split(',') if value.strip() != '']
@@ -0,0 +1,233 @@
+"""
+Raster benchmark: runs Create Shaded Relief and Aerial Perspective over synthetic fractal DEMs and
+writes stage timings, throughput, peak memory and temporary disk usage to a JSON report.
+
+Run from the repository root with the Python interpreter of a QGIS installation, e.g.
+
+    python -m benchmarks.rasterBenchmark --sizes 1000,5000 --output raster.json
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from . import common
+
+MODULE = 'benchmarks.rasterBenchmark'
+CRS_EPSG = 3857
+PIXEL_SIZE = 30
+NO_DATA = -9999
+ROWS_PER_WRITE = 512
+HURST = 0.8
+HOLES = 12
+
+ALGORITHMS = {
+    'shaded': 'webmap_utilities:shaded_relief',
+    'aerial': 'webmap_utilities:aerial_perspective'
+}
+
+def latticeValues(columns, rows, octave: int, seed: int):
+    """Pseudo random values in [-1, 1] for integer lattice points, hashed so no lattice is stored."""
+    key = np.uint64((seed * 1000003 + octave * 7919) & 0xFFFFFFFFFFFFFFFF)
+    value = (columns.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) ^ (rows.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)) ^ key
+    # splitmix64 finalizer
+    value ^= value >> np.uint64(30)
+    value *= np.uint64(0xBF58476D1CE4E5B9)
+    value ^= value >> np.uint64(27)
+    value *= np.uint64(0x94D049BB133111EB)
+    value ^= value >> np.uint64(31)
+    return (value >> np.uint64(11)).astype(np.float64) / 2.0**52 - 1
+
+def valueNoise(rows, columns, cellSize: float, octave: int, seed: int):
+    """Smoothly interpolated lattice noise with cellSize pixels between lattice points."""
+    y, x = rows / cellSize, columns / cellSize
+    y0, x0 = np.floor(y), np.floor(x)
+    ty, tx = y - y0, x - x0
+    ty, tx = (ty * ty * (3 - 2 * ty))[:, None], (tx * tx * (3 - 2 * tx))[None, :]
+    y0, x0 = y0.astype(np.int64)[:, None], x0.astype(np.int64)[None, :]
+
+    top = latticeValues(x0, y0, octave, seed) * (1 - tx) + latticeValues(x0 + 1, y0, octave, seed) * tx
+    bottom = latticeValues(x0, y0 + 1, octave, seed) * (1 - tx) + latticeValues(x0 + 1, y0 + 1, octave, seed) * tx
+    return top * (1 - ty) + bottom * ty
+
+def fbmBlock(rows, columns, size: int, seed: int):
+    """
+    Fractional Brownian motion elevations (0 - 3000 m): octaves of value noise from half the raster
+    down to 2 pixels, amplitudes following cellSize ** HURST. Any block can be generated on its own.
+    """
+    elevation = np.zeros((len(rows), len(columns)))
+    amplitudes = 0
+    cellSize, octave = size / 2, 0
+    while cellSize >= 2:
+        amplitude = (cellSize / size) ** HURST
+        elevation += amplitude * valueNoise(rows, columns, cellSize, octave, seed)
+        amplitudes += amplitude
+        cellSize, octave = cellSize / 2, octave + 1
+
+    return np.clip(1500 + 1500 * 2 * elevation / amplitudes, 0, 3000)
+
+def demPath(dataDir: str, size: int, holes: bool, seed: int):
+    return os.path.join(dataDir, f"dem_{size}_{'holes' if holes else 'full'}_{seed}.tif")
+
+def createDem(path: str, size: int, holes: bool, seed: int):
+    """Float32 tiled GeoTIFF DEM, generated in row blocks so memory does not grow with the size."""
+    from osgeo import gdal, osr
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(CRS_EPSG)
+    dataset = gdal.GetDriverByName('GTiff').Create(path, size, size, 1, gdal.GDT_Float32, ['TILED=YES', 'BIGTIFF=IF_SAFER'])
+    dataset.SetGeoTransform([0, PIXEL_SIZE, 0, size * PIXEL_SIZE, 0, -PIXEL_SIZE])
+    dataset.SetProjection(srs.ExportToWkt())
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(NO_DATA)
+
+    rng = np.random.default_rng(seed)
+    holeCenters = rng.uniform(0, size, (HOLES, 2)) if holes else np.empty((0, 2))
+    holeRadius = size / 25
+    columns = np.arange(size)
+
+    for start in range(0, size, ROWS_PER_WRITE):
+        rows = np.arange(start, min(size, start + ROWS_PER_WRITE))
+        elevation = fbmBlock(rows, columns, size, seed)
+        for centerRow, centerColumn in holeCenters:
+            inside = (rows[:, None] - centerRow) ** 2 + (columns[None, :] - centerColumn) ** 2 < holeRadius ** 2
+            elevation[inside] = NO_DATA
+
+        band.WriteArray(elevation.astype(np.float32), 0, start)
+
+    band.FlushCache()
+    dataset = None
+
+def ensureInputs(case: dict):
+    """Creates the DEM (and the hillshade the Aerial Perspective needs) unless a previous case did. Returns (demPath, hillshadePath, seconds)."""
+    from osgeo import gdal
+
+    started = time.perf_counter()
+    os.makedirs(case['dataDir'], exist_ok=True)
+    dem = demPath(case['dataDir'], case['size'], case['holes'], case['seed'])
+    if not os.path.exists(dem):
+        createDem(dem, case['size'], case['holes'], case['seed'])
+
+    hillshade = None
+    if case['algorithm'] == 'aerial':
+        hillshade = dem.replace('.tif', '_hillshade.tif')
+        if not os.path.exists(hillshade):
+            gdal.DEMProcessing(hillshade, dem, 'hillshade', creationOptions=['TILED=YES', 'BIGTIFF=IF_SAFER'])
+
+    return dem, hillshade, time.perf_counter() - started
+
+def algorithmParameters(case: dict, dem: str, hillshade: str, outputDir: str):
+    if case['algorithm'] == 'aerial':
+        return {
+            'DEM': dem,
+            'HILLSHADE': hillshade,
+            'AerialPerspective': os.path.join(outputDir, 'aerial_perspective.tif'),
+            'ENGINE': case['engine'],
+            'LOOKUP_TABLE': case['lookupTable']
+        }
+
+    # Light sources spread evenly over 315 - 360 and 0 - 45, one source giving the defaults (337.5 and 22.5)
+    spread = 45 / case['lightSources']
+    bottom = [315 + spread * (index + 0.5) for index in range(case['lightSources'])]
+    top = [spread * (index + 0.5) for index in range(case['lightSources'])]
+    return {
+        'DEM': dem,
+        'AP_INTENSITY': 60,
+        'BOTTOM_LIGHT_SOURCES': ','.join(str(azimuth) for azimuth in bottom),
+        'TOP_LIGHT_SOURCES': ','.join(str(azimuth) for azimuth in top),
+        'HILLSHADE_LAYER_BOTTOM': os.path.join(outputDir, 'hillshade_bottom.tif'),
+        'HILLSHADE_LAYER_TOP': os.path.join(outputDir, 'hillshade_top.tif'),
+        'ENGINE': case['engine'],
+        'LOOKUP_TABLE': case['lookupTable']
+    }
+
+def runCase(case: dict):
+    application, _ = common.startQgis()
+    dem, hillshade, generateSeconds = ensureInputs(case)
+
+    # The parent process points TMPDIR to an empty folder, which receives every temporary raster
+    temporaryDir = tempfile.gettempdir()
+    temporaryBytesBefore = common.directorySize(temporaryDir)
+    outputDir = tempfile.mkdtemp(prefix='output_', dir=case['workDir'])
+
+    parameters = algorithmParameters(case, dem, hillshade, outputDir)
+    _, seconds, steps = common.runAlgorithm(ALGORITHMS[case['algorithm']], parameters)
+
+    # Float32 DEM and Byte hillshade
+    inputBytes = case['size'] * case['size'] * (4 + (1 if hillshade else 0))
+    common.printCaseResult({
+        **case,
+        'status': 'ok',
+        'generateSeconds': generateSeconds,
+        'seconds': seconds,
+        'inputBytes': inputBytes,
+        'megabytesPerSecond': inputBytes / 1e6 / seconds if seconds > 0 else None,
+        'steps': steps,
+        'peakRssBytes': common.peakRssBytes(),
+        'peakChildrenRssBytes': common.peakRssBytes(children=True),
+        'temporaryBytesWritten': common.directorySize(temporaryDir) - temporaryBytesBefore,
+        'outputBytes': common.directorySize(outputDir)
+    })
+    application.exitQgis()
+
+def cases(arguments):
+    for size, holes, algorithm, engine, lookupTable in itertools.product(arguments.sizes, arguments.holes, arguments.algorithms, arguments.engines, arguments.lookup_table):
+        # Only the NumPy engines have the lookup table mode
+        if engine == 1 and lookupTable:
+            continue
+
+        lightSources = arguments.light_sources if algorithm == 'shaded' else [1]
+        for nLightSources in lightSources:
+            # The legacy Shaded Relief engine uses a single light source per hillshade
+            if engine == 1 and nLightSources > 1:
+                continue
+
+            yield {
+                'algorithm': algorithm,
+                'engine': engine,
+                'size': size,
+                'holes': holes,
+                'lightSources': nLightSources,
+                'lookupTable': lookupTable,
+                'seed': arguments.seed,
+                'dataDir': os.path.abspath(arguments.data_dir)
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the raster algorithms of Webmap Utilities on synthetic DEMs.')
+    parser.add_argument('--sizes', type=lambda text: common.parseList(text, int), default=[1000, 5000, 10000, 20000], help='DEM width and height, in pixels')
+    parser.add_argument('--holes', type=lambda text: [value.strip() in ('1', 'true', 'yes') for value in text.split(',')], default=[False, True], help='With (1) and/or without (0) nodata holes')
+    parser.add_argument('--algorithms', type=lambda text: common.parseList(text, str), default=list(ALGORITHMS))
+    parser.add_argument('--engines', type=lambda text: common.parseList(text, int), default=[0, 1], help='0: NumPy engines, 1: legacy GDAL chains')
+    parser.add_argument('--lookup-table', type=lambda text: [value.strip() in ('1', 'true', 'yes') for value in text.split(',')], default=[False], help='Without (0) and/or with (1) the contrast lookup table')
+    parser.add_argument('--light-sources', type=lambda text: common.parseList(text, int), default=[1], help='Light sources per Shaded Relief hillshade')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'webmap_utilities_benchmark'), help='Where generated DEMs are kept between runs')
+    parser.add_argument('--timeout', type=float, default=7200, help='Seconds allowed for each case')
+    parser.add_argument('--output', default='raster_benchmark.json')
+    parser.add_argument('--case', help='Runs a single case given as JSON (used internally)')
+    arguments = parser.parse_args()
+
+    if arguments.case:
+        runCase(json.loads(arguments.case))
+        return
+
+    results = []
+    for case in cases(arguments):
+        workDir = tempfile.mkdtemp(prefix='webmap_utilities_case_')
+        try:
+            result = common.runIsolated(MODULE, {**case, 'workDir': workDir}, arguments.timeout, {'TMPDIR': workDir, 'TEMP': workDir, 'TMP': workDir})
+        finally:
+            shutil.rmtree(workDir, ignore_errors=True)
+
+        print(f"{case['algorithm']:7} engine={case['engine']} size={case['size']:<6} holes={case['holes']!s:5} lights={case['lightSources']} lut={case['lookupTable']!s:5}: "
+              f"{result['status']} {result.get('seconds', 0):.2f}s")
+        results.append(result)
+        # Partial results survive an interrupted session
+        common.writeReport(arguments.output, 'raster', results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Vector benchmark: runs clusterization_by_distance, Clustered Visualization and Grid Visualization over
+synthetic point layers and writes wall time per step, peak RSS and throughput to a JSON report.
+
+Run from the repository root with the Python interpreter of a QGIS installation, e.g.
+
+    python -m benchmarks.vectorBenchmark --sizes 1000,100000,1000000 --output vector.json
+"""
+import argparse
+import json
+import itertools
+import time
+import numpy as np
+from . import common
+
+MODULE = 'benchmarks.vectorBenchmark'
+EXTENT_SIZE = 2000000
+CRS = 'EPSG:3857'
+FEATURES_PER_BATCH = 100000
+
+ALGORITHMS = {
+    'distance': 'webmap_utilities:clusterization_by_distance',
+    'clustered': 'webmap_utilities:Clustered Visualization',
+    'grid': 'webmap_utilities:Grid Visualization',
+    'spacing': 'webmap_utilities:Spacing Visualization'
+}
+
+def generatePoints(distribution: str, count: int, rng):
+    """Coordinates of count points inside a EXTENT_SIZE square."""
+    if distribution == 'uniform':
+        x, y = rng.uniform(0, EXTENT_SIZE, (2, count))
+    elif distribution == 'blobs':
+        # Gaussian blobs with heavy tailed sizes, like settlements
+        nBlobs = min(500, max(1, count // 2000))
+        centers = rng.uniform(0.1 * EXTENT_SIZE, 0.9 * EXTENT_SIZE, (nBlobs, 2))
+        weights = 1 / np.arange(1, nBlobs + 1)
+        blob = rng.choice(nBlobs, count, p=weights / weights.sum())
+        sigma = rng.uniform(EXTENT_SIZE / 400, EXTENT_SIZE / 40, nBlobs)[blob]
+        x = centers[blob, 0] + rng.normal(0, 1, count) * sigma
+        y = centers[blob, 1] + rng.normal(0, 1, count) * sigma
+    elif distribution == 'lines':
+        # Points along random walk polylines with a little jitter, like addresses along roads
+        nLines, nVertices = min(2000, max(1, count // 500)), 20
+        starts = rng.uniform(0, EXTENT_SIZE, (nLines, 1, 2))
+        steps = rng.normal(0, EXTENT_SIZE / 100, (nLines, nVertices, 2))
+        vertices = np.concatenate([starts, starts + np.cumsum(steps, axis=1)], axis=1)
+        line = rng.integers(0, nLines, count)
+        position = rng.uniform(0, nVertices, count)
+        segment = position.astype(np.int64)
+        fraction = (position - segment)[:, None]
+        points = vertices[line, segment] * (1 - fraction) + vertices[line, segment + 1] * fraction
+        points += rng.normal(0, 25, points.shape)
+        x, y = points[:, 0], points[:, 1]
+    else:
+        raise ValueError(f'Unknown distribution {distribution}')
+
+    return np.clip(x, 0, EXTENT_SIZE), np.clip(y, 0, EXTENT_SIZE)
+
+def createLayer(distribution: str, count: int, seed: int):
+    """
+    Memory point layer with an id, a lognormal population attribute and a gradient attribute growing from
+    west to east, a priority correlated with position.
+    """
+    from qgis.core import QgsVectorLayer, QgsFeature, QgsGeometry, QgsPointXY
+
+    rng = np.random.default_rng(seed)
+    x, y = generatePoints(distribution, count, rng)
+    population = np.rint(rng.lognormal(8, 1.5, count))
+
+    layer = QgsVectorLayer(f'Point?crs={CRS}&field=id:integer&field=population:double&field=gradient:double', f'{distribution}_{count}', 'memory')
+    fields = layer.fields()
+    for start in range(0, count, FEATURES_PER_BATCH):
+        batch = []
+        for index in range(start, min(count, start + FEATURES_PER_BATCH)):
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x[index], y[index])))
+            feature.setAttributes([index, population[index].item(), x[index].item()])
+            batch.append(feature)
+
+        layer.dataProvider().addFeatures(batch)
+
+    layer.updateExtents()
+    return layer
+
+def algorithmParameters(case: dict, layer):
+    if case['algorithm'] == 'distance':
+        return {
+            'VECTOR_LAYER': layer,
+            'DISTANCE_BETWEEN_CLUSTER_MEMBERS_METERS': case['distance'],
+            'ENGINE': case['engine'],
+            'OUTPUT': 'TEMPORARY_OUTPUT'
+        }
+
+    if case['algorithm'] == 'clustered':
+        return {
+            'VECTOR_LAYER': layer,
+            'ELECTION_ATTRIBUTE': 'population',
+            'INITIAL_MAX_CLUSTER_MEMBER_DISTANCE': case['distance'],
+            'NUMBER_OF_ZOOM_LEVELS': case['zooms'],
+            'ENGINE': case['engine'],
+            'OUTPUT': 'TEMPORARY_OUTPUT'
+        }
+
+    if case['algorithm'] == 'spacing':
+        return {
+            'VECTOR_LAYER': layer,
+            'PRIORITY_ATTRIBUTE': case['priority'],
+            'INITIAL_SPACING': case['distance'],
+            'NUMBER_OF_ZOOM_LEVELS': case['zooms'],
+            'OUTPUT': 'TEMPORARY_OUTPUT'
+        }
+
+    extent = layer.extent()
+    return {
+        'VECTOR_LAYER': layer,
+        'ID_ATTRIBUTE': 'id',
+        'EXTENT': f'{extent.xMinimum()},{extent.xMaximum()},{extent.yMinimum()},{extent.yMaximum()} [{CRS}]',
+        'GRID_SQUARE_LENGTH_METERS': case['distance'],
+        'NUMBER_OF_ZOOMS': case['zooms'],
+        'ENGINE': case['engine'],
+        'OUTPUT': 'TEMPORARY_OUTPUT'
+    }
+
+def runCase(case: dict):
+    from qgis.core import QgsProject, QgsCoordinateReferenceSystem
+
+    application, _ = common.startQgis()
+    # The grid is laid out in the project CRS
+    QgsProject.instance().setCrs(QgsCoordinateReferenceSystem(CRS))
+
+    started = time.perf_counter()
+    layer = createLayer(case['distribution'], case['features'], case['seed'])
+    generateSeconds = time.perf_counter() - started
+    rssBeforeRun = common.peakRssBytes()
+
+    _, seconds, steps = common.runAlgorithm(ALGORITHMS[case['algorithm']], algorithmParameters(case, layer))
+
+    common.printCaseResult({
+        **case,
+        'status': 'ok',
+        'generateSeconds': generateSeconds,
+        'seconds': seconds,
+        'featuresPerSecond': case['features'] / seconds if seconds > 0 else None,
+        'steps': steps,
+        'peakRssBytesBeforeRun': rssBeforeRun,
+        'peakRssBytes': common.peakRssBytes()
+    })
+    application.exitQgis()
+
+def cases(arguments):
+    for features, distribution, algorithm, engine in itertools.product(arguments.sizes, arguments.distributions, arguments.algorithms, arguments.engines):
+        # Legacy engines run one or more Processing chains per zoom, which is impractical on big layers
+        if engine == 1 and features > arguments.legacy_max_features:
+            continue
+        # The spacing algorithm has a single engine
+        if algorithm == 'spacing' and engine != 0:
+            continue
+
+        zoomCounts = [None] if algorithm == 'distance' else arguments.zooms
+        priorities = arguments.priorities if algorithm == 'spacing' else [None]
+        for zooms, distance, priority in itertools.product(zoomCounts, arguments.distances, priorities):
+            yield {
+                'distribution': distribution,
+                'features': features,
+                'algorithm': algorithm,
+                'engine': engine,
+                'zooms': zooms,
+                'distance': distance,
+                'priority': priority,
+                'seed': arguments.seed
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the vector algorithms of Webmap Utilities on synthetic point layers.')
+    parser.add_argument('--sizes', type=lambda text: common.parseList(text, int), default=[1000, 10000, 100000, 1000000, 10000000])
+    parser.add_argument('--distributions', type=lambda text: common.parseList(text, str), default=['uniform', 'blobs', 'lines'])
+    parser.add_argument('--algorithms', type=lambda text: common.parseList(text, str), default=list(ALGORITHMS))
+    parser.add_argument('--engines', type=lambda text: common.parseList(text, int), default=[0, 1], help='0: in-memory engines, 1: legacy Processing chains')
+    parser.add_argument('--zooms', type=lambda text: common.parseList(text, int), default=[3, 6])
+    parser.add_argument('--distances', type=common.parseList, default=[20000, 5000], help='Distances and grid square lengths, in meters')
+    parser.add_argument('--priorities', type=lambda text: common.parseList(text, str), default=['population', 'gradient'], help='Priority attributes of the spacing algorithm')
+    parser.add_argument('--legacy-max-features', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=3600, help='Seconds allowed for each case')
+    parser.add_argument('--output', default='vector_benchmark.json')
+    parser.add_argument('--case', help='Runs a single case given as JSON (used internally)')
+    arguments = parser.parse_args()
+
+    if arguments.case:
+        runCase(json.loads(arguments.case))
+        return
+
+    results = []
+    for case in cases(arguments):
+        result = common.runIsolated(MODULE, case, arguments.timeout)
+        print(f"{case['algorithm']:10} engine={case['engine']} {case['distribution']:8} n={case['features']:<9} zooms={case['zooms']} distance={case['distance']} priority={case['priority']}: "
+              f"{result['status']} {result.get('seconds', 0):.2f}s")
+        results.append(result)
+        # Partial results survive an interrupted session
+        common.writeReport(arguments.output, 'vector', results)
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,14 @@ from qgis.core import QgsProcessingMultiStepFeedback
 from qgis.core import QgsProcessingParameterVectorLayer
 from qgis.core import QgsProcessingParameterFeatureSink
 from qgis.core import QgsProcessingParameterNumber, QgsProcessingParameterString
+from qgis.core import QgsProcessingParameterEnum
+from qgis.core import QgsProcessingUtils, QgsField, QgsFields, NULL
+from qgis.PyQt.QtCore import QVariant
+from ..engines.distanceClustering import clusterByDistance
+from ..utils.featureStore import PointFeatureStore
+
+ENGINE_IN_MEMORY = 0
+ENGINE_PROCESSING_CHAIN = 1
 
 class CreateClusterizationByDistance(QgsProcessingAlgorithm):
     
@@ -21,8 +29,66 @@ class CreateClusterizationByDistance(QgsProcessingAlgorithm):
         self.addParameter(QgsProcessingParameterString('ID_FIELD_NAME', 'Name for cluster id attribute', multiLine=False, defaultValue='CLUSTER_ID'))
         self.addParameter(QgsProcessingParameterString('SIZE_FIELD_NAME', 'Name for cluster size attribute', multiLine=False, defaultValue='CLUSTER_SIZE'))
         self.addParameter(QgsProcessingParameterFeatureSink('OUTPUT', 'Clusterized', type=QgsProcessing.TypeVectorAnyGeometry, createByDefault=True, supportsAppend=True, defaultValue=None))
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'ENGINE',
+                'Engine',
+                options=['In-memory (single pass)', 'Processing chain (legacy)'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=ENGINE_IN_MEMORY
+            )
+        )
 
     def processAlgorithm(self, parameters, context, model_feedback):
+        if self.parameterAsEnum(parameters, 'ENGINE', context) == ENGINE_PROCESSING_CHAIN:
+            return self.processWithProcessingChain(parameters, context, model_feedback)
+
+        return self.processInMemory(parameters, context, model_feedback)
+
+    def processInMemory(self, parameters, context, model_feedback):
+        feedback = QgsProcessingMultiStepFeedback(3, model_feedback)
+        layer = self.parameterAsVectorLayer(parameters, 'VECTOR_LAYER', context)
+        distance = self.parameterAsDouble(parameters, 'DISTANCE_BETWEEN_CLUSTER_MEMBERS_METERS', context)
+        idAttributeName = self.parameterAsString(parameters, 'ID_FIELD_NAME', context)
+        clusterSizeAttribute = self.parameterAsString(parameters, 'SIZE_FIELD_NAME', context)
+
+        feedback.pushInfo('Reading point coordinates...')
+        store = PointFeatureStore.fromLayer(layer, feedback=feedback)
+        if store is None:
+            return {}
+
+        feedback.setCurrentStep(1)
+
+        # The legacy chain buffers every point by the given distance and dissolves overlapping buffers,
+        # so two points are linked when they are up to twice that distance apart.
+        feedback.pushInfo('Grouping points... Link distance = {}'.format(2 * distance))
+        clusters = clusterByDistance(store.x, store.y, 2 * distance, feedback)
+        if clusters is None:
+            return {}
+
+        labels, sizes = clusters
+
+        feedback.setCurrentStep(2)
+        feedback.pushInfo('Writing {} and {}...'.format(idAttributeName, clusterSizeAttribute))
+
+        newFields = QgsFields()
+        newFields.append(QgsField(idAttributeName, QVariant.Int))
+        newFields.append(QgsField(clusterSizeAttribute, QVariant.Int))
+        fields = QgsProcessingUtils.combineFields(layer.fields(), newFields)
+
+        (sink, destId) = self.parameterAsSink(parameters, 'OUTPUT', context, fields, layer.wkbType(), layer.crs())
+
+        values = {
+            fields.count() - 2: (labels + 1, NULL),
+            fields.count() - 1: (sizes, NULL)
+        }
+        if not store.writeFeatures(layer, sink, fields.count(), values, feedback):
+            return {}
+
+        return {'OUTPUT': destId}
+
+    def processWithProcessingChain(self, parameters, context, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
         # overall progress through the model
         feedback = QgsProcessingMultiStepFeedback(8, model_feedback)
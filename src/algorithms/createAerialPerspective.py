@@ -11,7 +11,16 @@ from qgis.core import QgsProcessingMultiStepFeedback
 from qgis.core import QgsProcessingParameterNumber
 from qgis.core import QgsProcessingParameterRasterLayer
 from qgis.core import QgsProcessingParameterRasterDestination
+from qgis.core import QgsProcessingParameterEnum
+from qgis.core import QgsProcessingParameterBoolean
 import processing
+from ..engines.rasterIO import rasterPath
+from ..engines.aerialPerspective import runAerialPerspective
+from ..engines.overviews import layerOverviewFactors
+from ..utils.rasterStatistics import STATISTICS_EXACT, STATISTICS_APPROXIMATE, layerMinMax
+
+ENGINE_NUMPY = 0
+ENGINE_PROCESSING_CHAIN = 1
 
 class CreateAerialPerspective(QgsProcessingAlgorithm):
 
@@ -21,8 +30,58 @@ class CreateAerialPerspective(QgsProcessingAlgorithm):
         self.addParameter(QgsProcessingParameterNumber('CONTRAST_MIN', 'Minimum constrast', type=QgsProcessingParameterNumber.Integer, minValue=-255, maxValue=255, defaultValue=-20))
         self.addParameter(QgsProcessingParameterNumber('CONTRAST_MAX', 'Maximum constrast', type=QgsProcessingParameterNumber.Integer, minValue=-255, maxValue=255, defaultValue=50))
         self.addParameter(QgsProcessingParameterRasterDestination('AerialPerspective', 'Aerial Perspective', createByDefault=True, defaultValue=None))
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'ENGINE',
+                'Engine',
+                options=['In-process blocks (NumPy)', 'GDAL raster calculator chain (legacy)'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=ENGINE_NUMPY
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'STATISTICS',
+                'DEM statistics',
+                options=['Exact (reads the whole DEM)', 'Approximate (overviews or a sample)'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=STATISTICS_EXACT
+            )
+        )
+        self.addParameter(QgsProcessingParameterBoolean('TILED_OUTPUT', 'Tiled output with overviews', defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean('LOOKUP_TABLE', 'Contrast lookup table (approximate)', defaultValue=False))
 
     def processAlgorithm(self, parameters, context, model_feedback):
+        if self.parameterAsEnum(parameters, 'ENGINE', context) == ENGINE_PROCESSING_CHAIN:
+            return self.processWithProcessingChain(parameters, context, model_feedback)
+
+        return self.processInProcess(parameters, context, model_feedback)
+
+    def processInProcess(self, parameters, context, feedback):
+        demLayer = self.parameterAsRasterLayer(parameters, 'DEM', context)
+        demPath = rasterPath(demLayer)
+        hillshadePath = rasterPath(self.parameterAsRasterLayer(parameters, 'HILLSHADE', context))
+        outputPath = self.parameterAsOutputLayer(parameters, 'AerialPerspective', context)
+
+        completed = runAerialPerspective(
+            demPath,
+            hillshadePath,
+            outputPath,
+            self.parameterAsInt(parameters, 'CONTRAST_MIN', context),
+            self.parameterAsInt(parameters, 'CONTRAST_MAX', context),
+            feedback,
+            overviews=layerOverviewFactors(demLayer, context.project()) if self.parameterAsBoolean(parameters, 'TILED_OUTPUT', context) else None,
+            lookupTable=self.parameterAsBoolean(parameters, 'LOOKUP_TABLE', context),
+            exactStatistics=self.parameterAsEnum(parameters, 'STATISTICS', context) != STATISTICS_APPROXIMATE
+        )
+        if not completed:
+            return {}
+
+        return {'OUTPUT': outputPath}
+
+    def processWithProcessingChain(self, parameters, context, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
         # overall progress through the model
         feedback = QgsProcessingMultiStepFeedback(5, model_feedback)
@@ -30,17 +89,18 @@ class CreateAerialPerspective(QgsProcessingAlgorithm):
         outputs = {}
 
         # DEM Stats
-        alg_params = {
-            'BAND': 1,
-            'INPUT': parameters['DEM']
-        }
-        outputs['DemStats'] = processing.run('native:rasterlayerstatistics', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
+        feedback.pushInfo('Computing DEM statistics...')
+        demMin, demMax = layerMinMax(
+            self.parameterAsRasterLayer(parameters, 'DEM', context),
+            self.parameterAsEnum(parameters, 'STATISTICS', context) != STATISTICS_APPROXIMATE
+        )
 
         feedback.setCurrentStep(1)
         if feedback.isCanceled():
             return {}
 
         # Translate (convert format)
+        feedback.pushInfo('Converting hillshade to Float32...')
         alg_params = {
             'COPY_SUBDATASETS': False,
             'DATA_TYPE': 6,  # Float32
@@ -57,9 +117,6 @@ class CreateAerialPerspective(QgsProcessingAlgorithm):
         if feedback.isCanceled():
             return {}
 
-        demMin = outputs['DemStats']['MIN']
-        demMax = outputs['DemStats']['MAX']
-        
         contrastMin = parameters['CONTRAST_MIN']
         contrastMax = parameters['CONTRAST_MAX']
         contrast = f'({contrastMax} - {contrastMin})*((A - {demMin}) / ({demMax} - {demMin})) + {contrastMin}'
@@ -69,6 +126,7 @@ class CreateAerialPerspective(QgsProcessingAlgorithm):
         feedback.pushInfo(apDenorm)
         
         # AP Denorm
+        feedback.pushInfo('Denormalizing...')
         alg_params = {
             'BAND_A': 1,
             'BAND_B': None,
@@ -96,6 +154,7 @@ class CreateAerialPerspective(QgsProcessingAlgorithm):
             return {}
 
         # Ap Denorm Stats
+        feedback.pushInfo('Computing denormalized statistics...')
         alg_params = {
             'BAND': 1,
             'INPUT': outputs['ApDenorm']['OUTPUT']
@@ -112,6 +171,7 @@ class CreateAerialPerspective(QgsProcessingAlgorithm):
         apNorm = f'255*((A - {apDenormMin}) / ({apDenormMax} - {apDenormMin}))'
 
         # Raster calculator
+        feedback.pushInfo('Normalizing...')
         alg_params = {
             'BAND_A': 1,
             'BAND_B': None,
@@ -163,6 +223,14 @@ class CreateAerialPerspective(QgsProcessingAlgorithm):
         Contrast applied in the lower regions.
         <h3>Maximum constrast</h3>
         Contrast applied in the higher regions.
+        <h3>DEM statistics</h3>
+        Minimum and maximum elevations of the DEM. <b>Exact</b> reads every pixel. <b>Approximate</b> reads about a million pixels, from an overview of the DEM when it has one, which is much faster on large DEMs but may miss the most extreme elevations. Both engines use it and results are reused by later runs on the same, unmodified DEM.
+        <h3>Engine</h3>
+        In-process blocks reads DEM and hillshade together and writes the result directly, without intermediate files. The legacy engine chains GDAL translate and raster calculator runs.
+        <h3>Tiled output with overviews</h3>
+        Writes GeoTIFF outputs with internal 512 px tiles, ZSTD (or DEFLATE) compression and overviews matching the project scales, built while the output is written, so the layer renders fast at every zoom level. Only used by the in-process blocks engine.
+        <h3>Contrast lookup table</h3>
+        Quantizes elevations to 4096 levels and rounds the hillshade, so every output pixel is read from a precomputed table instead of evaluating the contrast curve. Faster, with pixels differing from the exact curve by at most one gray level. Only used by the in-process blocks engine.
         <br />
         Visit <a href="https://github.com/guialexsdev/webmap-utilities">https://github.com/guialexsdev/webmap-utilities</a> to learn more!
         """
\ No newline at end of file
@@ -16,10 +16,21 @@ from qgis.core import QgsProcessingParameterEnum
 from qgis.core import QgsProcessingParameterString
 from qgis.core import QgsProcessingParameterBoolean
 from qgis.core import QgsField, edit, QgsFeatureRequest, QgsVectorLayer, QgsExpressionContext, QgsExpressionContextUtils
+from qgis.core import QgsFields, NULL
 from qgis.PyQt.QtCore import QVariant
 
 import processing
+import numpy as np
 from .afterProcessingLayerRenamer import AfterProcessingLayerRenamer
+from ..engines.clusterHierarchy import ClusterHierarchy
+from ..engines.election import electGroupMembers
+from ..utils.bulkWriter import BulkAttributeWriter
+from ..utils.featureStore import PointFeatureStore, toReal
+from ..utils.geoPackage import geoPackageLayer, visibilityOrder, indexGeoPackageLayer
+from ..utils.checkpoint import Checkpoint
+
+ENGINE_CLUSTER_HIERARCHY = 0
+ENGINE_CLUSTERIZATION_PER_ZOOM = 1
 
 class CreateClusteredVisualization(QgsProcessingAlgorithm):
     def initAlgorithm(self, config=None):
@@ -42,8 +53,95 @@ class CreateClusteredVisualization(QgsProcessingAlgorithm):
         self.addParameter(QgsProcessingParameterBoolean('ISOLATED_FEATURES_ALWAYS_VISIBLE', 'Always show isolated features', defaultValue=False))
         self.addParameter(QgsProcessingParameterString('NEW_ATTRIBUTE_NAME', 'Attribute name (that controls visibility)', multiLine=False, defaultValue='_visibility_offset'))
         self.addParameter(QgsProcessingParameterFeatureSink('OUTPUT', 'Clustered View', type=QgsProcessing.TypeVectorPoint, createByDefault=True, defaultValue=None))
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'ENGINE',
+                'Engine',
+                options=['Cluster hierarchy (single pass)', 'Clusterization per zoom level (legacy)'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=ENGINE_CLUSTER_HIERARCHY
+            )
+        )
+        self.addParameter(QgsProcessingParameterBoolean('OPTIMIZE_GEOPACKAGE', 'Sort and index GeoPackage output', defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean('CHECKPOINTS', 'Save progress after each zoom level and resume interrupted runs', defaultValue=True))
 
     def processAlgorithm(self, parameters, context, model_feedback):
+        if self.parameterAsEnum(parameters, 'ENGINE', context) == ENGINE_CLUSTERIZATION_PER_ZOOM:
+            return self.processPerZoomLevel(parameters, context, model_feedback)
+
+        return self.processWithHierarchy(parameters, context, model_feedback)
+
+    def processWithHierarchy(self, parameters, context, model_feedback):
+        feedback = QgsProcessingMultiStepFeedback(3, model_feedback)
+        layer = self.parameterAsVectorLayer(parameters, 'VECTOR_LAYER', context)
+        electionAttribute = self.parameterAsString(parameters, 'ELECTION_ATTRIBUTE', context)
+        visibilityAttribute = self.parameterAsString(parameters, 'NEW_ATTRIBUTE_NAME', context)
+        nZooms = self.parameterAsInt(parameters, 'NUMBER_OF_ZOOM_LEVELS', context)
+        initialDistance = self.parameterAsDouble(parameters, 'INITIAL_MAX_CLUSTER_MEMBER_DISTANCE', context)
+        showAllAtLastLevel = self.parameterAsBool(parameters, 'SHOW_ALL_AT_LAST_ZOOM_LEVEL', context)
+
+        feedback.pushInfo('Reading points and election attribute...')
+        store = PointFeatureStore.fromLayer(layer, [electionAttribute], feedback=feedback)
+        if store is None:
+            return {}
+
+        feedback.setCurrentStep(1)
+        feedback.pushInfo('Building cluster hierarchy...')
+
+        # Same distances as the per zoom level clusterization: halved at each zoom, and doubled because
+        # buffers of that size overlap when points are up to twice the distance apart.
+        linkDistances = [2 * initialDistance / 2**nZoom for nZoom in range(nZooms)]
+        checkpoint = None
+        if self.parameterAsBool(parameters, 'CHECKPOINTS', context):
+            checkpoint = Checkpoint.forRun('clustered_visualization', store.fids, store.x, store.y, {'linkDistances': linkDistances})
+
+        hierarchy = ClusterHierarchy.build(store.x, store.y, linkDistances, feedback, checkpoint)
+        if hierarchy is None:
+            return {}
+
+        offsets = hierarchy.visibilityOffsets(
+            store.column(electionAttribute),
+            electMax=self.parameterAsEnum(parameters, 'ELECTION_METHOD', context) == 0,
+            isolatedAlwaysVisible=self.parameterAsBool(parameters, 'ISOLATED_FEATURES_ALWAYS_VISIBLE', context),
+            showAllAtLastLevel=showAllAtLastLevel
+        )
+
+        feedback.setCurrentStep(2)
+        feedback.pushInfo('Writing {}...'.format(visibilityAttribute))
+
+        fields = QgsFields(layer.fields())
+        visibilityIdx = fields.indexFromName(visibilityAttribute)
+        if visibilityIdx == -1:
+            fields.append(QgsField(visibilityAttribute, QVariant.Int))
+            visibilityIdx = fields.count() - 1
+
+        (sink, destId) = self.parameterAsSink(parameters, 'OUTPUT', context, fields, layer.wkbType(), layer.crs())
+
+        remainingOffset = nZooms - 1 if showAllAtLastLevel else nZooms
+        outputGeoPackage = geoPackageLayer(destId) if self.parameterAsBool(parameters, 'OPTIMIZE_GEOPACKAGE', context) else None
+        order = visibilityOrder(offsets, store.x, store.y) if outputGeoPackage is not None else None
+        if not store.writeFeatures(layer, sink, fields.count(), {visibilityIdx: (offsets, remainingOffset)}, feedback, order):
+            return {}
+
+        if outputGeoPackage is not None:
+            # The GeoPackage must be closed before creating its indexes
+            sink.flushBuffer()
+            del sink
+            indexGeoPackageLayer(*outputGeoPackage, visibilityAttribute, feedback)
+
+        if checkpoint is not None:
+            checkpoint.delete()
+
+        results = {'OUTPUT': destId}
+
+        global renamer
+        renamer = AfterProcessingLayerRenamer('Clustered View')
+        context.layerToLoadOnCompletionDetails(results['OUTPUT']).setPostProcessor(renamer)
+
+        return results
+
+    def processPerZoomLevel(self, parameters, context, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
         # overall progress through the model
         nSteps = parameters['NUMBER_OF_ZOOM_LEVELS'] * 2
@@ -113,28 +211,41 @@ class CreateClusteredVisualization(QgsProcessingAlgorithm):
         reqContext.appendScopes(QgsExpressionContextUtils.globalProjectLayerScopes(layer))
         request.setExpressionContext(reqContext)
         request.setFilterExpression(f'"_cluster_size{currentZoom}" < 2 and "{visibilityAttribute}" IS NULL')
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        visibilityIdx = layer.fields().indexFromName(visibilityAttribute)
 
-        with edit(layer):
-            for feature in layer.getFeatures(request):
-                feature[visibilityAttribute] = currentZoom
-                layer.updateFeature(feature)
+        # Ids are collected before writing so the provider is not changed under an open iterator
+        fids = [feature.id() for feature in layer.getFeatures(request)]
+        with BulkAttributeWriter(layer) as writer:
+            for fid in fids:
+                writer.setValue(fid, visibilityIdx, currentZoom)
 
     def showClusteredFeaturesByAttribute(self, currentZoom: int, layer: QgsVectorLayer, parameters):
         electionAttribute = parameters['ELECTION_ATTRIBUTE']
         visibilityAttribute = parameters['NEW_ATTRIBUTE_NAME']
-        orderBy = 'True' if parameters['ELECTION_METHOD'] == 1 else 'False'
-        query = f'array_contains(array_slice(array_sort(array_agg(to_real("{electionAttribute}"), group_by:="_cluster_id{currentZoom}", filter:="{visibilityAttribute}" IS NULL and "_cluster_size{currentZoom}" > 1), {orderBy}),0,0), to_real("{electionAttribute}"))'
+        clusterIdAttribute = f'_cluster_id{currentZoom}'
+        clusterSizeAttribute = f'_cluster_size{currentZoom}'
 
         request = QgsFeatureRequest()
-        reqContext = QgsExpressionContext()
-        reqContext.appendScopes(QgsExpressionContextUtils.globalProjectLayerScopes(layer))
-        request.setExpressionContext(reqContext)
-        request.setFilterExpression(query)
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes([electionAttribute, visibilityAttribute, clusterIdAttribute, clusterSizeAttribute], layer.fields())
 
-        with edit(layer):
-            for feature in layer.getFeatures(request):
-                feature[visibilityAttribute] = currentZoom
-                layer.updateFeature(feature)
+        fids, clusterIds, eligible, values = [], [], [], []
+        for feature in layer.getFeatures(request):
+            clusterId = feature[clusterIdAttribute]
+            clusterSize = feature[clusterSizeAttribute]
+            fids.append(feature.id())
+            clusterIds.append(clusterId if clusterId != NULL else -1)
+            eligible.append(feature[visibilityAttribute] == NULL and clusterSize != NULL and clusterSize > 1)
+            values.append(toReal(feature[electionAttribute]))
+
+        electMax = parameters['ELECTION_METHOD'] != 1
+        winners = electGroupMembers(np.array(clusterIds, dtype=np.int64), values, eligible, electMax)
+        visibilityIdx = layer.fields().indexFromName(visibilityAttribute)
+
+        with BulkAttributeWriter(layer) as writer:
+            for fid in np.array(fids, dtype=np.int64)[winners]:
+                writer.setValue(int(fid), visibilityIdx, currentZoom)
 
     def showRemainingFeatures(self, currentZoom: int, layer: QgsVectorLayer, parameters):
         visibilityAttribute = parameters['NEW_ATTRIBUTE_NAME']
@@ -144,11 +255,15 @@ class CreateClusteredVisualization(QgsProcessingAlgorithm):
         reqContext.appendScopes(QgsExpressionContextUtils.globalProjectLayerScopes(layer))
         request.setExpressionContext(reqContext)
         request.setFilterExpression(f'"{visibilityAttribute}" IS NULL')
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        visibilityIdx = layer.fields().indexFromName(visibilityAttribute)
+        offset = currentZoom if parameters['SHOW_ALL_AT_LAST_ZOOM_LEVEL'] == True else currentZoom + 1
 
-        with edit(layer):
-            for feature in layer.getFeatures(request):
-                feature[visibilityAttribute] = currentZoom if parameters['SHOW_ALL_AT_LAST_ZOOM_LEVEL'] == True else currentZoom + 1
-                layer.updateFeature(feature)
+        # Ids are collected before writing so the provider is not changed under an open iterator
+        fids = [feature.id() for feature in layer.getFeatures(request)]
+        with BulkAttributeWriter(layer) as writer:
+            for fid in fids:
+                writer.setValue(fid, visibilityIdx, offset)
 
     def deleteAttribute(self, layer, name):
         with edit(layer):
@@ -196,6 +311,12 @@ class CreateClusteredVisualization(QgsProcessingAlgorithm):
             Indicates whether isolated features (outside a cluster) will always be visible.
             <h3>Attribute name (that controls visibility)</h3>
             Name of the attribute to be created. This new attribute should be used together with the visibilitByOffset() function.
+            <h3>Engine</h3>
+            Cluster hierarchy reads the layer once and derives the clusters of every zoom level from a single merge hierarchy. Clusterization per zoom level runs the Clusterization by distance algorithm again for each zoom level.
+            <h3>Sort and index GeoPackage output</h3>
+            When the output is a GeoPackage, features are written sorted by visibility attribute and then by position along a Hilbert curve, and the visibility attribute gets an index next to the spatial index. Zoom level filters then read few, contiguous pages. Only used by the cluster hierarchy engine.
+            <h3>Save progress after each zoom level and resume interrupted runs</h3>
+            The cluster hierarchy engine saves the levels completed so far to a checkpoint file in the QGIS profile folder. Running the algorithm again on the same features with the same parameters after a cancel or a crash resumes from the last saved level. The file is deleted once the output is written.
             <br />
             Visit <a href="https://github.com/guialexsdev/webmap-utilities">https://github.com/guialexsdev/webmap-utilities</a> to learn more!
         """
\ No newline at end of file
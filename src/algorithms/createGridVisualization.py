@@ -14,24 +14,118 @@ from qgis.core import QgsProcessingParameterField
 from qgis.core import QgsProcessingParameterExtent
 from qgis.core import QgsProcessingParameterFeatureSink
 from qgis.core import QgsProcessingParameterString
+from qgis.core import QgsProcessingParameterBoolean
+from qgis.core import QgsProcessingParameterEnum, QgsProcessingException
 from qgis.core import QgsField, edit, QgsFeatureRequest, QgsVectorLayer, QgsExpressionContext, QgsExpressionContextUtils
+from qgis.core import QgsFields
 
 from qgis.PyQt.QtCore import QVariant
 
 import processing
 from .afterProcessingLayerRenamer import AfterProcessingLayerRenamer
+from ..engines.gridPyramid import gridVisibilityOffsets
+from ..utils.bulkWriter import BulkAttributeWriter
+from ..utils.featureStore import PointFeatureStore
+from ..utils.geoPackage import geoPackageLayer, visibilityOrder, indexGeoPackageLayer
+from ..utils.checkpoint import Checkpoint
+
+ENGINE_QUADTREE_PYRAMID = 0
+ENGINE_GRID_LAYERS = 1
 
 class CreateGridVisualization(QgsProcessingAlgorithm):
     def initAlgorithm(self, config=None):        
         self.addParameter(QgsProcessingParameterVectorLayer('VECTOR_LAYER', 'Vector Layer (points)', types=[QgsProcessing.TypeVectorPoint], defaultValue=None))
-        self.addParameter(QgsProcessingParameterField('ID_ATTRIBUTE', 'ID attribute', type=QgsProcessingParameterField.Any, parentLayerParameterName='VECTOR_LAYER', allowMultiple=False, defaultValue=None))
+        self.addParameter(QgsProcessingParameterField('ID_ATTRIBUTE', 'ID attribute', type=QgsProcessingParameterField.Any, parentLayerParameterName='VECTOR_LAYER', allowMultiple=False, defaultValue=None, optional=True))
         self.addParameter(QgsProcessingParameterExtent('EXTENT', 'Extent', defaultValue=None))
         self.addParameter(QgsProcessingParameterNumber('GRID_SQUARE_LENGTH_METERS', 'Grid Square Length (meters)', type=QgsProcessingParameterNumber.Double, minValue=100, defaultValue=None))
         self.addParameter(QgsProcessingParameterNumber('NUMBER_OF_ZOOMS', 'Number of zoom levels', type=QgsProcessingParameterNumber.Integer, minValue=1, defaultValue=None))
         self.addParameter(QgsProcessingParameterString('NEW_ATTRIBUTE_NAME', 'Attribute name (that controls visibility)', multiLine=False, defaultValue='_visibility_offset'))
         self.addParameter(QgsProcessingParameterFeatureSink('OUTPUT', 'Grid View', type=QgsProcessing.SourceType.TypeVectorPoint, createByDefault=True, defaultValue=None))
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'ENGINE',
+                'Engine',
+                options=['Quadtree pyramid (in-memory)', 'Grid layers per zoom level (legacy)'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=ENGINE_QUADTREE_PYRAMID
+            )
+        )
+        self.addParameter(QgsProcessingParameterBoolean('OPTIMIZE_GEOPACKAGE', 'Sort and index GeoPackage output', defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean('CHECKPOINTS', 'Save progress after each zoom level and resume interrupted runs', defaultValue=True))
 
     def processAlgorithm(self, parameters, context, model_feedback):
+        if self.parameterAsEnum(parameters, 'ENGINE', context) == ENGINE_GRID_LAYERS:
+            return self.processWithGridLayers(parameters, context, model_feedback)
+
+        return self.processWithPyramid(parameters, context, model_feedback)
+
+    def processWithPyramid(self, parameters, context, model_feedback):
+        feedback = QgsProcessingMultiStepFeedback(3, model_feedback)
+        layer = self.parameterAsVectorLayer(parameters, 'VECTOR_LAYER', context)
+        newAttributeName = self.parameterAsString(parameters, 'NEW_ATTRIBUTE_NAME', context)
+        nZooms = self.parameterAsInt(parameters, 'NUMBER_OF_ZOOMS', context)
+
+        # Grid points are created in the project CRS, like the legacy engine does
+        gridCrs = context.project().crs() if context.project() is not None else layer.crs()
+        extent = self.parameterAsExtent(parameters, 'EXTENT', context, gridCrs)
+
+        feedback.pushInfo('Reading point coordinates...')
+        store = PointFeatureStore.fromLayer(layer, destinationCrs=gridCrs, transformContext=context.transformContext(), feedback=feedback)
+        if store is None:
+            return {}
+
+        feedback.setCurrentStep(1)
+        feedback.pushInfo('Binning points into grid cells...')
+
+        gridExtent = (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum())
+        spacing = self.parameterAsDouble(parameters, 'GRID_SQUARE_LENGTH_METERS', context)
+
+        checkpoint = None
+        if self.parameterAsBool(parameters, 'CHECKPOINTS', context):
+            checkpoint = Checkpoint.forRun('grid_visualization', store.fids, store.x, store.y, {'extent': gridExtent, 'spacing': spacing, 'nZooms': nZooms})
+
+        offsets = gridVisibilityOffsets(store.x, store.y, gridExtent, spacing, nZooms, feedback, checkpoint)
+        if offsets is None:
+            return {}
+
+        feedback.setCurrentStep(2)
+        feedback.pushInfo('Writing {}...'.format(newAttributeName))
+
+        fields = QgsFields(layer.fields())
+        offsetIdx = fields.indexFromName(newAttributeName)
+        if offsetIdx == -1:
+            fields.append(QgsField(newAttributeName, QVariant.Int))
+            offsetIdx = fields.count() - 1
+
+        (sink, destId) = self.parameterAsSink(parameters, 'OUTPUT', context, fields, layer.wkbType(), layer.crs())
+
+        outputGeoPackage = geoPackageLayer(destId) if self.parameterAsBool(parameters, 'OPTIMIZE_GEOPACKAGE', context) else None
+        order = visibilityOrder(offsets, store.x, store.y) if outputGeoPackage is not None else None
+        if not store.writeFeatures(layer, sink, fields.count(), {offsetIdx: (offsets, nZooms)}, feedback, order):
+            return {}
+
+        if outputGeoPackage is not None:
+            # The GeoPackage must be closed before creating its indexes
+            sink.flushBuffer()
+            del sink
+            indexGeoPackageLayer(*outputGeoPackage, newAttributeName, feedback)
+
+        if checkpoint is not None:
+            checkpoint.delete()
+
+        results = {'OUTPUT': destId}
+
+        global renamer
+        renamer = AfterProcessingLayerRenamer('Grid View')
+        context.layerToLoadOnCompletionDetails(results['OUTPUT']).setPostProcessor(renamer)
+
+        return results
+
+    def processWithGridLayers(self, parameters, context, model_feedback):
+        if not parameters.get('ID_ATTRIBUTE'):
+            raise QgsProcessingException('The ID attribute is required by the grid layers engine')
+
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
         # overall progress through the model
         nSteps = parameters['NUMBER_OF_ZOOMS'] * 2 + 1
@@ -89,10 +183,11 @@ class CreateGridVisualization(QgsProcessingAlgorithm):
             joinedLayer.dataProvider().addAttributes([zOffsetField])
             joinedLayer.updateFields()
 
-            for feature in joinedLayer.getFeatures():
-                with edit(joinedLayer):
-                    feature[newAttributeName] = nZoom
-                    joinedLayer.updateFeature(feature)
+            zOffsetIdx = joinedLayer.fields().indexFromName(newAttributeName)
+            fids = [feature.id() for feature in joinedLayer.getFeatures(QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes())]
+            with BulkAttributeWriter(joinedLayer) as writer:
+                for fid in fids:
+                    writer.setValue(fid, zOffsetIdx, nZoom)
 
             currStep += 1
             feedback.setCurrentStep(currStep)
@@ -173,9 +268,11 @@ class CreateGridVisualization(QgsProcessingAlgorithm):
             idx = finalLayer.fields().indexFromName(f'{newAttributeName}_min')
             finalLayer.renameAttribute(idx, newAttributeName)
 
-            for feature2 in finalLayer.getFeatures(request):
-                feature2[newAttributeName] = parameters['NUMBER_OF_ZOOMS']
-                finalLayer.updateFeature(feature2)
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        fids = [feature2.id() for feature2 in finalLayer.getFeatures(request)]
+        with BulkAttributeWriter(finalLayer) as writer:
+            for fid in fids:
+                writer.setValue(fid, idx, parameters['NUMBER_OF_ZOOMS'])
 
         results['OUTPUT'] = outputs['JoinAttributesByLocationSummary']['OUTPUT']
 
@@ -207,7 +304,7 @@ class CreateGridVisualization(QgsProcessingAlgorithm):
             <h3>Vector Layer</h3>
             Point layer
             <h3>ID attribute</h3>
-            Identifier attribute of each feature.
+            Identifier attribute of each feature. Only used by the grid layers engine.
             <h3>Extent</h3>
             Target region where the imginary grid will be created.
             <h3>Distance between grid points (meters)</h3>
@@ -216,6 +313,12 @@ class CreateGridVisualization(QgsProcessingAlgorithm):
             Number of zoom levels to apply this algorithm. After the last zoom level, all features become visible.
             <h3>Attribute name (that controls visibility)</h3>
             Name of the attribute to be created. This new attribute should be used together with the visibilitByOffset() function.
+            <h3>Engine</h3>
+            Quadtree pyramid bins each feature into the grid cell it belongs to at every zoom level, so memory depends only on the number of features. Grid layers per zoom level creates the grid points of every zoom level (ID attribute required).
+            <h3>Sort and index GeoPackage output</h3>
+            When the output is a GeoPackage, features are written sorted by visibility attribute and then by position along a Hilbert curve, and the visibility attribute gets an index next to the spatial index. Zoom level filters then read few, contiguous pages. Only used by the quadtree pyramid engine.
+            <h3>Save progress after each zoom level and resume interrupted runs</h3>
+            The quadtree pyramid engine saves the levels completed so far to a checkpoint file in the QGIS profile folder. Running the algorithm again on the same features with the same parameters after a cancel or a crash resumes from the last saved level. The file is deleted once the output is written.
             <br />
             Visit <a href="https://github.com/guialexsdev/webmap-utilities">https://github.com/guialexsdev/webmap-utilities</a> to learn more!
         """
\ No newline at end of file
@@ -1,14 +1,16 @@
 from qgis.core import QgsProcessingLayerPostProcessorInterface, QgsBrightnessContrastFilter, QgsBilinearRasterResampler
+from ..engines.reliefComposite import LAYER_OPACITY
 
 class CreateShadedReliefPostProcessing(QgsProcessingLayerPostProcessorInterface):
-    def __init__(self, layer_name, blendMode, contrastFilter: QgsBrightnessContrastFilter):
+    def __init__(self, layer_name, blendMode, contrastFilter: QgsBrightnessContrastFilter, opacity: float = LAYER_OPACITY):
         self.name = layer_name
         self.blendMode = blendMode
         self.contrastFilter = contrastFilter
+        self.opacity = opacity
         super().__init__()
         
     def postProcessLayer(self, layer, context, feedback):
-        layer.setOpacity(0.5)
+        layer.setOpacity(self.opacity)
         resampleFilter = layer.resampleFilter()
         resampleFilter.setZoomedInResampler(QgsBilinearRasterResampler())
         resampleFilter.setZoomedOutResampler(QgsBilinearRasterResampler())
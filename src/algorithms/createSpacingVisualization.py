@@ -0,0 +1,209 @@
+import hashlib
+from qgis.core import QgsProcessing
+from qgis.core import QgsProcessingAlgorithm
+from qgis.core import QgsProcessingMultiStepFeedback
+from qgis.core import QgsProcessingParameterNumber
+from qgis.core import QgsProcessingParameterVectorLayer
+from qgis.core import QgsProcessingParameterField
+from qgis.core import QgsProcessingParameterFeatureSink
+from qgis.core import QgsProcessingParameterEnum
+from qgis.core import QgsProcessingParameterString
+from qgis.core import QgsProcessingParameterBoolean
+from qgis.core import QgsProcessingException
+from qgis.core import QgsField, QgsFields, QgsCoordinateReferenceSystem
+from qgis.PyQt.QtCore import QVariant
+
+from .afterProcessingLayerRenamer import AfterProcessingLayerRenamer
+from ..engines.prioritySpacing import spacingVisibilityOffsets
+from ..engines.tileBudget import tileBudgetVisibilityOffsets, tileZoomFromScale
+from ..utils.featureStore import PointFeatureStore
+from ..utils.geoPackage import geoPackageLayer, visibilityOrder, indexGeoPackageLayer
+from ..utils.checkpoint import Checkpoint
+from ..utils.visibilityRules import firstVisibleZoomLevel
+
+METHOD_SPACING = 0
+METHOD_TILE_BUDGET = 1
+
+class CreateSpacingVisualization(QgsProcessingAlgorithm):
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer('VECTOR_LAYER', 'Vector layer (points)', types=[QgsProcessing.TypeVectorPoint], defaultValue=None))
+        self.addParameter(QgsProcessingParameterField('PRIORITY_ATTRIBUTE', 'Priority attribute', type=QgsProcessingParameterField.Numeric, parentLayerParameterName='VECTOR_LAYER', allowMultiple=False, defaultValue=None))
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'PRIORITY_ORDER',
+                'Priority order',
+                options=['max','min'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=[0]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'METHOD',
+                'Method',
+                options=['Min. distance between visible features', 'Max. features per XYZ tile'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=METHOD_SPACING
+            )
+        )
+        self.addParameter(QgsProcessingParameterNumber('INITIAL_SPACING', 'Initial min. distance between visible features', type=QgsProcessingParameterNumber.Double, minValue=0.000001, defaultValue=20000))
+        self.addParameter(QgsProcessingParameterNumber('TILE_BUDGET', 'Max. features per tile', type=QgsProcessingParameterNumber.Integer, minValue=1, defaultValue=50))
+        self.addParameter(QgsProcessingParameterNumber('MIN_ZOOM', 'Minimum zoom level (minZoom of visibilityByOffset)', type=QgsProcessingParameterNumber.Integer, minValue=0, defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber('NUMBER_OF_ZOOM_LEVELS', 'Number of zoom levels', type=QgsProcessingParameterNumber.Integer, minValue=1, defaultValue=3))
+        self.addParameter(QgsProcessingParameterBoolean('SHOW_ALL_AT_LAST_ZOOM_LEVEL', 'Show all feature at last zoom level', defaultValue=False))
+        self.addParameter(QgsProcessingParameterString('NEW_ATTRIBUTE_NAME', 'Attribute name (that controls visibility)', multiLine=False, defaultValue='_visibility_offset'))
+        self.addParameter(QgsProcessingParameterFeatureSink('OUTPUT', 'Spacing View', type=QgsProcessing.TypeVectorPoint, createByDefault=True, defaultValue=None))
+        self.addParameter(QgsProcessingParameterBoolean('OPTIMIZE_GEOPACKAGE', 'Sort and index GeoPackage output', defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean('CHECKPOINTS', 'Save progress after each zoom level and resume interrupted runs', defaultValue=True))
+
+    def processAlgorithm(self, parameters, context, model_feedback):
+        feedback = QgsProcessingMultiStepFeedback(3, model_feedback)
+        layer = self.parameterAsVectorLayer(parameters, 'VECTOR_LAYER', context)
+        priorityAttribute = self.parameterAsString(parameters, 'PRIORITY_ATTRIBUTE', context)
+        highestFirst = self.parameterAsEnum(parameters, 'PRIORITY_ORDER', context) == 0
+        visibilityAttribute = self.parameterAsString(parameters, 'NEW_ATTRIBUTE_NAME', context)
+        nZooms = self.parameterAsInt(parameters, 'NUMBER_OF_ZOOM_LEVELS', context)
+        showAllAtLastLevel = self.parameterAsBool(parameters, 'SHOW_ALL_AT_LAST_ZOOM_LEVEL', context)
+        method = self.parameterAsEnum(parameters, 'METHOD', context)
+
+        if method == METHOD_TILE_BUDGET:
+            tileZooms = self.tileZooms(parameters, context, nZooms)
+            nZooms = len(tileZooms)
+            feedback.pushInfo('XYZ tile zoom of each zoom level: {}'.format(tileZooms))
+
+        feedback.pushInfo('Reading points and priority attribute...')
+        if method == METHOD_TILE_BUDGET:
+            # Tiles are counted on Web Mercator coordinates
+            store = PointFeatureStore.fromLayer(layer, [priorityAttribute], QgsCoordinateReferenceSystem('EPSG:3857'), context.transformContext(), feedback)
+        else:
+            store = PointFeatureStore.fromLayer(layer, [priorityAttribute], feedback=feedback)
+        if store is None:
+            return {}
+
+        feedback.setCurrentStep(1)
+        priorities = store.column(priorityAttribute)
+        checkpointParameters = {
+            'priorities': hashlib.sha1(priorities.tobytes()).hexdigest(),
+            'highestFirst': highestFirst,
+            'nZooms': nZooms
+        }
+
+        if method == METHOD_TILE_BUDGET:
+            feedback.pushInfo('Accepting features by priority within the tile budget...')
+            budget = self.parameterAsInt(parameters, 'TILE_BUDGET', context)
+            checkpoint = self.checkpoint(parameters, context, 'tile_budget_visualization', store, {**checkpointParameters, 'tileZooms': tileZooms, 'budget': budget})
+            offsets = tileBudgetVisibilityOffsets(store.x, store.y, priorities, highestFirst, tileZooms, budget, feedback, checkpoint)
+        else:
+            feedback.pushInfo('Accepting features by priority and spacing...')
+            initialSpacing = self.parameterAsDouble(parameters, 'INITIAL_SPACING', context)
+            checkpoint = self.checkpoint(parameters, context, 'spacing_visualization', store, {**checkpointParameters, 'initialSpacing': initialSpacing})
+            offsets = spacingVisibilityOffsets(store.x, store.y, priorities, highestFirst, initialSpacing, nZooms, feedback, checkpoint)
+
+        if offsets is None:
+            return {}
+
+        feedback.setCurrentStep(2)
+        feedback.pushInfo('Writing {}...'.format(visibilityAttribute))
+
+        fields = QgsFields(layer.fields())
+        visibilityIdx = fields.indexFromName(visibilityAttribute)
+        if visibilityIdx == -1:
+            fields.append(QgsField(visibilityAttribute, QVariant.Int))
+            visibilityIdx = fields.count() - 1
+
+        (sink, destId) = self.parameterAsSink(parameters, 'OUTPUT', context, fields, layer.wkbType(), layer.crs())
+
+        remainingOffset = nZooms - 1 if showAllAtLastLevel else nZooms
+        offsets[offsets > remainingOffset] = remainingOffset
+        outputGeoPackage = geoPackageLayer(destId) if self.parameterAsBool(parameters, 'OPTIMIZE_GEOPACKAGE', context) else None
+        order = visibilityOrder(offsets, store.x, store.y) if outputGeoPackage is not None else None
+        if not store.writeFeatures(layer, sink, fields.count(), {visibilityIdx: (offsets, remainingOffset)}, feedback, order):
+            return {}
+
+        if outputGeoPackage is not None:
+            # The GeoPackage must be closed before creating its indexes
+            sink.flushBuffer()
+            del sink
+            indexGeoPackageLayer(*outputGeoPackage, visibilityAttribute, feedback)
+
+        if checkpoint is not None:
+            checkpoint.delete()
+
+        results = {'OUTPUT': destId}
+
+        global renamer
+        renamer = AfterProcessingLayerRenamer('Spacing View')
+        context.layerToLoadOnCompletionDetails(results['OUTPUT']).setPostProcessor(renamer)
+
+        return results
+
+    def tileZooms(self, parameters, context, nZooms: int):
+        """XYZ zoom of the project scale at which each offset becomes visible, for the offsets within the project scales."""
+        scales = context.project().viewSettings().mapScales() if context.project() is not None else []
+        if len(scales) == 0:
+            raise QgsProcessingException('The project has no predefined scales. Configure the project scales before using the tile budget method.')
+
+        minZoom = self.parameterAsInt(parameters, 'MIN_ZOOM', context)
+        zoomLevels = [firstVisibleZoomLevel(minZoom, offset) for offset in range(nZooms)]
+        zoomLevels = [zoomLevel for zoomLevel in zoomLevels if zoomLevel < len(scales)]
+        if len(zoomLevels) == 0:
+            raise QgsProcessingException('The minimum zoom level is beyond the project scales.')
+
+        return [tileZoomFromScale(scales[zoomLevel]) for zoomLevel in zoomLevels]
+
+    def checkpoint(self, parameters, context, name: str, store: PointFeatureStore, checkpointParameters: dict):
+        if not self.parameterAsBool(parameters, 'CHECKPOINTS', context):
+            return None
+
+        return Checkpoint.forRun(name, store.fids, store.x, store.y, checkpointParameters)
+
+    def name(self):
+        return 'Spacing Visualization'
+
+    def displayName(self):
+        return 'Spacing Visualization'
+
+    def group(self):
+        return 'Vector'
+
+    def groupId(self):
+        return 'Vector'
+
+    def createInstance(self):
+        return CreateSpacingVisualization()
+
+    def shortHelpString(self):
+        return """
+            This algorithm visits the features from the highest to the lowest priority (or the other way round) and makes a feature visible when it is farther than a minimum distance from every feature already visible. At each new zoom the distance is divided by 2 and more features become visible, while the visible ones stay visible.
+            Alternatively, features can be made visible while each web map tile holds less than a maximum number of features.
+            Compared to clusters, the visible features are spread more evenly, and the most important feature of a crowded area is always the first one shown.
+            <h2>Input parameters</h2>
+            <h3>Vector Layer (points)</h3>
+            Point layer
+            <h3>Priority attribute</h3>
+            Numeric attribute that decides which features are shown first. Features without a value come last.
+            <h3>Priority order</h3>
+            max shows features with the highest values first, min the ones with the lowest values.
+            <h3>Method</h3>
+            Min. distance between visible features accepts a feature when it is farther than the distance of the zoom level from the visible features. Max. features per XYZ tile accepts features while their Web Mercator tile holds less than the budget, the tile zoom being derived from the project scale at which the zoom level becomes visible.
+            <h3>Initial min. distance between visible features</h3>
+            Minimum distance between the features visible at the first zoom level, in layer units. Only used by the distance method.
+            <h3>Max. features per tile</h3>
+            Maximum number of visible features in any XYZ tile at every zoom level. Only used by the tile method.
+            <h3>Minimum zoom level (minZoom of visibilityByOffset)</h3>
+            The minZoom that will be passed to visibilityByOffset(). Used by the tile method to know the project scale of each offset, which requires the project predefined scales. Zoom levels beyond the project scales are left out.
+            <h3>Number of zoom levels</h3>
+            Number of zoom levels to apply this algorithm. After the last zoom level, all features become visible.
+            <h3>Show allfeatures at last zoom level</h3>
+            Indicates whether all features should be visible at the last zoom level.
+            <h3>Attribute name (that controls visibility)</h3>
+            Name of the attribute to be created. This new attribute should be used together with the visibilitByOffset() function.
+            <h3>Sort and index GeoPackage output</h3>
+            When the output is a GeoPackage, features are written sorted by visibility attribute and then by position along a Hilbert curve, and the visibility attribute gets an index next to the spatial index. Zoom level filters then read few, contiguous pages.
+            <h3>Save progress after each zoom level and resume interrupted runs</h3>
+            The levels completed so far are saved to a checkpoint file in the QGIS profile folder. Running the algorithm again on the same features with the same parameters after a cancel or a crash resumes from the last saved level. The file is deleted once the output is written.
+            <br />
+            Visit <a href="https://github.com/guialexsdev/webmap-utilities">https://github.com/guialexsdev/webmap-utilities</a> to learn more!
+        """
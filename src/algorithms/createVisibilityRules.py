@@ -0,0 +1,85 @@
+from qgis.core import QgsProcessing
+from qgis.core import QgsProcessingAlgorithm
+from qgis.core import QgsProcessingException
+from qgis.core import QgsProcessingParameterVectorLayer
+from qgis.core import QgsProcessingParameterField
+from qgis.core import QgsProcessingParameterNumber
+from qgis.core import QgsProcessingParameterBoolean
+from qgis.core import QgsProcessingOutputVectorLayer
+from ..utils.visibilityRules import visibilityRanges, createRuleBasedRenderer, createRuleBasedLabeling
+
+class CreateVisibilityRules(QgsProcessingAlgorithm):
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer('VECTOR_LAYER', 'Vector layer', types=[QgsProcessing.TypeVectorAnyGeometry], defaultValue=None))
+        self.addParameter(QgsProcessingParameterField('VISIBILITY_ATTRIBUTE', 'Attribute that controls visibility', type=QgsProcessingParameterField.Numeric, parentLayerParameterName='VECTOR_LAYER', allowMultiple=False, defaultValue='_visibility_offset'))
+        self.addParameter(QgsProcessingParameterNumber('MIN_ZOOM', 'Minimum zoom level (minZoom of visibilityByOffset)', type=QgsProcessingParameterNumber.Integer, minValue=0, defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean('APPLY_TO_LABELS', 'Also create labeling rules', defaultValue=True))
+        self.addOutput(QgsProcessingOutputVectorLayer('OUTPUT', 'Styled layer'))
+
+    def flags(self):
+        # Renderers and labeling of a project layer must be changed in the main thread
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
+    def processAlgorithm(self, parameters, context, feedback):
+        layer = self.parameterAsVectorLayer(parameters, 'VECTOR_LAYER', context)
+        attribute = self.parameterAsString(parameters, 'VISIBILITY_ATTRIBUTE', context)
+        minZoom = self.parameterAsInt(parameters, 'MIN_ZOOM', context)
+        scales = context.project().viewSettings().mapScales()
+
+        if len(scales) == 0:
+            raise QgsProcessingException('The project has no predefined scales. Configure the project scales before creating the rules.')
+
+        if layer.renderer() is None:
+            raise QgsProcessingException('The layer has no renderer')
+
+        feedback.pushInfo('Reading distinct {} values...'.format(attribute))
+        ranges = visibilityRanges(layer, attribute, scales, minZoom)
+        for offset, zoomLevel, minimumScale in ranges:
+            feedback.pushInfo('Offset {}: visible from zoom level {} (scale 1:{:.0f})'.format(offset, zoomLevel, minimumScale))
+
+        if len(ranges) == 0:
+            feedback.reportError('No {} value is visible at the project scales, the layer style was not changed.'.format(attribute))
+            return {'OUTPUT': layer.id()}
+
+        layer.setRenderer(createRuleBasedRenderer(layer, attribute, ranges))
+
+        if self.parameterAsBool(parameters, 'APPLY_TO_LABELS', context) and layer.labelsEnabled():
+            labeling = createRuleBasedLabeling(layer, attribute, ranges)
+            if labeling is not None:
+                layer.setLabeling(labeling)
+
+        layer.triggerRepaint()
+        layer.emitStyleChanged()
+        return {'OUTPUT': layer.id()}
+
+    def name(self):
+        return 'visibility_rules'
+
+    def displayName(self):
+        return 'Create Visibility Rules'
+
+    def group(self):
+        return 'Vector'
+
+    def groupId(self):
+        return 'Vector'
+
+    def createInstance(self):
+        return CreateVisibilityRules()
+
+    def shortHelpString(self):
+        return """
+            Replaces the style of a layer created by the Clustered or Grid Visualization by a rule based renderer (and labeling) with one rule per visibility offset. Each rule filters the features with the offset, e.g. "_visibility_offset" = 2, and is only active from the zoom level at which visibilityByOffset(minZoom, 2) would show them. QGIS then skips whole rules by scale and the data provider filters the features, with no Python call per feature while rendering.
+            <h2>Input parameters</h2>
+            <h3>Vector layer</h3>
+            Layer with the attribute that controls visibility. Its current style is copied inside every rule. Data defined overrides calling visibilityByOffset are deactivated in the copies.
+            <h3>Attribute that controls visibility</h3>
+            Attribute created by the Clustered or Grid Visualization.
+            <h3>Minimum zoom level</h3>
+            Same value as the minZoom argument of visibilityByOffset.
+            <h3>Also create labeling rules</h3>
+            When the layer has labels, create the same rules for them.
+            <br />
+            The rules are based on the project predefined scales: run this algorithm again if they change. Running it again replaces the rules of the previous run, keeping the style they were created from.
+        """
\ No newline at end of file
@@ -0,0 +1,119 @@
+from qgis.core import QgsProcessingAlgorithm
+from qgis.core import QgsProcessingException
+from qgis.core import QgsProcessingParameterRasterLayer
+from qgis.core import QgsProcessingParameterNumber
+from qgis.core import QgsProcessingParameterFileDestination
+from qgis.core import QgsProcessingParameterFolderDestination
+from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransform
+
+from ..engines.rasterIO import rasterPath, reportStep
+from ..engines.rasterScheduler import defaultWorkerCount
+from ..engines.tileBudget import WEB_MERCATOR_HALF_WIDTH, tileZoomFromScale
+from ..engines.tilePyramid import exportTiles, tileCount, MBTilesWriter, XyzWriter
+
+class ExportRasterTiles(QgsProcessingAlgorithm):
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('HILLSHADE', 'Hillshade (Byte)', defaultValue=None))
+        self.addParameter(QgsProcessingParameterRasterLayer('HILLSHADE_TOP', 'Top hillshade of a shaded relief (optional)', optional=True, defaultValue=None))
+        self.addParameter(QgsProcessingParameterNumber('MIN_ZOOM', 'Minimum zoom level', type=QgsProcessingParameterNumber.Integer, minValue=0, optional=True, defaultValue=None))
+        self.addParameter(QgsProcessingParameterNumber('MAX_ZOOM', 'Maximum zoom level', type=QgsProcessingParameterNumber.Integer, minValue=0, optional=True, defaultValue=None))
+        self.addParameter(QgsProcessingParameterNumber('TILE_SIZE', 'Tile size (pixels)', type=QgsProcessingParameterNumber.Integer, minValue=64, maxValue=4096, defaultValue=256))
+        self.addParameter(QgsProcessingParameterNumber('WORKERS', 'Number of processes', type=QgsProcessingParameterNumber.Integer, minValue=1, optional=True, defaultValue=None))
+        self.addParameter(QgsProcessingParameterFileDestination('OUTPUT_FILE', 'MBTiles', fileFilter='MBTiles (*.mbtiles)', optional=True, createByDefault=False, defaultValue=None))
+        self.addParameter(QgsProcessingParameterFolderDestination('OUTPUT_DIRECTORY', 'XYZ directory', optional=True, createByDefault=False, defaultValue=None))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        bottom = self.parameterAsRasterLayer(parameters, 'HILLSHADE', context)
+        top = self.parameterAsRasterLayer(parameters, 'HILLSHADE_TOP', context)
+        sources = [rasterPath(bottom)] + ([rasterPath(top)] if top is not None else [])
+
+        mbtilesPath = self.parameterAsFileOutput(parameters, 'OUTPUT_FILE', context)
+        xyzFolder = self.parameterAsString(parameters, 'OUTPUT_DIRECTORY', context)
+        if not mbtilesPath and not xyzFolder:
+            raise QgsProcessingException('Choose an MBTiles file or an XYZ directory to write the tiles to.')
+
+        zooms = self.tileZooms(parameters, context)
+        bounds = self.mercatorBounds(bottom, context)
+        tileSize = self.parameterAsInt(parameters, 'TILE_SIZE', context)
+        workers = self.parameterAsInt(parameters, 'WORKERS', context) if parameters.get('WORKERS') is not None else defaultWorkerCount()
+
+        reportStep(feedback, f'Rendering up to {tileCount(bounds, zooms)} tiles of zooms {zooms} on {workers} processes...')
+        writers = []
+        if mbtilesPath:
+            writers.append(MBTilesWriter(mbtilesPath, bottom.name(), bounds, zooms))
+        if xyzFolder:
+            writers.append(XyzWriter(xyzFolder))
+
+        counts = exportTiles(sources, bounds, zooms, writers, tileSize, workers, feedback)
+        if counts is None:
+            return {}
+
+        reportStep(feedback, '{written} tiles written, {duplicated} duplicates stored once, {skipped} empty tiles skipped'.format(**counts))
+
+        results = {}
+        if mbtilesPath:
+            results['OUTPUT_FILE'] = mbtilesPath
+        if xyzFolder:
+            results['OUTPUT_DIRECTORY'] = xyzFolder
+
+        return results
+
+    def tileZooms(self, parameters, context):
+        """XYZ zooms of the project scales between the minimum and maximum zoom levels."""
+        scales = context.project().viewSettings().mapScales() if context.project() is not None else []
+        if len(scales) == 0:
+            raise QgsProcessingException('The project has no predefined scales. Configure the project scales before exporting tiles.')
+
+        minZoom = self.parameterAsInt(parameters, 'MIN_ZOOM', context) if parameters.get('MIN_ZOOM') is not None else 0
+        maxZoom = self.parameterAsInt(parameters, 'MAX_ZOOM', context) if parameters.get('MAX_ZOOM') is not None else len(scales) - 1
+        zooms = sorted(set(tileZoomFromScale(scale) for scale in scales[minZoom:maxZoom + 1]))
+        if len(zooms) == 0:
+            raise QgsProcessingException('No project scale between the minimum and maximum zoom levels.')
+
+        return zooms
+
+    def mercatorBounds(self, layer, context):
+        mercator = QgsCoordinateReferenceSystem('EPSG:3857')
+        extent = QgsCoordinateTransform(layer.crs(), mercator, context.transformContext()).transformBoundingBox(layer.extent())
+
+        def clamp(value):
+            return min(WEB_MERCATOR_HALF_WIDTH, max(-WEB_MERCATOR_HALF_WIDTH, value))
+
+        return clamp(extent.xMinimum()), clamp(extent.yMinimum()), clamp(extent.xMaximum()), clamp(extent.yMaximum())
+
+    def name(self):
+        return 'export_raster_tiles'
+
+    def displayName(self):
+        return 'Export Hillshade Tiles'
+
+    def group(self):
+        return 'Raster'
+
+    def groupId(self):
+        return 'Raster'
+
+    def createInstance(self):
+        return ExportRasterTiles()
+
+    def shortHelpString(self):
+        return """
+            This algorithm cuts a hillshade (or the two hillshades of a shaded relief) into web map tiles, at the zoom levels of the project predefined scales. Tiles are rendered on several processes at once, tiles without data are skipped and identical tiles (e.g. flat areas) are stored once.
+            <h2>Input parameters</h2>
+            <h3>Hillshade (Byte)</h3>
+            Hillshade to export, or the bottom hillshade of a shaded relief. Must be a file read by GDAL.
+            <h3>Top hillshade of a shaded relief</h3>
+            When set, tiles show the two hillshades combined the way the Shaded Relief algorithm styles them (brightness, contrast and blend modes), over a white background.
+            <h3>Minimum zoom level / Maximum zoom level</h3>
+            Range of project zoom levels to export. Each one is exported at the XYZ zoom whose scale is the closest. All zoom levels by default.
+            <h3>Tile size (pixels)</h3>
+            Width and height of the tiles.
+            <h3>Number of processes</h3>
+            Processes rendering tiles at the same time. Defaults to the number of threads allowed in the QGIS rendering settings.
+            <h3>MBTiles</h3>
+            MBTiles file to create. Tiles with the same content share their image data.
+            <h3>XYZ directory</h3>
+            Folder where z/x/y.png files are written. Tiles with the same content are hard links to a single file when the file system supports it.
+            <br />
+            Visit <a href="https://github.com/guialexsdev/webmap-utilities">https://github.com/guialexsdev/webmap-utilities</a> to learn more!
+        """
@@ -1,9 +1,12 @@
 from qgis.core import QgsProcessingProvider
 from .createClusteredVisualization import CreateClusteredVisualization
 from .createGridVisualization import CreateGridVisualization
+from .createSpacingVisualization import CreateSpacingVisualization
 from .shadedReliefCreator import ShadedReliefCreator
 from .createAerialPerspective import CreateAerialPerspective
 from .clusterizationByDistance import CreateClusterizationByDistance
+from .createVisibilityRules import CreateVisibilityRules
+from .exportRasterTiles import ExportRasterTiles
 
 class Provider(QgsProcessingProvider):
     """Processing Webmap Utilities provider."""
@@ -25,5 +28,8 @@ class Provider(QgsProcessingProvider):
         self.addAlgorithm(CreateClusterizationByDistance())
         self.addAlgorithm(CreateClusteredVisualization())
         self.addAlgorithm(CreateGridVisualization())
+        self.addAlgorithm(CreateSpacingVisualization())
         self.addAlgorithm(ShadedReliefCreator())
-        self.addAlgorithm(CreateAerialPerspective())
\ No newline at end of file
+        self.addAlgorithm(CreateAerialPerspective())
+        self.addAlgorithm(CreateVisibilityRules())
+        self.addAlgorithm(ExportRasterTiles())
\ No newline at end of file
@@ -5,8 +5,20 @@ from qgis.core import QgsProcessingMultiStepFeedback
 from qgis.core import QgsProcessingParameterNumber
 from qgis.core import QgsProcessingParameterRasterLayer
 from qgis.core import QgsProcessingParameterRasterDestination
+from qgis.core import QgsProcessingParameterString
+from qgis.core import QgsProcessingParameterEnum
+from qgis.core import QgsProcessingParameterBoolean
+from qgis.core import QgsProcessingException
 from qgis.PyQt.QtGui import QPainter
 from .createShadedReliefPostProcessing import CreateShadedReliefPostProcessing
+from ..engines.rasterIO import rasterPath
+from ..engines.shadedRelief import parseAzimuths, runShadedRelief, runCompositeRelief
+from ..engines.overviews import layerOverviewFactors
+from ..utils.rasterStatistics import STATISTICS_EXACT, STATISTICS_APPROXIMATE, layerMinMax
+from ..engines.reliefComposite import BOTTOM_BRIGHTNESS, BOTTOM_CONTRAST, TOP_BRIGHTNESS, TOP_CONTRAST
+
+ENGINE_SHARED_GRADIENTS = 0
+ENGINE_PROCESSING_CHAIN = 1
 
 class ShadedReliefCreator(QgsProcessingAlgorithm):
 
@@ -18,8 +30,100 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
         self.addParameter(QgsProcessingParameterNumber('SCALE', 'Scale', type=QgsProcessingParameterNumber.Double, defaultValue=1))
         self.addParameter(QgsProcessingParameterRasterDestination('HILLSHADE_LAYER_BOTTOM', 'Bottom Hillshade', createByDefault=True, defaultValue=None))
         self.addParameter(QgsProcessingParameterRasterDestination('HILLSHADE_LAYER_TOP', 'Top Hillshade', createByDefault=True, defaultValue=None))
+        self.addParameter(QgsProcessingParameterRasterDestination('HILLSHADE_COMPOSITE', 'Composite Shaded Relief', optional=True, createByDefault=False, defaultValue=None))
+        self.addParameter(QgsProcessingParameterString('BOTTOM_LIGHT_SOURCES', 'Bottom hillshade light sources (azimuths, comma separated)', optional=True, defaultValue=None))
+        self.addParameter(QgsProcessingParameterString('TOP_LIGHT_SOURCES', 'Top hillshade light sources (azimuths, comma separated)', optional=True, defaultValue=None))
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'ENGINE',
+                'Engine',
+                options=['Shared gradients (NumPy)', 'GDAL hillshade and raster calculator chain (legacy)'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=ENGINE_SHARED_GRADIENTS
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'STATISTICS',
+                'DEM statistics',
+                options=['Exact (reads the whole DEM)', 'Approximate (overviews or a sample)'],
+                allowMultiple=False,
+                usesStaticStrings=False,
+                defaultValue=STATISTICS_EXACT
+            )
+        )
+        self.addParameter(QgsProcessingParameterBoolean('TILED_OUTPUT', 'Tiled output with overviews', defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean('LOOKUP_TABLE', 'Contrast lookup table (approximate)', defaultValue=False))
+
+    def lightSources(self, parameters, context):
+        """Azimuths of the bottom and top hillshades. Empty lists fall back to the Angle Between Light Sources."""
+        angle = self.parameterAsDouble(parameters, 'ANGLE_BETWEEN_LIGHT_SOURCES', context)
+        sources = []
+
+        for name, default in [('BOTTOM_LIGHT_SOURCES', 360 - angle/2), ('TOP_LIGHT_SOURCES', angle/2)]:
+            try:
+                azimuths = parseAzimuths(self.parameterAsString(parameters, name, context) or '')
+            except ValueError:
+                raise QgsProcessingException(f'Invalid azimuth list in {name}: use numbers separated by commas')
+
+            sources.append(azimuths or [default])
+
+        return sources
+
+    def overviews(self, parameters, context):
+        """Overview factors of the outputs, None for plain outputs."""
+        if not self.parameterAsBoolean(parameters, 'TILED_OUTPUT', context):
+            return None
+
+        return layerOverviewFactors(self.parameterAsRasterLayer(parameters, 'DEM', context), context.project())
 
     def processAlgorithm(self, parameters, context: QgsProcessingContext, model_feedback):
+        if self.parameterAsEnum(parameters, 'ENGINE', context) == ENGINE_PROCESSING_CHAIN:
+            results = self.processWithProcessingChain(parameters, context, model_feedback)
+            compositePath = self.parameterAsOutputLayer(parameters, 'HILLSHADE_COMPOSITE', context)
+            if results and compositePath:
+                if not runCompositeRelief(results['HILLSHADE_LAYER_BOTTOM'], results['HILLSHADE_LAYER_TOP'], compositePath, model_feedback, overviews=self.overviews(parameters, context)):
+                    return {}
+
+                results['HILLSHADE_COMPOSITE'] = compositePath
+        else:
+            results = self.processWithSharedGradients(parameters, context, model_feedback)
+
+        if results:
+            self.setPostProcessors(results, context)
+
+        return results
+
+    def processWithSharedGradients(self, parameters, context, feedback):
+        bottomAzimuths, topAzimuths = self.lightSources(parameters, context)
+        bottomPath = self.parameterAsOutputLayer(parameters, 'HILLSHADE_LAYER_BOTTOM', context)
+        topPath = self.parameterAsOutputLayer(parameters, 'HILLSHADE_LAYER_TOP', context)
+        compositePath = self.parameterAsOutputLayer(parameters, 'HILLSHADE_COMPOSITE', context)
+
+        feedback.pushInfo(f'Bottom light sources: {bottomAzimuths}, top light sources: {topAzimuths}')
+        completed = runShadedRelief(
+            rasterPath(self.parameterAsRasterLayer(parameters, 'DEM', context)),
+            [(bottomPath, bottomAzimuths), (topPath, topAzimuths)],
+            self.parameterAsInt(parameters, 'AP_INTENSITY', context),
+            self.parameterAsDouble(parameters, 'Z_FACTOR', context),
+            self.parameterAsDouble(parameters, 'SCALE', context),
+            feedback=feedback,
+            overviews=self.overviews(parameters, context),
+            compositePath=compositePath or None,
+            lookupTable=self.parameterAsBoolean(parameters, 'LOOKUP_TABLE', context),
+            exactStatistics=self.parameterAsEnum(parameters, 'STATISTICS', context) != STATISTICS_APPROXIMATE
+        )
+        if not completed:
+            return {}
+
+        results = {'HILLSHADE_LAYER_BOTTOM': bottomPath, 'HILLSHADE_LAYER_TOP': topPath}
+        if compositePath:
+            results['HILLSHADE_COMPOSITE'] = compositePath
+
+        return results
+
+    def processWithProcessingChain(self, parameters, context: QgsProcessingContext, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
         # overall progress through the model
         feedback = QgsProcessingMultiStepFeedback(10, model_feedback)
@@ -28,24 +132,26 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
         step = 0
 
         # DEM Stats
-        alg_params = {
-            'BAND': 1,
-            'INPUT': parameters['DEM']
-        }
-        outputs['DemStats'] = processing.run('native:rasterlayerstatistics', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
+        feedback.pushInfo('Computing DEM statistics...')
+        demMin, demMax = layerMinMax(
+            self.parameterAsRasterLayer(parameters, 'DEM', context),
+            self.parameterAsEnum(parameters, 'STATISTICS', context) != STATISTICS_APPROXIMATE
+        )
 
         step = step + 1
         feedback.setCurrentStep(step)
         if feedback.isCanceled():
             return {}
         
+        lightSources = self.lightSources(parameters, context)
+        if any(len(azimuths) > 1 for azimuths in lightSources):
+            feedback.reportError('The legacy engine supports one light source per hillshade, only the first azimuth of each list is used.')
+
         for idx in range(2):
-            if idx == 0:
-                azimuth = 360 - float(parameters['ANGLE_BETWEEN_LIGHT_SOURCES'])/2
-            else:
-                azimuth = float(parameters['ANGLE_BETWEEN_LIGHT_SOURCES'])/2
+            azimuth = lightSources[idx][0]
 
             # Hillshade
+            feedback.pushInfo(f'Hillshading (azimuth {azimuth})...')
             alg_params = {
                 'ALTITUDE': 45,
                 'AZIMUTH': azimuth,
@@ -69,6 +175,7 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
                 return {}
 
             # Translate (convert format)
+            feedback.pushInfo('Converting hillshade to Float32...')
             alg_params = {
                 'COPY_SUBDATASETS': False,
                 'DATA_TYPE': 6,  # Float32
@@ -87,6 +194,7 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
                 return {}
 
             # Hillshade Stats
+            feedback.pushInfo('Computing hillshade statistics...')
             alg_params = {
                 'BAND': 1,
                 'INPUT': outputs[f'HillshadeFloat{idx}']['OUTPUT']
@@ -98,9 +206,6 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
             if feedback.isCanceled():
                 return {}
 
-            demMin = outputs['DemStats']['MIN']
-            demMax = outputs['DemStats']['MAX']
-            
             contrastMin = -parameters['AP_INTENSITY']
             contrastMax = parameters['AP_INTENSITY']
             contrast = f'({contrastMax} - {contrastMin})*((A - {demMin}) / ({demMax} - {demMin})) + {contrastMin}'
@@ -110,6 +215,7 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
             feedback.pushInfo(apDenorm)
             
             # AP Denorm
+            feedback.pushInfo('Denormalizing...')
             alg_params = {
                 'BAND_A': 1,
                 'BAND_B': None,
@@ -138,6 +244,7 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
                 return {}
 
             # Ap Denorm Stats
+            feedback.pushInfo('Computing denormalized statistics...')
             alg_params = {
                 'BAND': 1,
                 'INPUT': outputs[f'ApDenorm{idx}']['OUTPUT']
@@ -156,6 +263,7 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
             rasterName = f"HILLSHADE_LAYER_{'TOP' if idx == 1 else 'BOTTOM'}"
 
             # Raster calculator
+            feedback.pushInfo('Normalizing...')
             alg_params = {
                 'BAND_A': 1,
                 'BAND_B': None,
@@ -180,9 +288,24 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
             outputs[f'RasterCalculator{idx}'] = processing.run('gdal:rastercalculator', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
             results[rasterName] = outputs[f'RasterCalculator{idx}']['OUTPUT']
 
+        return results
+
+    def setPostProcessors(self, results, context: QgsProcessingContext):
+        if 'HILLSHADE_COMPOSITE' in results:
+            # The composite already shows both hillshades, loading them too would draw the relief twice
+            layers = context.layersToLoadOnCompletion()
+            for name in ['HILLSHADE_LAYER_BOTTOM', 'HILLSHADE_LAYER_TOP']:
+                layers.pop(results[name], None)
+            context.setLayersToLoadOnCompletion(layers)
+
+            global compositeRenamer
+            compositeRenamer = CreateShadedReliefPostProcessing('Shaded Relief', QPainter.CompositionMode.CompositionMode_SourceOver, QgsBrightnessContrastFilter(), 1)
+            context.layerToLoadOnCompletionDetails(results['HILLSHADE_COMPOSITE']).setPostProcessor(compositeRenamer)
+            return
+
         bottomContrastFilter = QgsBrightnessContrastFilter()
-        bottomContrastFilter.setContrast(-25)
-        bottomContrastFilter.setBrightness(40)
+        bottomContrastFilter.setContrast(BOTTOM_CONTRAST)
+        bottomContrastFilter.setBrightness(BOTTOM_BRIGHTNESS)
         bottomBlendMode = QPainter.CompositionMode.CompositionMode_Multiply
 
         global renamer
@@ -190,15 +313,13 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
         context.layerToLoadOnCompletionDetails(results['HILLSHADE_LAYER_BOTTOM']).setPostProcessor(renamer)
 
         topContrastFilter = QgsBrightnessContrastFilter()
-        topContrastFilter.setContrast(-25)
-        topContrastFilter.setBrightness(-40)
+        topContrastFilter.setContrast(TOP_CONTRAST)
+        topContrastFilter.setBrightness(TOP_BRIGHTNESS)
         topBlendMode = QPainter.CompositionMode.CompositionMode_Overlay
 
         global renamer2
         renamer2 = CreateShadedReliefPostProcessing('Hillshade (Top)', topBlendMode, topContrastFilter)
         context.layerToLoadOnCompletionDetails(results['HILLSHADE_LAYER_TOP']).setPostProcessor(renamer2)
-
-        return results
     
     def name(self):
         return 'shaded_relief'
@@ -227,8 +348,20 @@ class ShadedReliefCreator(QgsProcessingAlgorithm):
         Vertical exaggeration. This parameter is useful when the Z units differ from the X and Y units, for example feet and meters. You can use this parameter to adjust for this. Increasing the value of this parameter will exaggerate the final result (making it look more “hilly”). The default is 1 (no exaggeration).
         <h3>Scale</h3>
         Ratio of vertical units to horizontal
+        <h3>Bottom and Top hillshade light sources</h3>
+        Optional comma separated azimuths (e.g. <i>300, 330</i>). Each hillshade is the mean of the hillshades of its light sources. When empty, the bottom hillshade is lit from 360 - angle/2 and the top hillshade from angle/2.
+        <h3>DEM statistics</h3>
+        Minimum and maximum elevations of the DEM. <b>Exact</b> reads every pixel. <b>Approximate</b> reads about a million pixels, from an overview of the DEM when it has one, which is much faster on large DEMs but may miss the most extreme elevations. Both engines use it and results are reused by later runs on the same, unmodified DEM.
+        <h3>Engine</h3>
+        <b>Shared gradients</b> reads the DEM in blocks and computes its gradients once, deriving the shading of every light source from them. It only reads rasters opened by GDAL. <b>GDAL hillshade and raster calculator chain</b> is the previous implementation, which runs one hillshade and several temporary rasters per light source.
+        <h3>Tiled output with overviews</h3>
+        Writes GeoTIFF outputs with internal 512 px tiles, ZSTD (or DEFLATE) compression and overviews matching the project scales, built while the output is written, so the layer renders fast at every zoom level. Only used by the shared gradients engine.
+        <h3>Contrast lookup table</h3>
+        Quantizes elevations to 4096 levels and rounds the hillshade, so every output pixel is read from a precomputed table instead of evaluating the contrast curve. Faster, with pixels differing from the exact curve by at most one gray level. Only used by the shared gradients engine.
         <h2>Outputs</h2>
         <h3>Hillshade Top and Bottom</h3>
         <p>Two raster layers will be created. Hillshade (top) must always be above the Hillshade (bottom). Manually change the order of these layers if they were created in a different order.</p>
+        <h3>Composite Shaded Relief</h3>
+        <p>Optional single gray layer with both hillshades already blended, with the same brightness, contrast, opacity and blend modes the two layers get in QGIS, over a white background. It renders as one layer without filters. When it is created, only this layer is loaded into the project (the two hillshades are still written).</p>
         <br />
         """
\ No newline at end of file
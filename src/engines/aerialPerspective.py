@@ -0,0 +1,139 @@
+import numpy as np
+from osgeo import gdal
+from qgis.core import QgsProcessingException
+from .rasterIO import openRaster, createRaster, readBlock, reportStep, toByte
+from .rasterScheduler import BlockScheduler, ThreadLocalRaster
+from .overviews import OverviewBuilder
+from ..utils.rasterStatistics import rasterMinMax
+
+# Byte nodata written by gdal_calc when no NoDataValue is given, kept for compatibility with the legacy engine
+OUTPUT_NO_DATA = 255
+
+# Elevation levels of the lookup table mode. Hillshades have 256 levels, so tables have 4096 x 256 entries
+ELEVATION_BINS = 4096
+
+def contrastFactor(dem, demMin: float, demMax: float, contrastMin: float, contrastMax: float):
+    """
+    Contrast grows linearly with elevation, from contrastMin at demMin to contrastMax at demMax. Elevations
+    out of that range, which approximate statistics may miss, get the contrast of the nearest end.
+    """
+    elevation = np.clip((dem - demMin) / (demMax - demMin), 0, 1) if demMax > demMin else np.zeros_like(dem)
+    contrast = (contrastMax - contrastMin) * elevation + contrastMin
+    return (259 * (contrast + 255)) / (255 * (259 - contrast))
+
+def denormalize(dem, hillshade, demMin: float, demMax: float, contrastMin: float, contrastMax: float):
+    return contrastFactor(dem, demMin, demMax, contrastMin, contrastMax) * (hillshade - 128) + 128
+
+def normalize(values, valuesMin: float, valuesMax: float):
+    if valuesMax <= valuesMin:
+        return np.where(np.isnan(values), np.nan, 0)
+
+    return 255 * ((values - valuesMin) / (valuesMax - valuesMin))
+
+class ContrastLookup:
+    """
+    Denormalized values of every (elevation level, 8-bit hillshade) pair. Once the range of the denormalized
+    values is known, the Byte output of every pair fits in a 1 MB table, so normalized blocks are gathered
+    from it instead of evaluating the contrast curve, the normalization and the rounding for every pixel.
+    Elevations are quantized to bins levels between demMin and demMax (elevations out of that range are
+    clamped) and hillshades are rounded to integers, so outputs differ from the exact curve by at most one level.
+    """
+
+    def __init__(self, demMin: float, demMax: float, contrastMin: float, contrastMax: float, bins: int = ELEVATION_BINS):
+        self.demMin = demMin
+        self.bins = bins
+        self.binsPerUnit = (bins - 1) / (demMax - demMin) if demMax > demMin else 0
+        elevations = demMin + np.arange(bins)[:, None] / self.binsPerUnit if self.binsPerUnit > 0 else np.full((bins, 1), demMin)
+        self.table = denormalize(elevations, np.arange(256)[None, :], demMin, demMax, contrastMin, contrastMax)
+
+    def gather(self, table, dem, hillshade, fill):
+        """Entries of table (shaped like self.table) at the pixels, fill where any input is nodata (NaN)."""
+        # In place, so the gather needs fewer temporary arrays than evaluating the curve
+        index = dem - self.demMin
+        index *= self.binsPerUnit
+        np.rint(index, out=index)
+        np.clip(index, 0, self.bins - 1, out=index)
+        index *= 256
+        columns = np.clip(hillshade, 0, 255)
+        np.rint(columns, out=columns)
+        index += columns
+
+        invalid = np.isnan(index)
+        index[invalid] = 0
+        values = table.ravel()[index.astype(np.intp)]
+        values[invalid] = fill
+        return values
+
+    def byteTable(self, valuesMin: float, valuesMax: float, noData: int):
+        """Byte output of every entry, once the range of the denormalized values is known."""
+        return toByte(normalize(self.table, valuesMin, valuesMax), noData)
+
+def runAerialPerspective(demPath: str, hillshadePath: str, outputPath: str, contrastMin: float, contrastMax: float, feedback=None, workers: int = None, overviews: list = None, lookupTable: bool = False, exactStatistics: bool = True):
+    """
+    Applies the Aerial Perspective to a hillshade in two passes over DEM and hillshade blocks, processed in
+    parallel: the first one finds the range of the denormalized values, the second one normalizes them and
+    writes the Byte output. When overviews (a list of decimation factors) is given, a GeoTIFF output is
+    tiled and compressed and its overviews are built while writing. With lookupTable, the second pass
+    gathers the output from a ContrastLookup. DEM statistics come from rasterMinMax, approximate unless
+    exactStatistics. Returns False if canceled.
+    """
+    dem = openRaster(demPath)
+    hillshade = openRaster(hillshadePath)
+
+    if (dem.RasterXSize, dem.RasterYSize) != (hillshade.RasterXSize, hillshade.RasterYSize):
+        raise QgsProcessingException('DEM and hillshade must have the same size')
+
+    reportStep(feedback, 'Computing DEM statistics...')
+    demMin, demMax = rasterMinMax(demPath, 1, exactStatistics)
+    scheduler = BlockScheduler(dem.RasterXSize, dem.RasterYSize, workers=workers)
+    demReader = ThreadLocalRaster(demPath)
+    hillshadeReader = ThreadLocalRaster(hillshadePath)
+    lookup = ContrastLookup(demMin, demMax, contrastMin, contrastMax) if lookupTable else None
+
+    def inputBlocks(window):
+        return readBlock(demReader.band(), window), readBlock(hillshadeReader.band(), window)
+
+    def denormalizedBlock(window):
+        return denormalize(*inputBlocks(window), demMin, demMax, contrastMin, contrastMax)
+
+    def blockRange(window):
+        values = denormalizedBlock(window)
+        return (np.nanmin(values), np.nanmax(values)) if not np.isnan(values).all() else None
+
+    denormRange = [np.inf, -np.inf]
+
+    def mergeRange(window, blockRange):
+        if blockRange is not None:
+            denormRange[0] = min(denormRange[0], blockRange[0])
+            denormRange[1] = max(denormRange[1], blockRange[1])
+
+    reportStep(feedback, 'Denormalizing (pass 1 of 2)...')
+    if not scheduler.run(blockRange, mergeRange, feedback, 0, 50):
+        return False
+
+    output = createRaster(outputPath, dem, gdal.GDT_Byte, OUTPUT_NO_DATA, tiled=overviews is not None)
+    outputBand = output.GetRasterBand(1)
+    builder = OverviewBuilder(output, overviews or [], scheduler.blockSize, OUTPUT_NO_DATA)
+
+    byteTable = lookup.byteTable(denormRange[0], denormRange[1], OUTPUT_NO_DATA) if lookup is not None else None
+
+    def normalizedBlock(window):
+        if lookup is not None:
+            return lookup.gather(byteTable, *inputBlocks(window), OUTPUT_NO_DATA)
+
+        return toByte(normalize(denormalizedBlock(window), denormRange[0], denormRange[1]), OUTPUT_NO_DATA)
+
+    def writeBlock(window, values):
+        outputBand.WriteArray(values, window[0], window[1])
+        builder.write(window, values)
+
+    reportStep(feedback, 'Normalizing (pass 2 of 2)...')
+    completed = scheduler.run(normalizedBlock, writeBlock, feedback, 50, 100)
+    if completed and overviews:
+        reportStep(feedback, 'Completing overviews...')
+        builder.finish()
+    outputBand.FlushCache()
+    output = None
+    demReader.close()
+    hillshadeReader.close()
+    return completed
@@ -0,0 +1,107 @@
+import math
+import numpy as np
+from .distanceClustering import UnionFind, CellGrid, NEIGHBOUR_OFFSETS, linkNeighbourCells, labelsByFirstAppearance
+from .election import electGroupMembers
+
+class ClusterHierarchy:
+    """
+    Single-linkage clusters of the same points at several link distances, one level per zoom.
+    Clusters at a shorter distance are always contained in the clusters at a longer one, so every
+    level is derived from the previous (finer) one instead of being computed from scratch.
+    """
+
+    def __init__(self, labels, sizes):
+        # labels[level][point] and sizes[level][point], level 0 being the longest link distance
+        self.labels = labels
+        self.sizes = sizes
+
+    def levelCount(self):
+        return len(self.labels)
+
+    @staticmethod
+    def build(x, y, linkDistances: list[float], feedback=None, checkpoint=None):
+        """
+        Builds the hierarchy for link distances sorted from the longest to the shortest. Every level is
+        saved to the checkpoint (if any) once built, and a saved run is resumed.
+        Returns None if canceled.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        nLevels = len(linkDistances)
+        labels = np.zeros((nLevels, len(x)), dtype=np.int32)
+        sizes = np.ones((nLevels, len(x)), dtype=np.int32)
+
+        if len(x) == 0:
+            return ClusterHierarchy(labels, sizes)
+
+        unionFind = UnionFind(len(x))
+        originX, originY = x.min(), y.min()
+        nSteps = nLevels * (len(NEIGHBOUR_OFFSETS) + 1)
+        step = 0
+        firstLevel = nLevels - 1
+
+        saved = checkpoint.load() if checkpoint is not None else None
+        if saved is not None:
+            for level, arrays in saved:
+                labels[level], sizes[level] = arrays['labels'], arrays['sizes']
+
+            # The components of the last saved level are all the union-find needs to go on
+            lastLevel = saved[-1][0]
+            _, firstPointOfLabel = np.unique(labels[lastLevel], return_index=True)
+            unionFind.union(np.arange(len(x)), firstPointOfLabel[labels[lastLevel]])
+            firstLevel = lastLevel - 1
+            step = (nLevels - lastLevel) * (len(NEIGHBOUR_OFFSETS) + 1)
+
+        # Union-find only merges, so going from the shortest to the longest distance lets each level
+        # reuse the components found so far and skip cell pairs that are already connected.
+        for level in range(firstLevel, -1, -1):
+            linkDistance = linkDistances[level]
+
+            if linkDistance > 0:
+                grid = CellGrid(x, y, linkDistance / math.sqrt(2), originX, originY)
+                firstPointOfCell = grid.order[grid.starts]
+                unionFind.union(np.arange(len(x)), firstPointOfCell[grid.pointCell])
+
+                for dx, dy in NEIGHBOUR_OFFSETS:
+                    if feedback is not None:
+                        if feedback.isCanceled():
+                            return None
+                        step += 1
+                        feedback.setProgress(100 * step / nSteps)
+
+                    cellA, cellB = grid.neighbourPairs(dx, dy)
+                    linkNeighbourCells(unionFind, grid, linkDistance, cellA, cellB, firstPointOfCell)
+
+            step += 1
+            levelLabels = labelsByFirstAppearance(unionFind.roots())
+            labels[level] = levelLabels
+            sizes[level] = np.bincount(levelLabels)[levelLabels]
+
+            if checkpoint is not None:
+                checkpoint.save(level, labels=labels[level], sizes=sizes[level])
+
+        return ClusterHierarchy(labels, sizes)
+
+    def visibilityOffsets(self, values, electMax: bool, isolatedAlwaysVisible: bool, showAllAtLastLevel: bool):
+        """
+        Zoom offset from which each point becomes visible. At each level, every cluster of 2+ points
+        shows the point with the highest (or lowest) value among its points not visible yet, even when
+        the cluster already has visible points; NaN values never win. Points left over are shown after
+        the last level.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        nLevels = self.levelCount()
+        offsets = np.full(len(values), -1, dtype=np.int32)
+
+        for level in range(nLevels):
+            labels = self.labels[level]
+            sizes = self.sizes[level]
+
+            if isolatedAlwaysVisible:
+                offsets[(sizes < 2) & (offsets < 0)] = level
+
+            eligible = (offsets < 0) & (sizes > 1)
+            offsets[electGroupMembers(labels, values, eligible, electMax)] = level
+
+        offsets[offsets < 0] = nLevels - 1 if showAllAtLastLevel else nLevels
+        return offsets
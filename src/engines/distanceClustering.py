@@ -0,0 +1,160 @@
+import math
+import numpy as np
+
+# Upper bound of candidate point pairs materialized at once while linking neighbour cells
+MAX_PAIRS_PER_BATCH = 2000000
+
+# With a cell side of linkDistance / sqrt(2) every pair of points sharing a cell is linked, and only cells
+# up to two steps away can hold linked points. Links are symmetric, so half of the neighbourhood is enough.
+NEIGHBOUR_OFFSETS = [(dx, dy) for dx in range(3) for dy in range(-2, 3) if dx > 0 or dy > 0]
+
+class UnionFind:
+    """Disjoint sets over 0..size-1. Unions are applied to whole arrays of pairs at once."""
+
+    def __init__(self, size: int):
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def find(self, nodes):
+        parent = self.parent
+        while True:
+            grandParent = parent[parent]
+            if np.array_equal(grandParent, parent):
+                break
+            parent = grandParent
+        self.parent = parent
+        return parent[nodes]
+
+    def union(self, a, b):
+        while len(a) > 0:
+            rootA = self.find(a)
+            rootB = self.find(b)
+            pending = rootA != rootB
+            a, b = a[pending], b[pending]
+            rootA, rootB = rootA[pending], rootB[pending]
+            # Hooking the larger root under the smaller one keeps parent[i] <= i, so no cycles can appear.
+            np.minimum.at(self.parent, np.maximum(rootA, rootB), np.minimum(rootA, rootB))
+
+    def roots(self):
+        return self.find(slice(None))
+
+class CellGrid:
+    """Points bucketed into square cells, sorted by cell so each cell is a contiguous slice."""
+
+    def __init__(self, x, y, cellSize: float, originX: float = None, originY: float = None):
+        self.cellSize = cellSize
+        originX = x.min() if originX is None else originX
+        originY = y.min() if originY is None else originY
+
+        column = np.floor((x - originX) / cellSize).astype(np.int64)
+        # Rows are shifted by 2 so that neighbour keys (row - 2 .. row + 2) never wrap into another column
+        row = np.floor((y - originY) / cellSize).astype(np.int64) + 2
+        self.rowLength = int(row.max()) + 3
+        keys = column * self.rowLength + row
+
+        self.order = np.argsort(keys, kind='stable')
+        self.keys, self.starts, self.counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.x = x[self.order]
+        self.y = y[self.order]
+
+        self.pointCell = np.empty(len(x), dtype=np.int64)
+        self.pointCell[self.order] = np.repeat(np.arange(len(self.keys)), self.counts)
+
+    def neighbourPairs(self, dx: int, dy: int):
+        """Indexes of the occupied cells (a, b) such that b is at offset (dx, dy) of a."""
+        neighbourKeys = self.keys + dx * self.rowLength + dy
+        position = np.searchsorted(self.keys, neighbourKeys)
+        position[position == len(self.keys)] = 0
+        found = self.keys[position] == neighbourKeys
+        return np.nonzero(found)[0], position[found]
+
+def expandPairs(startsA, countsA, startsB, countsB):
+    """Enumerates every (i, j) with i in range A and j in range B, for each pair of ranges."""
+    products = countsA * countsB
+    rangeIndex = np.repeat(np.arange(len(products)), products)
+    local = np.arange(products.sum()) - np.repeat(np.cumsum(products) - products, products)
+    countB = countsB[rangeIndex]
+    return rangeIndex, startsA[rangeIndex] + local // countB, startsB[rangeIndex] + local % countB
+
+def splitRanges(cellA, cellB, grid: CellGrid):
+    """Splits the rows of cell A so that no range pair expands to more than MAX_PAIRS_PER_BATCH pairs."""
+    countsA = grid.counts[cellA]
+    countsB = grid.counts[cellB]
+    rowsPerPiece = np.maximum(1, MAX_PAIRS_PER_BATCH // countsB)
+    pieces = -(-countsA // rowsPerPiece)
+
+    rangeIndex = np.repeat(np.arange(len(cellA)), pieces)
+    pieceIndex = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    offset = pieceIndex * rowsPerPiece[rangeIndex]
+    count = np.minimum(rowsPerPiece[rangeIndex], countsA[rangeIndex] - offset)
+
+    return cellA[rangeIndex], cellB[rangeIndex], grid.starts[cellA[rangeIndex]] + offset, count
+
+def linkNeighbourCells(unionFind: UnionFind, grid: CellGrid, linkDistance: float, cellA, cellB, nodeOfCell=None):
+    """
+    Unions the cells of every pair (cellA, cellB) that holds at least two points within linkDistance.
+    nodeOfCell maps cells to union-find nodes when the union-find is not indexed by cell.
+    """
+    cellA, cellB, startsA, countsA = splitRanges(cellA, cellB, grid)
+    nodeA = cellA if nodeOfCell is None else nodeOfCell[cellA]
+    nodeB = cellB if nodeOfCell is None else nodeOfCell[cellB]
+    startsB = grid.starts[cellB]
+    countsB = grid.counts[cellB]
+    cumulative = np.cumsum(countsA * countsB)
+    squaredDistance = linkDistance * linkDistance
+
+    batchStart = 0
+    while batchStart < len(cellA):
+        consumed = cumulative[batchStart - 1] if batchStart > 0 else 0
+        batchEnd = max(batchStart + 1, int(np.searchsorted(cumulative, consumed + MAX_PAIRS_PER_BATCH, side='right')))
+        batch = np.arange(batchStart, batchEnd)
+        batchStart = batchEnd
+
+        # Pairs of cells already connected (by a previous batch or offset) do not need any distance check
+        batch = batch[unionFind.find(nodeA[batch]) != unionFind.find(nodeB[batch])]
+        if len(batch) == 0:
+            continue
+
+        rangeIndex, i, j = expandPairs(startsA[batch], countsA[batch], startsB[batch], countsB[batch])
+        close = (grid.x[i] - grid.x[j]) ** 2 + (grid.y[i] - grid.y[j]) ** 2 <= squaredDistance
+        linked = batch[np.unique(rangeIndex[close])]
+        unionFind.union(nodeA[linked], nodeB[linked])
+
+def labelsByFirstAppearance(roots):
+    """Renumbers arbitrary component roots as 0..k-1, in order of first appearance."""
+    _, firstIndex, inverse = np.unique(roots, return_index=True, return_inverse=True)
+    rank = np.empty(len(firstIndex), dtype=np.int64)
+    rank[np.argsort(firstIndex, kind='stable')] = np.arange(len(firstIndex))
+    return rank[inverse]
+
+def clusterByDistance(x, y, linkDistance: float, feedback=None):
+    """
+    Single-linkage clustering of points: two points belong to the same cluster when a chain of points,
+    each at most linkDistance from the next, connects them.
+
+    Returns (labels, sizes): the cluster of each point, numbered 0..k-1 by first appearance, and the
+    number of points of that cluster. Returns None if canceled.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    if len(x) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    if linkDistance <= 0:
+        labels = np.arange(len(x), dtype=np.int64)
+        return labels, np.ones(len(x), dtype=np.int64)
+
+    grid = CellGrid(x, y, linkDistance / math.sqrt(2))
+    unionFind = UnionFind(len(grid.keys))
+
+    for step, (dx, dy) in enumerate(NEIGHBOUR_OFFSETS):
+        if feedback is not None:
+            if feedback.isCanceled():
+                return None
+            feedback.setProgress(100 * step / len(NEIGHBOUR_OFFSETS))
+
+        cellA, cellB = grid.neighbourPairs(dx, dy)
+        linkNeighbourCells(unionFind, grid, linkDistance, cellA, cellB)
+
+    labels = labelsByFirstAppearance(unionFind.find(grid.pointCell))
+    return labels, np.bincount(labels)[labels]
@@ -0,0 +1,43 @@
+import numpy as np
+
+def electedValues(groups, values, electMax: bool):
+    """
+    Grouped max (or min) of values. Returns (groupKeys, elected), sorted by group key.
+    NaN values are ignored; groups holding only NaN values elect NaN.
+    """
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+
+    groupKeys, inverse = np.unique(groups, return_inverse=True)
+    elected = np.full(len(groupKeys), np.nan)
+    if not valid.any():
+        return groupKeys, elected
+
+    inverse = inverse[valid]
+    values = values[valid]
+    order = np.argsort(inverse, kind='stable')
+    sortedGroups = inverse[order]
+    starts = np.flatnonzero(np.r_[True, sortedGroups[1:] != sortedGroups[:-1]])
+
+    reduce = np.maximum.reduceat if electMax else np.minimum.reduceat
+    elected[sortedGroups[starts]] = reduce(values[order], starts)
+    return groupKeys, elected
+
+def electGroupMembers(groups, values, eligible, electMax: bool):
+    """
+    Mask of the eligible members holding the highest (or lowest) value of their group among eligible
+    members. Every member tied with the elected value wins.
+    """
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype=np.float64)
+    eligible = np.asarray(eligible, dtype=bool)
+    winners = np.zeros(len(values), dtype=bool)
+
+    if not eligible.any():
+        return winners
+
+    groupKeys, elected = electedValues(groups[eligible], values[eligible], electMax)
+    position = np.searchsorted(groupKeys, groups[eligible])
+    winners[eligible] = values[eligible] == elected[position]
+    return winners
@@ -0,0 +1,64 @@
+import math
+import numpy as np
+
+def nearestToGridPoints(x, y, extent, spacing: float):
+    """
+    Grid points are laid out like native:creategrid: columns from the left edge and rows from the top
+    edge of the extent, spacing apart. Each grid point picks the closest point within spacing / 2.
+
+    Returns the indexes of the picked points. A point can only be within spacing / 2 of the grid point
+    of its own cell, so each point is binned into that cell instead of materializing the grid.
+    """
+    xMin, yMin, xMax, yMax = extent
+    columns = max(1, math.ceil((xMax - xMin) / spacing))
+    rows = max(1, math.ceil((yMax - yMin) / spacing))
+
+    column = np.rint((x - xMin) / spacing)
+    row = np.rint((yMax - y) / spacing)
+    squaredDistance = (x - (xMin + column * spacing)) ** 2 + (y - (yMax - row * spacing)) ** 2
+
+    candidates = np.flatnonzero(
+        (column >= 0) & (column < columns) & (row >= 0) & (row < rows) &
+        (squaredDistance <= (spacing / 2) ** 2)
+    )
+    if len(candidates) == 0:
+        return candidates
+
+    cells = row[candidates].astype(np.int64) * columns + column[candidates].astype(np.int64)
+    order = np.lexsort((squaredDistance[candidates], cells))
+    sortedCells = cells[order]
+    first = np.r_[True, sortedCells[1:] != sortedCells[:-1]]
+    return candidates[order[first]]
+
+def gridVisibilityOffsets(x, y, extent, initialSpacing: float, nLevels: int, feedback=None, checkpoint=None):
+    """
+    First level at which each point is the closest one to a grid point, the grid spacing being halved
+    at every level. Points never picked get nLevels. Memory grows with the number of points only.
+    The points picked at every level are saved to the checkpoint (if any), and a saved run is resumed.
+    Returns None if canceled.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    offsets = np.full(len(x), nLevels, dtype=np.int32)
+    firstLevel = 0
+
+    saved = checkpoint.load() if checkpoint is not None else None
+    if saved is not None:
+        for level, arrays in saved:
+            offsets[arrays['accepted']] = level
+        firstLevel = saved[-1][0] + 1
+
+    for level in range(firstLevel, nLevels):
+        if feedback is not None:
+            if feedback.isCanceled():
+                return None
+            feedback.setProgress(100 * level / nLevels)
+
+        picked = nearestToGridPoints(x, y, extent, initialSpacing / 2**level)
+        accepted = picked[offsets[picked] > level]
+        offsets[accepted] = level
+
+        if checkpoint is not None:
+            checkpoint.save(level, accepted=accepted)
+
+    return offsets
@@ -0,0 +1,42 @@
+import math
+import numpy as np
+
+class HillshadeKernel:
+    """
+    Hillshade with the same formula as gdaldem (Horn gradients, no edges). Gradients are computed once per
+    block and shared by every light source, so adding light sources does not add DEM reads or slope work.
+    """
+
+    def __init__(self, ewres: float, nsres: float, zFactor: float = 1, scale: float = 1, altitude: float = 45):
+        # nsres is the (usually negative) pixel height of the geotransform, as gdaldem uses it
+        self.ewres = ewres
+        self.nsres = nsres
+        self.zScaled = zFactor / (8 * scale)
+        self.sinAltitude = math.sin(math.radians(altitude))
+        self.cosAltitude = math.cos(math.radians(altitude))
+
+    def gradients(self, dem):
+        """Horn gradients of the inner pixels of a block read with a 1 pixel halo. NaN where the 3x3 window has nodata."""
+        a, b, c = dem[:-2, :-2], dem[:-2, 1:-1], dem[:-2, 2:]
+        d, e, f = dem[1:-1, :-2], dem[1:-1, 1:-1], dem[1:-1, 2:]
+        g, h, i = dem[2:, :-2], dem[2:, 1:-1], dem[2:, 2:]
+
+        x = ((a + 2 * d + g) - (c + 2 * f + i)) / self.ewres
+        y = ((g + 2 * h + i) - (a + 2 * b + c)) / self.nsres
+
+        # Like gdaldem, any nodata in the window (the center included) gives nodata
+        invalid = np.isnan(x) | np.isnan(y) | np.isnan(e)
+        x[invalid] = np.nan
+        y[invalid] = np.nan
+        return x, y
+
+    def shade(self, x, y, azimuth: float):
+        """Byte hillshade values (1..255, NaN for nodata) for one light source."""
+        azimuth = math.radians(azimuth)
+        numerator = self.sinAltitude - (y * math.cos(azimuth) - x * math.sin(azimuth)) * self.cosAltitude * self.zScaled
+        cang = numerator / np.sqrt(1 + self.zScaled * self.zScaled * (x * x + y * y))
+        return np.rint(np.where(cang <= 0, 1, 1 + 254 * cang))
+
+    def combinedShade(self, x, y, azimuths: list[float]):
+        """Mean of the hillshades of several light sources."""
+        return sum(self.shade(x, y, azimuth) for azimuth in azimuths) / len(azimuths)
@@ -0,0 +1,109 @@
+import math
+import numpy as np
+from qgis.core import QgsRasterLayer, QgsUnitTypes
+from .rasterIO import toByte
+
+# OGC standardized rendering pixel size, used to turn map scales into ground resolutions
+PIXEL_SIZE_METERS = 0.00028
+
+# Overviews are not built below this size (longest side, in pixels)
+MIN_OVERVIEW_SIZE = 256
+
+def overviewFactors(width: int, height: int, pixelSizeMeters: float, scales: list[float] = None):
+    """
+    Power of two decimation factors whose resolution is the closest to the one of each map scale coarser
+    than the raster. Without scales, every factor down to MIN_OVERVIEW_SIZE.
+    """
+    largest = max(width, height)
+    if largest < 2 * MIN_OVERVIEW_SIZE:
+        return []
+
+    maxFactor = 2**int(math.floor(math.log2(largest / MIN_OVERVIEW_SIZE)))
+    if not scales:
+        return [2**level for level in range(1, int(math.log2(maxFactor)) + 1)]
+
+    factors = set()
+    for scale in scales:
+        factor = 2**int(round(math.log2(max(1e-9, scale * PIXEL_SIZE_METERS / pixelSizeMeters))))
+        if factor >= 2:
+            factors.add(min(factor, maxFactor))
+
+    return sorted(factors)
+
+def layerOverviewFactors(layer: QgsRasterLayer, project):
+    """Overview factors of an output with the size and resolution of layer, for the project scales."""
+    metersPerUnit = QgsUnitTypes.fromUnitToUnitFactor(layer.crs().mapUnits(), QgsUnitTypes.DistanceMeters)
+    scales = project.viewSettings().mapScales() if project is not None else []
+    return overviewFactors(layer.width(), layer.height(), layer.rasterUnitsPerPixelX() * metersPerUnit, scales)
+
+def reduceByte(values, factor: int, noData: int):
+    """Mean of every factor x factor square of a Byte array, ignoring noData. Partial squares on the edges count."""
+    height, width = values.shape
+    rows, columns = -(-height // factor), -(-width // factor)
+    padded = np.full((rows * factor, columns * factor), np.nan)
+    padded[:height, :width] = np.where(values == noData, np.nan, values)
+
+    valid = ~np.isnan(padded)
+    sums = np.where(valid, padded, 0).reshape(rows, factor, columns, factor).sum(axis=(1, 3))
+    counts = valid.reshape(rows, factor, columns, factor).sum(axis=(1, 3))
+    means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+    return toByte(means, noData)
+
+class OverviewBuilder:
+    """
+    Fills the internal overviews of a single band Byte output while its blocks are written, so the full
+    resolution is never read back. Windows must start at multiples of blockSize. Factors dividing
+    blockSize are reduced from every written block. For multiples of blockSize, the sum and count of
+    valid pixels of every block are kept in memory and reduced at the end.
+    """
+
+    def __init__(self, dataset, factors: list[int], blockSize: int, noData: int):
+        self.factors = sorted(factors)
+        self.noData = noData
+        self.band = dataset.GetRasterBand(1)
+        self.overviews = {}
+
+        if len(self.factors) > 0:
+            # Overviews are only allocated here, their pixels are written by write and finish
+            dataset.BuildOverviews('NONE', self.factors)
+            for index in range(self.band.GetOverviewCount()):
+                overview = self.band.GetOverview(index)
+                for factor in self.factors:
+                    if overview.XSize == -(-dataset.RasterXSize // factor) and overview.YSize == -(-dataset.RasterYSize // factor):
+                        self.overviews.setdefault(factor, overview)
+
+        self.blockSize = blockSize
+        self.blockFactors = [factor for factor in self.factors if blockSize % factor == 0 and factor in self.overviews]
+        self.largeFactors = [factor for factor in self.factors if factor > blockSize and factor % blockSize == 0 and factor in self.overviews]
+
+        rows, columns = -(-dataset.RasterYSize // blockSize), -(-dataset.RasterXSize // blockSize)
+        self.blockSums = np.zeros((rows, columns), dtype=np.int64)
+        self.blockCounts = np.zeros((rows, columns), dtype=np.int64)
+
+    def write(self, window, values):
+        xoff, yoff, _, _ = window
+        for factor in self.blockFactors:
+            self.overviews[factor].WriteArray(reduceByte(values, factor, self.noData), xoff // factor, yoff // factor)
+
+        if len(self.largeFactors) > 0:
+            valid = values != self.noData
+            self.blockSums[yoff // self.blockSize, xoff // self.blockSize] = values.sum(where=valid, dtype=np.int64)
+            self.blockCounts[yoff // self.blockSize, xoff // self.blockSize] = np.count_nonzero(valid)
+
+    def finish(self):
+        for factor in self.largeFactors:
+            step = factor // self.blockSize
+            rows, columns = -(-self.blockSums.shape[0] // step), -(-self.blockSums.shape[1] // step)
+            sums = np.zeros((rows * step, columns * step), dtype=np.int64)
+            counts = np.zeros((rows * step, columns * step), dtype=np.int64)
+            sums[:self.blockSums.shape[0], :self.blockSums.shape[1]] = self.blockSums
+            counts[:self.blockCounts.shape[0], :self.blockCounts.shape[1]] = self.blockCounts
+
+            sums = sums.reshape(rows, step, columns, step).sum(axis=(1, 3))
+            counts = counts.reshape(rows, step, columns, step).sum(axis=(1, 3))
+            means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+            overview = self.overviews[factor]
+            overview.WriteArray(toByte(means, self.noData)[:overview.YSize, :overview.XSize], 0, 0)
+
+        for overview in self.overviews.values():
+            overview.FlushCache()
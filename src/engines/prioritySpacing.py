@@ -0,0 +1,239 @@
+import math
+import numpy as np
+from .distanceClustering import CellGrid
+
+# Cell side slightly under spacing / sqrt(2): two points sharing a cell are always closer than the spacing
+CELL_SIDE_FACTOR = (1 - 1e-9) / math.sqrt(2)
+
+# Points closer than the spacing can be up to two cells away (corners included, due to the factor above)
+NEIGHBOUR_OFFSETS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if dx != 0 or dy != 0]
+
+# Candidates decided together by acceptWithSpacing. Chunks stop after MAX_ROUNDS_PER_CHUNK rounds, which
+# halves the next ones, and chunks that take a quarter of it double the next ones
+MIN_CHUNK_SIZE = 16
+MAX_CHUNK_SIZE = 65536
+MAX_ROUNDS_PER_CHUNK = 16
+
+# Accepted points are indexed by cell key in a dense array while keys span at most this many cells per point
+DENSE_CELLS_PER_POINT = 4
+
+def priorityRanks(values, highestFirst: bool):
+    """Position of each feature when sorted by priority. NaN values come last, ties keep feature order."""
+    values = np.asarray(values, dtype=np.float64)
+    keys = -values if highestFirst else values.copy()
+    keys[np.isnan(keys)] = np.inf
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[np.argsort(keys, kind='stable')] = np.arange(len(values))
+    return ranks
+
+def neighbourCellPositions(cellKeys, sortedKeys, dx: int, dy: int, rowLength: int):
+    """Position in sortedKeys of the cell (dx, dy) away from each of cellKeys, -1 where there is none."""
+    neighbourKeys = cellKeys + dx * rowLength + dy
+    position = np.minimum(np.searchsorted(sortedKeys, neighbourKeys), len(sortedKeys) - 1)
+    return np.where(sortedKeys[position] == neighbourKeys, position, -1)
+
+class AcceptedCells:
+    """
+    Accepted point of every cell of a grid (at most one, see acceptWithSpacing), looked up by cell key in a
+    dense array when the grid is not much larger than the number of points, and by binary search in the
+    cell keys otherwise.
+    """
+
+    def __init__(self, grid: CellGrid, nPoints: int):
+        self.grid = grid
+        # Keys of neighbour cells go up to 2 columns and 2 rows away on both sides
+        self.padding = 2 * grid.rowLength + 2
+        size = int(grid.keys[-1]) + 2 * self.padding + 1
+        self.dense = size <= DENSE_CELLS_PER_POINT * nPoints
+        self.points = np.full(size if self.dense else len(grid.keys), -1, dtype=np.int64)
+
+    def slots(self, cells):
+        return self.grid.keys[cells] + self.padding if self.dense else cells
+
+    def add(self, points):
+        self.points[self.slots(self.grid.pointCell[points])] = points
+
+    def inCells(self, cells):
+        return self.points[self.slots(cells)]
+
+    def around(self, cellKeys, dx: int, dy: int):
+        """Accepted point of the cell (dx, dy) away from each of cellKeys, -1 where there is none."""
+        if self.dense:
+            return self.points[cellKeys + (self.padding + dx * self.grid.rowLength + dy)]
+
+        position = neighbourCellPositions(cellKeys, self.grid.keys, dx, dy, self.grid.rowLength)
+        return np.where(position >= 0, self.points[position], -1)
+
+def acceptWithSpacing(x, y, ranks, accepted, spacing: float):
+    """
+    Indexes of the points a greedy pass in rank order accepts, a point being accepted when it is farther
+    than spacing from every point accepted before it (the already accepted points included).
+
+    Cells are of side ~spacing / sqrt(2), so a cell holds at most one accepted point. Candidates are taken
+    in rank ordered chunks: the ones near a point accepted before the chunk are rejected through the
+    AcceptedCells, and the rest are decided by acceptChunk. The greedy pass can be split at any rank, so
+    the result is the same. Chunks shrink when they need many rounds (e.g. priority following a gradient,
+    where few points are local maxima) and grow back when they need few, bounding the work per point.
+    """
+    accepted = np.asarray(accepted, dtype=bool)
+    if accepted.all():
+        return np.empty(0, dtype=np.int64)
+
+    grid = CellGrid(x, y, spacing * CELL_SIDE_FACTOR)
+    acceptedCells = AcceptedCells(grid, len(x))
+    acceptedCells.add(np.flatnonzero(accepted))
+
+    candidates = np.flatnonzero(~accepted)
+    candidates = candidates[np.argsort(ranks[candidates], kind='stable')]
+    chunkSize = MAX_CHUNK_SIZE
+    newlyAccepted = []
+    start = 0
+
+    while start < len(candidates):
+        chunk = candidates[start:start + chunkSize]
+        start += len(chunk)
+
+        chunk = chunk[~nearAccepted(grid, x, y, acceptedCells, chunk, spacing)]
+        chunkAccepted, undecided, rounds = acceptChunk(grid, x, y, ranks, chunk, spacing, MAX_ROUNDS_PER_CHUNK)
+        acceptedCells.add(chunkAccepted)
+        newlyAccepted.append(chunkAccepted)
+
+        if len(undecided) > 0:
+            # Undecided candidates rank before the ones not taken yet, so they go back in front of them
+            start -= len(undecided)
+            candidates[start:start + len(undecided)] = undecided[np.argsort(ranks[undecided], kind='stable')]
+            chunkSize = max(MIN_CHUNK_SIZE, chunkSize // 2)
+        elif rounds <= MAX_ROUNDS_PER_CHUNK // 4:
+            chunkSize = min(MAX_CHUNK_SIZE, chunkSize * 2)
+
+    return np.concatenate(newlyAccepted) if len(newlyAccepted) > 0 else np.empty(0, dtype=np.int64)
+
+def nearAccepted(grid: CellGrid, x, y, acceptedCells: AcceptedCells, points, spacing: float):
+    """Mask of the points within spacing of an accepted point."""
+    # Looking up sorted keys is much faster than looking them up in rank order
+    order = np.argsort(grid.pointCell[points], kind='stable')
+    sortedPoints = points[order]
+    cells = grid.pointCell[sortedPoints]
+    near = acceptedCells.inCells(cells) >= 0
+    cellKeys = grid.keys[cells]
+
+    for dx, dy in NEIGHBOUR_OFFSETS:
+        other = acceptedCells.around(cellKeys, dx, dy)
+        found = np.flatnonzero((other >= 0) & ~near)
+        a, b = sortedPoints[found], other[found]
+        near[found[(x[a] - x[b]) ** 2 + (y[a] - y[b]) ** 2 <= spacing * spacing]] = True
+
+    result = np.empty(len(points), dtype=bool)
+    result[order] = near
+    return result
+
+def acceptChunk(grid: CellGrid, x, y, ranks, points, spacing: float, maxRounds: int):
+    """
+    Greedy pass over points that no previously accepted point rejects, decided in rounds: every accepted
+    point rejects the candidates within spacing around it, so the best candidate left in a cell can be
+    accepted once no neighbour cell has a better one. That is the decision the sequential pass would
+    take, and the best candidate overall is accepted in every round. Decisions are final, so the pass can
+    stop after maxRounds. Returns (accepted, undecided, rounds).
+    """
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0
+
+    # Candidates of each cell are a contiguous slice sorted by rank, ptr pointing to the best undecided one
+    points = points[np.lexsort((ranks[points], grid.pointCell[points]))]
+    cells, ptr, counts = np.unique(grid.pointCell[points], return_index=True, return_counts=True)
+    end = ptr + counts
+    rejected = np.zeros(len(points), dtype=bool)
+
+    # Neighbour cell pairs of the chunk, as positions in cells
+    cellKeys = grid.keys[cells]
+    index, neighbour = [], []
+    for dx, dy in NEIGHBOUR_OFFSETS:
+        position = neighbourCellPositions(cellKeys, cellKeys, dx, dy, grid.rowLength)
+        found = np.flatnonzero(position >= 0)
+        index.append(found)
+        neighbour.append(position[found])
+    index, neighbour = np.concatenate(index), np.concatenate(neighbour)
+
+    active = np.arange(len(cells))
+    newlyAccepted = []
+    rounds = 0
+
+    while True:
+        # Moves every pointer to the next candidate not rejected yet
+        remaining = np.append(np.flatnonzero(~rejected), len(points))
+        ptr[active] = np.minimum(remaining[np.searchsorted(remaining, ptr[active])], end[active])
+        active = active[ptr[active] < end[active]]
+        if len(active) == 0 or rounds == maxRounds:
+            break
+
+        rounds += 1
+        # Decided cells never become active again, so their pairs are dropped for the next rounds
+        isActive = np.zeros(len(cells), dtype=bool)
+        isActive[active] = True
+        pairs = isActive[index] & isActive[neighbour]
+        index, neighbour = index[pairs], neighbour[pairs]
+        pairIndex, pairNeighbour = index, neighbour
+
+        waiting = np.zeros(len(cells), dtype=bool)
+        waiting[pairIndex[ranks[points[ptr[pairNeighbour]]] < ranks[points[ptr[pairIndex]]]]] = True
+        winners = active[~waiting[active]]
+        winnerPoints = points[ptr[winners]]
+        newlyAccepted.append(winnerPoints)
+
+        # Candidates in neighbour cells are checked against the winner, the ones sharing its cell are always closer
+        isWinner = np.zeros(len(cells), dtype=bool)
+        isWinner[winners] = True
+        winnerOf = np.full(len(cells), -1, dtype=np.int64)
+        winnerOf[winners] = winnerPoints
+        near = isWinner[pairIndex] & ~isWinner[pairNeighbour]
+        winnerPoint, cell = winnerOf[pairIndex[near]], pairNeighbour[near]
+        ptr[winners] = end[winners]
+
+        counts = end[cell] - ptr[cell]
+        rangeIndex = np.repeat(np.arange(len(cell)), counts)
+        local = np.arange(len(rangeIndex)) - np.repeat(np.cumsum(counts) - counts, counts)
+        position = ptr[cell[rangeIndex]] + local
+        a, b = winnerPoint[rangeIndex], points[position]
+        rejected[position[(x[a] - x[b]) ** 2 + (y[a] - y[b]) ** 2 <= spacing * spacing]] = True
+
+    counts = end[active] - ptr[active]
+    position = np.repeat(ptr[active] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    undecided = points[position[~rejected[position]]]
+    return np.concatenate(newlyAccepted), undecided, rounds
+
+def spacingVisibilityOffsets(x, y, values, highestFirst: bool, initialSpacing: float, nLevels: int, feedback=None, checkpoint=None):
+    """
+    First level at which each point is accepted, features being visited by priority and accepted when
+    farther than the spacing of the level from the features accepted so far. The spacing is halved at
+    every level and accepted features stay accepted. Points never accepted get nLevels.
+    The points accepted at every level are saved to the checkpoint (if any), and a saved run is resumed.
+    Returns None if canceled.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    offsets = np.full(len(x), nLevels, dtype=np.int32)
+    if len(x) == 0:
+        return offsets
+
+    ranks = priorityRanks(values, highestFirst)
+    firstLevel = 0
+
+    saved = checkpoint.load() if checkpoint is not None else None
+    if saved is not None:
+        for level, arrays in saved:
+            offsets[arrays['accepted']] = level
+        firstLevel = saved[-1][0] + 1
+
+    for level in range(firstLevel, nLevels):
+        if feedback is not None:
+            if feedback.isCanceled():
+                return None
+            feedback.setProgress(100 * level / nLevels)
+
+        accepted = acceptWithSpacing(x, y, ranks, offsets < nLevels, initialSpacing / 2**level)
+        offsets[accepted] = level
+
+        if checkpoint is not None:
+            checkpoint.save(level, accepted=accepted)
+
+    return offsets
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+from osgeo import gdal
+from qgis.core import QgsRasterLayer, QgsRasterFileWriter, QgsProcessingException
+
+DEFAULT_BLOCK_SIZE = 1024
+
+# Internal tiles of tiled outputs. Processing blocks are a multiple of it, so each block fills whole tiles
+OUTPUT_TILE_SIZE = 512
+
+def rasterPath(layer: QgsRasterLayer):
+    """Path GDAL can open for a raster layer. Only layers read by the GDAL provider are supported."""
+    if layer is None or layer.providerType() != 'gdal':
+        raise QgsProcessingException('This engine only reads rasters opened by the GDAL provider. Use the legacy engine instead.')
+
+    return layer.source()
+
+def openRaster(path: str):
+    dataset = gdal.Open(path, gdal.GA_ReadOnly)
+    if dataset is None:
+        raise QgsProcessingException(f'Could not open raster {path}')
+
+    return dataset
+
+def tiledCreationOptions():
+    """GTiff creation options of tiled and compressed outputs: ZSTD when GDAL has it, DEFLATE otherwise."""
+    options = gdal.GetDriverByName('GTiff').GetMetadataItem('DMD_CREATIONOPTIONLIST') or ''
+    compression = 'ZSTD' if 'ZSTD' in options else 'DEFLATE'
+    return ['TILED=YES', f'BLOCKXSIZE={OUTPUT_TILE_SIZE}', f'BLOCKYSIZE={OUTPUT_TILE_SIZE}', f'COMPRESS={compression}', 'PREDICTOR=2', 'BIGTIFF=IF_SAFER']
+
+def createRaster(path: str, like, dataType, noData=None, creationOptions=None, tiled: bool = False):
+    """
+    Creates a single band raster with the size, geotransform and CRS of another dataset. tiled only
+    applies to GeoTIFF outputs.
+    """
+    driverName = QgsRasterFileWriter.driverForExtension(os.path.splitext(path)[1]) or 'GTiff'
+    driver = gdal.GetDriverByName(driverName)
+    if driver is None:
+        raise QgsProcessingException(f'GDAL driver {driverName} is not available')
+
+    if tiled and driverName == 'GTiff':
+        creationOptions = tiledCreationOptions() + (creationOptions or [])
+
+    dataset = driver.Create(path, like.RasterXSize, like.RasterYSize, 1, dataType, creationOptions or [])
+    if dataset is None:
+        raise QgsProcessingException(f'Could not create raster {path}')
+
+    dataset.SetGeoTransform(like.GetGeoTransform())
+    dataset.SetProjection(like.GetProjection())
+    if noData is not None:
+        dataset.GetRasterBand(1).SetNoDataValue(noData)
+
+    return dataset
+
+def blockWindows(width: int, height: int, blockSize: int = DEFAULT_BLOCK_SIZE):
+    """Windows (xoff, yoff, xsize, ysize) covering the raster, row by row."""
+    for yoff in range(0, height, blockSize):
+        for xoff in range(0, width, blockSize):
+            yield xoff, yoff, min(blockSize, width - xoff), min(blockSize, height - yoff)
+
+def readBlock(band, window):
+    """Reads a window as float64, nodata pixels becoming NaN."""
+    xoff, yoff, xsize, ysize = window
+    values = band.ReadAsArray(xoff, yoff, xsize, ysize).astype(np.float64)
+    noData = band.GetNoDataValue()
+    if noData is not None:
+        values[values == noData] = np.nan
+
+    return values
+
+def readPaddedBlock(band, window, halo: int):
+    """Reads a window grown by halo pixels on every side. Pixels outside the raster are NaN."""
+    xoff, yoff, xsize, ysize = window
+    left, top = max(0, xoff - halo), max(0, yoff - halo)
+    right = min(band.XSize, xoff + xsize + halo)
+    bottom = min(band.YSize, yoff + ysize + halo)
+
+    values = np.full((ysize + 2 * halo, xsize + 2 * halo), np.nan)
+    rowStart, columnStart = top - (yoff - halo), left - (xoff - halo)
+    values[rowStart:rowStart + bottom - top, columnStart:columnStart + right - left] = readBlock(band, (left, top, right - left, bottom - top))
+    return values
+
+def reportStep(feedback, message: str):
+    if feedback is not None:
+        feedback.pushInfo(message)
+
+def toByte(values, noData: int):
+    """Rounds and clamps to 0..255 like GDAL does when writing floats to a Byte band. NaN becomes noData."""
+    invalid = np.isnan(values)
+    result = np.clip(np.rint(np.where(invalid, 0, values)), 0, 255).astype(np.uint8)
+    result[invalid] = noData
+    return result
@@ -0,0 +1,90 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from qgis.core import QgsApplication
+from .rasterIO import DEFAULT_BLOCK_SIZE, openRaster, blockWindows
+
+def defaultWorkerCount():
+    """Threads allowed by the QGIS rendering settings (-1 meaning all cores)."""
+    maxThreads = QgsApplication.maxThreads()
+    return maxThreads if maxThreads > 0 else (os.cpu_count() or 1)
+
+class ThreadLocalRaster:
+    """
+    GDAL datasets must not be shared between threads, so every worker thread opens its own read only
+    handle of the raster the first time it asks for a band.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.datasets = []
+
+    def band(self, index: int = 1):
+        dataset = getattr(self.local, 'dataset', None)
+        if dataset is None:
+            dataset = openRaster(self.path)
+            self.local.dataset = dataset
+            with self.lock:
+                self.datasets.append(dataset)
+
+        return dataset.GetRasterBand(index)
+
+    def close(self):
+        with self.lock:
+            self.datasets.clear()
+
+class BlockScheduler:
+    """
+    Splits a raster into windows and processes them on a thread pool (GDAL reads and NumPy kernels release
+    the GIL). Results are handed to the write callback on the calling thread, in window order, so outputs
+    are written sequentially. At most maxInFlight windows are being processed or waiting to be written,
+    which bounds memory to maxInFlight blocks whatever the raster size.
+
+    halo is the number of extra pixels a kernel needs around each window (1 for 3x3 kernels). Windows do
+    not overlap: process functions read their window grown by halo, e.g. with readPaddedBlock.
+    """
+
+    def __init__(self, width: int, height: int, blockSize: int = DEFAULT_BLOCK_SIZE, halo: int = 0, workers: int = None, maxInFlight: int = None):
+        self.width = width
+        self.height = height
+        self.blockSize = blockSize
+        self.halo = halo
+        self.workers = max(1, workers or defaultWorkerCount())
+        self.maxInFlight = max(1, maxInFlight or 2 * self.workers)
+
+    def windows(self):
+        return list(blockWindows(self.width, self.height, self.blockSize))
+
+    def run(self, process, write=None, feedback=None, progressStart: float = 0, progressEnd: float = 100):
+        """
+        Calls process(window) for every window on the pool and write(window, result) in window order.
+        Returns False if canceled.
+        """
+        windows = self.windows()
+        pending = deque()
+        nextWindow = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for current in range(len(windows)):
+                    while nextWindow < len(windows) and len(pending) < self.maxInFlight:
+                        pending.append((windows[nextWindow], executor.submit(process, windows[nextWindow])))
+                        nextWindow += 1
+
+                    window, future = pending.popleft()
+                    result = future.result()
+                    if write is not None:
+                        write(window, result)
+
+                    if feedback is not None:
+                        if feedback.isCanceled():
+                            return False
+                        feedback.setProgress(progressStart + (progressEnd - progressStart) * (current + 1) / len(windows))
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+        return True
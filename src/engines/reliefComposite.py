@@ -0,0 +1,35 @@
+import numpy as np
+
+# Brightness, contrast and opacity ShadedReliefCreator gives to the layers it loads. The bottom hillshade
+# is multiplied and the top one overlaid on what is below them.
+BOTTOM_BRIGHTNESS = 40
+BOTTOM_CONTRAST = -25
+TOP_BRIGHTNESS = -40
+TOP_CONTRAST = -25
+LAYER_OPACITY = 0.5
+
+def brightnessContrast(values, brightness: int, contrast: int):
+    """Same formula as QgsBrightnessContrastFilter on opaque pixels, for 0..255 gray values."""
+    factor = ((contrast + 100) / 100) ** 2
+    return np.clip(np.trunc(255 * ((values / 255 - 0.5) * factor + 0.5)) + brightness, 0, 255)
+
+def multiply(base, layer):
+    return base * layer / 255
+
+def overlay(base, layer):
+    return np.where(2 * base < 255, 2 * base * layer / 255, 255 - 2 * (255 - base) * (255 - layer) / 255)
+
+def compositeRelief(bottom, top, background: float = 255):
+    """
+    Gray values of the bottom and top hillshades drawn like QGIS draws the layers of ShadedReliefCreator
+    over a white background. Nodata (NaN) pixels of a layer leave what is below unchanged, and pixels
+    that are nodata in both layers stay NaN.
+    """
+    result = np.full(np.shape(bottom), float(background))
+    for values, brightness, contrast, blend in [(bottom, BOTTOM_BRIGHTNESS, BOTTOM_CONTRAST, multiply), (top, TOP_BRIGHTNESS, TOP_CONTRAST, overlay)]:
+        adjusted = brightnessContrast(values, brightness, contrast)
+        blended = (1 - LAYER_OPACITY) * result + LAYER_OPACITY * blend(result, adjusted)
+        result = np.where(np.isnan(values), result, blended)
+
+    result[np.isnan(bottom) & np.isnan(top)] = np.nan
+    return result
@@ -0,0 +1,149 @@
+import numpy as np
+from osgeo import gdal
+from .rasterIO import openRaster, createRaster, readBlock, readPaddedBlock, reportStep, toByte
+from .rasterScheduler import BlockScheduler, ThreadLocalRaster
+from .overviews import OverviewBuilder
+from .hillshade import HillshadeKernel
+from .aerialPerspective import OUTPUT_NO_DATA, ContrastLookup, denormalize, normalize
+from .reliefComposite import compositeRelief
+from ..utils.rasterStatistics import rasterMinMax
+
+def parseAzimuths(text: str):
+    """Azimuths from a comma separated list, e.g. '315, 337.5'. Returns None for an empty list."""
+    azimuths = [float(value) % 360 for value in text.replace(';', ',').split(',') if value.strip() != '']
+    return azimuths if len(azimuths) > 0 else None
+
+def compositeByte(bottom, top):
+    """
+    Byte composite of the bottom and top hillshades, given as float blocks with NaN nodata. Values stay
+    below OUTPUT_NO_DATA, so white areas are not taken for nodata.
+    """
+    return toByte(np.minimum(compositeRelief(bottom, top), OUTPUT_NO_DATA - 1), OUTPUT_NO_DATA)
+
+def byteToFloat(values):
+    return np.where(values == OUTPUT_NO_DATA, np.nan, values.astype(np.float64))
+
+def runShadedRelief(demPath: str, outputs: list, apIntensity: float, zFactor: float = 1, scale: float = 1, altitude: float = 45, feedback=None, workers: int = None, overviews: list = None, compositePath: str = None, lookupTable: bool = False, exactStatistics: bool = True):
+    """
+    Creates one Aerial Perspective hillshade per (outputPath, azimuths) item of outputs, each one being the
+    mean of the hillshades of its light sources. DEM blocks are read once per pass and their gradients are
+    shared by all light sources of all outputs. Blocks are processed in parallel. When overviews (a list of
+    decimation factors) is given, GeoTIFF outputs are tiled and compressed and their overviews are built
+    while writing. With compositePath, the first two outputs (bottom and top) are also composited into a
+    single layer, see compositeRelief. With lookupTable, the second pass gathers the outputs from a
+    ContrastLookup. DEM statistics come from rasterMinMax, approximate unless exactStatistics. Returns False
+    if canceled.
+    """
+    dem = openRaster(demPath)
+    geoTransform = dem.GetGeoTransform()
+    kernel = HillshadeKernel(geoTransform[1], geoTransform[5], zFactor, scale, altitude)
+    reportStep(feedback, 'Computing DEM statistics...')
+    demMin, demMax = rasterMinMax(demPath, 1, exactStatistics)
+    scheduler = BlockScheduler(dem.RasterXSize, dem.RasterYSize, halo=1, workers=workers)
+    demReader = ThreadLocalRaster(demPath)
+    lookup = ContrastLookup(demMin, demMax, -apIntensity, apIntensity) if lookupTable else None
+
+    def hillshadeBlocks(window):
+        """(DEM, hillshade) of every output."""
+        paddedDem = readPaddedBlock(demReader.band(), window, scheduler.halo)
+        # Pixels on the raster edges get nodata, as the legacy hillshades computed without COMPUTE_EDGES
+        x, y = kernel.gradients(paddedDem)
+
+        for _, azimuths in outputs:
+            yield paddedDem[1:-1, 1:-1], kernel.combinedShade(x, y, azimuths)
+
+    def denormalizedBlocks(window):
+        for dem, hillshade in hillshadeBlocks(window):
+            yield denormalize(dem, hillshade, demMin, demMax, -apIntensity, apIntensity)
+
+    def blockRanges(window):
+        return [
+            (np.nanmin(values), np.nanmax(values)) if not np.isnan(values).all() else None
+            for values in denormalizedBlocks(window)
+        ]
+
+    ranges = [[np.inf, -np.inf] for _ in outputs]
+
+    def mergeRanges(window, blockRanges):
+        for valuesRange, blockRange in zip(ranges, blockRanges):
+            if blockRange is not None:
+                valuesRange[0] = min(valuesRange[0], blockRange[0])
+                valuesRange[1] = max(valuesRange[1], blockRange[1])
+
+    reportStep(feedback, 'Hillshading and denormalizing (pass 1 of 2)...')
+    if not scheduler.run(blockRanges, mergeRanges, feedback, 0, 50):
+        return False
+
+    outputPaths = [outputPath for outputPath, _ in outputs] + ([compositePath] if compositePath else [])
+    datasets = [createRaster(outputPath, dem, gdal.GDT_Byte, OUTPUT_NO_DATA, tiled=overviews is not None) for outputPath in outputPaths]
+    outputBands = [dataset.GetRasterBand(1) for dataset in datasets]
+    builders = [OverviewBuilder(dataset, overviews or [], scheduler.blockSize, OUTPUT_NO_DATA) for dataset in datasets]
+
+    byteTables = [lookup.byteTable(valuesMin, valuesMax, OUTPUT_NO_DATA) for valuesMin, valuesMax in ranges] if lookup is not None else None
+
+    def normalizedBlocks(window):
+        if lookup is not None:
+            blocks = [
+                lookup.gather(byteTable, dem, hillshade, OUTPUT_NO_DATA)
+                for byteTable, (dem, hillshade) in zip(byteTables, hillshadeBlocks(window))
+            ]
+        else:
+            blocks = [
+                toByte(normalize(values, valuesMin, valuesMax), OUTPUT_NO_DATA)
+                for (valuesMin, valuesMax), values in zip(ranges, denormalizedBlocks(window))
+            ]
+        if compositePath:
+            blocks.append(compositeByte(byteToFloat(blocks[0]), byteToFloat(blocks[1])))
+
+        return blocks
+
+    def writeBlocks(window, blocks):
+        for band, builder, values in zip(outputBands, builders, blocks):
+            band.WriteArray(values, window[0], window[1])
+            builder.write(window, values)
+
+    reportStep(feedback, 'Normalizing (pass 2 of 2)...')
+    completed = scheduler.run(normalizedBlocks, writeBlocks, feedback, 50, 100)
+    if completed and overviews:
+        reportStep(feedback, 'Completing overviews...')
+        for builder in builders:
+            builder.finish()
+
+    for band in outputBands:
+        band.FlushCache()
+
+    datasets = None
+    demReader.close()
+    return completed
+
+def runCompositeRelief(bottomPath: str, topPath: str, outputPath: str, feedback=None, workers: int = None, overviews: list = None):
+    """
+    Composites existing bottom and top hillshades into a single Byte layer, block by block. Used for
+    hillshades not created by runShadedRelief, which composites them while writing. Returns False if canceled.
+    """
+    bottom = openRaster(bottomPath)
+    scheduler = BlockScheduler(bottom.RasterXSize, bottom.RasterYSize, workers=workers)
+    readers = [ThreadLocalRaster(bottomPath), ThreadLocalRaster(topPath)]
+    output = createRaster(outputPath, bottom, gdal.GDT_Byte, OUTPUT_NO_DATA, tiled=overviews is not None)
+    outputBand = output.GetRasterBand(1)
+    builder = OverviewBuilder(output, overviews or [], scheduler.blockSize, OUTPUT_NO_DATA)
+
+    def compositeBlock(window):
+        return compositeByte(*[readBlock(reader.band(), window) for reader in readers])
+
+    def writeBlock(window, values):
+        outputBand.WriteArray(values, window[0], window[1])
+        builder.write(window, values)
+
+    reportStep(feedback, 'Compositing hillshades...')
+    completed = scheduler.run(compositeBlock, writeBlock, feedback)
+    if completed and overviews:
+        reportStep(feedback, 'Completing overviews...')
+        builder.finish()
+
+    outputBand.FlushCache()
+    output = None
+    for reader in readers:
+        reader.close()
+
+    return completed
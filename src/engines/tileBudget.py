@@ -0,0 +1,81 @@
+import math
+import numpy as np
+from .prioritySpacing import priorityRanks
+
+# Half of the width of the Web Mercator (EPSG:3857) world, in meters
+WEB_MERCATOR_HALF_WIDTH = 20037508.342789244
+
+# Scale of XYZ tiles at zoom 0 (256 px tiles, 0.28 mm pixels), halved at each zoom
+ZOOM_0_SCALE = 559082264.028
+
+def tileZoomFromScale(scale: float):
+    """XYZ zoom whose scale is the closest to a map scale."""
+    return max(0, int(round(math.log2(ZOOM_0_SCALE / scale))))
+
+def tileKeys(x, y, zoom: int):
+    """Integer key (column * 2^zoom + row) of the XYZ tile holding each Web Mercator point."""
+    tiles = 2**zoom
+    column = np.clip(np.floor((x + WEB_MERCATOR_HALF_WIDTH) / (2 * WEB_MERCATOR_HALF_WIDTH) * tiles), 0, tiles - 1).astype(np.int64)
+    row = np.clip(np.floor((WEB_MERCATOR_HALF_WIDTH - y) / (2 * WEB_MERCATOR_HALF_WIDTH) * tiles), 0, tiles - 1).astype(np.int64)
+    return column * tiles + row
+
+def acceptWithinBudget(keys, ranks, accepted, budget: int):
+    """
+    Indexes of the candidates (points not accepted yet) that fit in their tile, best ranks first, a tile
+    holding at most budget points including the already accepted ones.
+    """
+    acceptedKeys, acceptedCounts = np.unique(keys[accepted], return_counts=True)
+
+    candidates = np.flatnonzero(~accepted)
+    candidates = candidates[np.lexsort((ranks[candidates], keys[candidates]))]
+    sortedKeys = keys[candidates]
+    if len(candidates) == 0:
+        return candidates
+
+    # Position of each candidate within its tile
+    starts = np.flatnonzero(np.r_[True, sortedKeys[1:] != sortedKeys[:-1]])
+    position = np.arange(len(candidates)) - np.repeat(starts, np.diff(np.r_[starts, len(candidates)]))
+
+    used = np.zeros(len(candidates), dtype=np.int64)
+    if len(acceptedKeys) > 0:
+        index = np.minimum(np.searchsorted(acceptedKeys, sortedKeys), len(acceptedKeys) - 1)
+        found = acceptedKeys[index] == sortedKeys
+        used[found] = acceptedCounts[index[found]]
+
+    return candidates[position < budget - used]
+
+def tileBudgetVisibilityOffsets(x, y, values, highestFirst: bool, tileZooms: list[int], budget: int, feedback=None, checkpoint=None):
+    """
+    First level at which each Web Mercator point is accepted. At level l, tiles of zoom tileZooms[l] hold
+    at most budget accepted points: the points accepted at previous levels, then the best ones by
+    priority. Points never accepted get len(tileZooms). Tile zooms must not decrease, so a tile never
+    holds more points than its parent tile did.
+    The points accepted at every level are saved to the checkpoint (if any), and a saved run is resumed.
+    Returns None if canceled.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    nLevels = len(tileZooms)
+    offsets = np.full(len(x), nLevels, dtype=np.int32)
+    ranks = priorityRanks(values, highestFirst)
+    firstLevel = 0
+
+    saved = checkpoint.load() if checkpoint is not None else None
+    if saved is not None:
+        for level, arrays in saved:
+            offsets[arrays['accepted']] = level
+        firstLevel = saved[-1][0] + 1
+
+    for level in range(firstLevel, nLevels):
+        if feedback is not None:
+            if feedback.isCanceled():
+                return None
+            feedback.setProgress(100 * level / nLevels)
+
+        accepted = acceptWithinBudget(tileKeys(x, y, tileZooms[level]), ranks, offsets < nLevels, budget)
+        offsets[accepted] = level
+
+        if checkpoint is not None:
+            checkpoint.save(level, accepted=accepted)
+
+    return offsets
@@ -0,0 +1,206 @@
+import hashlib
+import math
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from .tileBudget import WEB_MERCATOR_HALF_WIDTH
+from .tileRendering import renderMetatile
+
+# Tiles per side of the block rendered by one task: one warp per 8 x 8 tiles instead of one per tile
+METATILE_SIZE = 8
+
+def pythonExecutable():
+    """
+    Python interpreter for the worker processes. Inside QGIS sys.executable is the QGIS binary on some
+    platforms, so the interpreter next to the Python installation is used instead when there is one.
+    """
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+
+    for name in ['python.exe', 'python3.exe', os.path.join('bin', 'python3'), os.path.join('bin', 'python')]:
+        path = os.path.join(sys.exec_prefix, name)
+        if os.path.exists(path):
+            return path
+
+    return sys.executable
+
+def processPool(workers: int):
+    context = multiprocessing.get_context('spawn')
+    context.set_executable(pythonExecutable())
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def tileRange(bounds, zoom: int):
+    """(first column, first row, last column, last row) of the tiles of a zoom covering Web Mercator bounds."""
+    xMin, yMin, xMax, yMax = bounds
+    tiles = 2**zoom
+    span = 2 * WEB_MERCATOR_HALF_WIDTH / tiles
+
+    def clamp(value):
+        return min(tiles - 1, max(0, value))
+
+    return (
+        clamp(int(math.floor((xMin + WEB_MERCATOR_HALF_WIDTH) / span))),
+        clamp(int(math.floor((WEB_MERCATOR_HALF_WIDTH - yMax) / span))),
+        clamp(int(math.ceil((xMax + WEB_MERCATOR_HALF_WIDTH) / span)) - 1),
+        clamp(int(math.ceil((WEB_MERCATOR_HALF_WIDTH - yMin) / span)) - 1)
+    )
+
+def metatileTasks(sources: list[str], bounds, zooms: list[int], tileSize: int):
+    for zoom in zooms:
+        firstColumn, firstRow, lastColumn, lastRow = tileRange(bounds, zoom)
+        for row in range(firstRow, lastRow + 1, METATILE_SIZE):
+            for column in range(firstColumn, lastColumn + 1, METATILE_SIZE):
+                yield {
+                    'sources': sources,
+                    'zoom': zoom,
+                    'column': column,
+                    'row': row,
+                    'columns': min(METATILE_SIZE, lastColumn + 1 - column),
+                    'rows': min(METATILE_SIZE, lastRow + 1 - row),
+                    'tileSize': tileSize
+                }
+
+def tileCount(bounds, zooms: list[int]):
+    count = 0
+    for zoom in zooms:
+        firstColumn, firstRow, lastColumn, lastRow = tileRange(bounds, zoom)
+        count += (lastColumn - firstColumn + 1) * (lastRow - firstRow + 1)
+
+    return count
+
+def geographicBounds(bounds):
+    """Longitude and latitude of Web Mercator bounds."""
+    def longitude(x):
+        return x / WEB_MERCATOR_HALF_WIDTH * 180
+
+    def latitude(y):
+        return math.degrees(math.atan(math.sinh(y / WEB_MERCATOR_HALF_WIDTH * math.pi)))
+
+    xMin, yMin, xMax, yMax = bounds
+    return longitude(xMin), latitude(yMin), longitude(xMax), latitude(yMax)
+
+class MBTilesWriter:
+    """
+    MBTiles with the map / images schema: tiles with the same PNG data share one row of images, and the
+    tiles view presents them as the usual tiles table.
+    """
+
+    def __init__(self, path: str, name: str, bounds, zooms: list[int]):
+        if os.path.exists(path):
+            os.remove(path)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE map (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT);
+            CREATE TABLE images (tile_id TEXT, tile_data BLOB);
+            CREATE UNIQUE INDEX map_index ON map (zoom_level, tile_column, tile_row);
+            CREATE UNIQUE INDEX images_id ON images (tile_id);
+            CREATE VIEW tiles AS
+                SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column, map.tile_row AS tile_row, images.tile_data AS tile_data
+                FROM map JOIN images ON images.tile_id = map.tile_id;
+        """)
+        self.connection.executemany('INSERT INTO metadata (name, value) VALUES (?, ?)', [
+            ('name', name),
+            ('format', 'png'),
+            ('type', 'baselayer'),
+            ('version', '1.0'),
+            ('bounds', ','.join(f'{value:.6f}' for value in geographicBounds(bounds))),
+            ('minzoom', str(min(zooms))),
+            ('maxzoom', str(max(zooms)))
+        ])
+        self.images = set()
+
+    def addTile(self, zoom: int, column: int, row: int, data: bytes, tileId: str):
+        if tileId not in self.images:
+            self.connection.execute('INSERT INTO images (tile_id, tile_data) VALUES (?, ?)', (tileId, sqlite3.Binary(data)))
+            self.images.add(tileId)
+
+        # MBTiles rows count from the bottom (TMS)
+        self.connection.execute('INSERT INTO map VALUES (?, ?, ?, ?)', (zoom, column, 2**zoom - 1 - row, tileId))
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+class XyzWriter:
+    """z/x/y.png files. Tiles with the same PNG data as a tile already written are hard links to its file."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.files = {}
+
+    def addTile(self, zoom: int, column: int, row: int, data: bytes, tileId: str):
+        folder = os.path.join(self.folder, str(zoom), str(column))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f'{row}.png')
+        if os.path.exists(path):
+            os.remove(path)
+
+        original = self.files.get(tileId)
+        if original is not None:
+            try:
+                os.link(original, path)
+                return
+            except OSError:
+                # File systems without hard links (e.g. FAT) get a copy
+                shutil.copyfile(original, path)
+                return
+
+        with open(path, 'wb') as tileFile:
+            tileFile.write(data)
+        self.files[tileId] = path
+
+    def close(self):
+        pass
+
+def exportTiles(sources: list[str], bounds, zooms: list[int], writers: list, tileSize: int = 256, workers: int = 1, feedback=None):
+    """
+    Renders the tiles of the zooms covering Web Mercator bounds on a process pool and hands them to the
+    writers in the calling process. Tiles without data are skipped and tiles with identical PNG data are
+    stored once. At most 2 * workers blocks are queued, which bounds memory. Returns the counts of
+    'written', 'skipped' and 'duplicated' tiles, or None if canceled.
+    """
+    tasks = metatileTasks(sources, bounds, zooms, tileSize)
+    total = max(1, tileCount(bounds, zooms))
+    counts = {'written': 0, 'skipped': 0, 'duplicated': 0}
+    tileIds = set()
+    pending = deque()
+
+    with processPool(workers) as executor:
+        try:
+            while True:
+                for task in tasks:
+                    pending.append(executor.submit(renderMetatile, task))
+                    if len(pending) >= 2 * workers:
+                        break
+
+                if len(pending) == 0:
+                    break
+
+                for zoom, column, row, data in pending.popleft().result():
+                    if data is None:
+                        counts['skipped'] += 1
+                        continue
+
+                    tileId = hashlib.md5(data).hexdigest()
+                    counts['duplicated' if tileId in tileIds else 'written'] += 1
+                    tileIds.add(tileId)
+                    for writer in writers:
+                        writer.addTile(zoom, column, row, data, tileId)
+
+                if feedback is not None:
+                    if feedback.isCanceled():
+                        return None
+                    feedback.setProgress(100 * sum(counts.values()) / total)
+        finally:
+            for future in pending:
+                future.cancel()
+            for writer in writers:
+                writer.close()
+
+    return counts
@@ -0,0 +1,82 @@
+"""
+Work done by the tile export processes. Only NumPy and GDAL are imported, so the module loads quickly in
+processes started with spawn and does not need QGIS.
+"""
+import os
+import threading
+import numpy as np
+from osgeo import gdal
+from .reliefComposite import compositeRelief
+from .tileBudget import WEB_MERCATOR_HALF_WIDTH
+
+# PNG data of uniform tiles already encoded by this process, by (gray value, tile size)
+uniformTiles = {}
+
+def encodePng(gray, alpha):
+    """PNG (gray and alpha bands) of 8 bit arrays."""
+    height, width = gray.shape
+    memory = gdal.GetDriverByName('MEM').Create('', width, height, 2, gdal.GDT_Byte)
+    memory.GetRasterBand(1).WriteArray(gray)
+    memory.GetRasterBand(2).WriteArray(alpha)
+
+    path = f'/vsimem/tile_{os.getpid()}_{threading.get_ident()}.png'
+    gdal.GetDriverByName('PNG').CreateCopy(path, memory)
+    memory = None
+
+    file = gdal.VSIFOpenL(path, 'rb')
+    gdal.VSIFSeekL(file, 0, 2)
+    size = gdal.VSIFTellL(file)
+    gdal.VSIFSeekL(file, 0, 0)
+    data = gdal.VSIFReadL(1, size, file)
+    gdal.VSIFCloseL(file)
+    gdal.Unlink(path)
+    return bytes(data)
+
+def warpToMercator(path: str, bounds, width: int, height: int):
+    """Values of a raster resampled to a Web Mercator window, nodata and pixels outside the raster being NaN."""
+    dataset = gdal.Warp(
+        '', path, format='MEM', outputBounds=bounds, width=width, height=height, dstSRS='EPSG:3857',
+        resampleAlg='bilinear', outputType=gdal.GDT_Float32, dstNodata=float('nan')
+    )
+    if dataset is None:
+        raise RuntimeError(f'Could not warp {path}')
+
+    return dataset.GetRasterBand(1).ReadAsArray().astype(np.float64)
+
+def renderMetatile(task: dict):
+    """
+    Renders a block of columns x rows tiles of a zoom with a single warp of every source, two sources
+    being composited as the shaded relief layers. Returns [(zoom, column, row, png)], png being None for
+    tiles without any data pixel.
+    """
+    zoom, tileSize = task['zoom'], task['tileSize']
+    span = 2 * WEB_MERCATOR_HALF_WIDTH / 2**zoom
+    xMin = -WEB_MERCATOR_HALF_WIDTH + task['column'] * span
+    yMax = WEB_MERCATOR_HALF_WIDTH - task['row'] * span
+    bounds = (xMin, yMax - task['rows'] * span, xMin + task['columns'] * span, yMax)
+
+    layers = [warpToMercator(path, bounds, task['columns'] * tileSize, task['rows'] * tileSize) for path in task['sources']]
+    gray = layers[0] if len(layers) == 1 else compositeRelief(layers[0], layers[1])
+
+    tiles = []
+    for j in range(task['rows']):
+        for i in range(task['columns']):
+            values = gray[j * tileSize:(j + 1) * tileSize, i * tileSize:(i + 1) * tileSize]
+            valid = ~np.isnan(values)
+            if not valid.any():
+                tiles.append((zoom, task['column'] + i, task['row'] + j, None))
+                continue
+
+            values = np.clip(np.rint(np.where(valid, values, 0)), 0, 255).astype(np.uint8)
+            uniform = valid.all() and (values == values.flat[0]).all()
+            if uniform:
+                key = (int(values.flat[0]), tileSize)
+                if key not in uniformTiles:
+                    uniformTiles[key] = encodePng(values, np.full(values.shape, 255, dtype=np.uint8))
+                png = uniformTiles[key]
+            else:
+                png = encodePng(values, np.where(valid, 255, 0).astype(np.uint8))
+
+            tiles.append((zoom, task['column'] + i, task['row'] + j, png))
+
+    return tiles
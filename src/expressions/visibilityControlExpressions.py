@@ -1,5 +1,4 @@
 from qgis.core import qgsfunction
-from ..utils.cache import Cache
 
 @qgsfunction(args='auto', group='Webmap - Visibility')
 def visibilityByOffset(minZoom, offset, feature, parent, context):
@@ -20,10 +19,6 @@ def visibilityByOffset(minZoom, offset, feature, parent, context):
     </br>
     Visit <a href="https://github.com/guialexsdev/webmap-utilities">https://github.com/guialexsdev/webmap-utilities</a> to learn more!
     """
-    def work():
-        currentZoom = context.variable('zoom_level') + 1
-        return 1 if currentZoom - minZoom >= offset else 0
-
-    cache = Cache(context)
-    resultCacheKey = f'{feature.id()}_{minZoom}_{offset}'
-    return cache.cachedSection(resultCacheKey, work)
+    # Evaluated for every feature on every render: a comparison is cheaper than any cache lookup
+    currentZoom = context.variable('zoom_level') + 1
+    return 1 if currentZoom - minZoom >= offset else 0
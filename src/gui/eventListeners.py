@@ -2,6 +2,8 @@ import math
 from qgis.core import QgsProject
 from qgis.PyQt.QtWidgets import QMenu
 from ..gui.setLayerVisibilityContextMenuHandler import SetLayerVisibilityContextMenuHandler
+from ..gui.zoomSubsetFilterContextMenuHandler import ZoomSubsetFilterContextMenuHandler
+from ..gui.visibilityPreviewContextMenuHandler import VisibilityPreviewContextMenuHandler
 
 class EventListeners:
     def onContextMenuAboutToShow(iface, menu: QMenu):
@@ -12,6 +14,8 @@ class EventListeners:
 
             if QgsProject.instance().viewSettings().mapScales().__len__() > 0:
                 SetLayerVisibilityContextMenuHandler(iface, menu.parent()).handle(menu, selectedLayers)
+                ZoomSubsetFilterContextMenuHandler(iface, menu.parent()).handle(menu, selectedLayers)
+                VisibilityPreviewContextMenuHandler(iface, menu.parent()).handle(menu, selectedLayers)
 
     def layerChangedUpdatesQuickInfo(iface, layer):
         if layer is not None:
@@ -0,0 +1,136 @@
+import time
+import numpy as np
+from qgis.core import QgsProject, QgsVectorLayer, QgsFeature, QgsGeometry, QgsPointXY, QgsField, QgsRectangle, QgsCoordinateTransform, QgsCoordinateReferenceSystem
+from qgis.PyQt.QtCore import QVariant
+from ..engines.clusterHierarchy import ClusterHierarchy
+from ..engines.gridPyramid import gridVisibilityOffsets
+from ..engines.prioritySpacing import spacingVisibilityOffsets
+from ..utils.featureStore import PointFeatureStore
+from ..utils.visibilityRules import visibilityRanges, createRuleBasedRenderer
+
+PREVIEW_ATTRIBUTE = '_visibility_offset'
+PRIORITY_ATTRIBUTE = 'priority'
+
+METHOD_CLUSTERED = 0
+METHOD_GRID = 1
+METHOD_SPACING = 2
+METHODS = ['Clustered Visualization', 'Grid Visualization', 'Spacing Visualization']
+
+# The preview runs on the GUI thread, so it is skipped when the extent holds more features than this. The
+# spacing engine runs a greedy pass per level, slower than the other ones on priorities following position
+MAX_PREVIEW_FEATURES = 50000
+MAX_SPACING_PREVIEW_FEATURES = 20000
+
+def maxPreviewFeatures(method: int):
+    return MAX_SPACING_PREVIEW_FEATURES if method == METHOD_SPACING else MAX_PREVIEW_FEATURES
+
+class VisibilityPreview:
+    """
+    Runs a visibility engine on the features of a point layer inside an extent and shows the offsets in a
+    memory layer, styled with one scale-ranged rule per offset. Features are read once per extent and
+    attribute, so changing the other parameters only runs the engine again. Extents with more than
+    maxPreviewFeatures(method) features are not previewed.
+    """
+
+    def __init__(self, layer: QgsVectorLayer):
+        self.layer = layer
+        self.store = None
+        self.storeKey = None
+        self.previewLayer = None
+        self.baseRenderer = None
+
+    def storeCrs(self, method: int):
+        # The grid engine lays its grid in the project CRS, the other ones measure distances in layer units
+        return QgsProject.instance().crs() if method == METHOD_GRID else self.layer.crs()
+
+    def gridExtent(self):
+        """Layer extent in the project CRS: the grid of the full run starts there, so the preview matches it."""
+        transform = QgsCoordinateTransform(self.layer.crs(), QgsProject.instance().crs(), QgsProject.instance())
+        extent = transform.transformBoundingBox(self.layer.extent())
+        return extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum()
+
+    def readFeatures(self, method: int, attribute: str, extent: QgsRectangle, extentCrs: QgsCoordinateReferenceSystem):
+        storeCrs = self.storeCrs(method)
+        key = (extent.toString(), extentCrs.toWkt(), storeCrs.toWkt(), attribute)
+        if key != self.storeKey:
+            transform = QgsCoordinateTransform(extentCrs, self.layer.crs(), QgsProject.instance())
+            self.store = PointFeatureStore.fromLayer(
+                self.layer,
+                [attribute] if attribute else [],
+                destinationCrs=storeCrs,
+                transformContext=QgsProject.instance().transformContext(),
+                filterRect=transform.transformBoundingBox(extent),
+                limit=MAX_PREVIEW_FEATURES + 1
+            )
+            self.storeKey = key
+
+        return self.store
+
+    def offsets(self, method: int, store: PointFeatureStore, values, highestFirst: bool, distance: float, nZooms: int):
+        if len(store) == 0:
+            return np.empty(0, dtype=np.int32)
+
+        if method == METHOD_CLUSTERED:
+            # Same link distances as the cluster hierarchy engine of Clustered Visualization
+            hierarchy = ClusterHierarchy.build(store.x, store.y, [2 * distance / 2**nZoom for nZoom in range(nZooms)])
+            return hierarchy.visibilityOffsets(values, highestFirst, isolatedAlwaysVisible=False, showAllAtLastLevel=False)
+
+        if method == METHOD_GRID:
+            return gridVisibilityOffsets(store.x, store.y, self.gridExtent(), distance, nZooms)
+
+        return spacingVisibilityOffsets(store.x, store.y, values, highestFirst, distance, nZooms)
+
+    def update(self, method: int, attribute: str, highestFirst: bool, distance: float, nZooms: int, minZoom: int, extent: QgsRectangle, extentCrs: QgsCoordinateReferenceSystem):
+        """
+        Runs the engine on the features inside extent and refreshes the preview layer. Returns (features,
+        seconds), features being None when the extent holds more than maxPreviewFeatures(method) features.
+        """
+        started = time.perf_counter()
+        store = self.readFeatures(method, attribute, extent, extentCrs)
+        if len(store) > maxPreviewFeatures(method):
+            return None, time.perf_counter() - started
+
+        values = store.column(attribute) if attribute else np.zeros(len(store))
+        offsets = self.offsets(method, store, values, highestFirst, distance, nZooms)
+        self.showOffsets(store, self.storeCrs(method), values, offsets, minZoom)
+        return len(store), time.perf_counter() - started
+
+    def createPreviewLayer(self, crs: QgsCoordinateReferenceSystem):
+        self.remove()
+        layer = QgsVectorLayer('Point', f'{self.layer.name()} (preview)', 'memory')
+        layer.setCrs(crs)
+        layer.dataProvider().addAttributes([QgsField(PREVIEW_ATTRIBUTE, QVariant.Int), QgsField(PRIORITY_ATTRIBUTE, QVariant.Double)])
+        layer.updateFields()
+        self.baseRenderer = layer.renderer().clone()
+        self.previewLayer = QgsProject.instance().addMapLayer(layer)
+
+    def showOffsets(self, store: PointFeatureStore, crs: QgsCoordinateReferenceSystem, values, offsets, minZoom: int):
+        if self.previewLayer is None or QgsProject.instance().mapLayer(self.previewLayer.id()) is None or self.previewLayer.crs() != crs:
+            self.createPreviewLayer(crs)
+
+        layer = self.previewLayer
+        provider = layer.dataProvider()
+        provider.truncate()
+
+        features = []
+        for row in range(len(store)):
+            feature = QgsFeature(layer.fields())
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(store.x[row], store.y[row])))
+            feature.setAttributes([int(offsets[row]), None if np.isnan(values[row]) else float(values[row])])
+            features.append(feature)
+        provider.addFeatures(features)
+        layer.updateExtents()
+
+        # The rules are built again from the original renderer, otherwise they would be nested on each update
+        layer.setRenderer(self.baseRenderer.clone())
+        ranges = visibilityRanges(layer, PREVIEW_ATTRIBUTE, QgsProject.instance().viewSettings().mapScales(), minZoom)
+        if len(ranges) > 0:
+            layer.setRenderer(createRuleBasedRenderer(layer, PREVIEW_ATTRIBUTE, ranges))
+
+        layer.triggerRepaint()
+        layer.emitStyleChanged()
+
+    def remove(self):
+        if self.previewLayer is not None and QgsProject.instance().mapLayer(self.previewLayer.id()) is not None:
+            QgsProject.instance().removeMapLayer(self.previewLayer.id())
+        self.previewLayer = None
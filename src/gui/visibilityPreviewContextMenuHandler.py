@@ -0,0 +1,18 @@
+from qgis.core import QgsMapLayer, QgsVectorLayer, QgsWkbTypes
+from qgis.PyQt.QtWidgets import QMenu
+from .visibilityPreviewDialog import VisibilityPreviewDialog
+
+class VisibilityPreviewContextMenuHandler:
+    def __init__(self, iface, parent=None):
+        self.iface = iface
+        self.parent = parent
+
+    def handle(self, menu: QMenu, selectedLayers: list[QgsMapLayer]):
+        if selectedLayers.__len__() != 1 or not isinstance(selectedLayers[0], QgsVectorLayer):
+            return
+
+        if selectedLayers[0].geometryType() != QgsWkbTypes.PointGeometry:
+            return
+
+        action = menu.addAction('Preview Visibility Algorithm...')
+        action.triggered.connect(lambda: VisibilityPreviewDialog(self.iface, selectedLayers[0], self.parent).show())
@@ -0,0 +1,162 @@
+from qgis.core import QgsProject, QgsVectorLayer, QgsFieldProxyModel, QgsRectangle
+from qgis.gui import QgsFieldComboBox
+from qgis.PyQt import QtWidgets
+from qgis.PyQt.QtCore import Qt, QTimer
+from qgis.PyQt.QtWidgets import QComboBox, QDialogButtonBox, QDoubleSpinBox, QFormLayout, QLabel, QSpinBox
+import processing
+from .visibilityPreview import VisibilityPreview, METHODS, METHOD_CLUSTERED, METHOD_GRID, maxPreviewFeatures
+from ..algorithms.createClusteredVisualization import CreateClusteredVisualization
+from ..algorithms.createGridVisualization import CreateGridVisualization
+from ..algorithms.createSpacingVisualization import CreateSpacingVisualization
+from ..utils.webmapCommons import Utils
+
+# Milliseconds without parameter or extent changes before the preview runs again
+UPDATE_DELAY = 300
+
+class VisibilityPreviewDialog(QtWidgets.QDialog):
+    """
+    Non modal dialog that previews a visibility algorithm on the features around the canvas extent, so its
+    parameters can be tuned without running it on the whole layer.
+    """
+
+    def __init__(self, iface, layer: QgsVectorLayer, parent=None):
+        super(VisibilityPreviewDialog, self).__init__(parent)
+        self.setWindowTitle(f'Preview Visibility Algorithm - {layer.name()}')
+        self.setAttribute(Qt.WA_DeleteOnClose)
+
+        self.iface = iface
+        self.layer = layer
+        self.preview = VisibilityPreview(layer)
+        predefinedScales = QgsProject.instance().viewSettings().mapScales()
+
+        self.methodCombo = QComboBox(self)
+        self.methodCombo.addItems(METHODS)
+
+        self.attributeCombo = QgsFieldComboBox(self)
+        self.attributeCombo.setFilters(QgsFieldProxyModel.Numeric)
+        self.attributeCombo.setLayer(layer)
+
+        self.orderCombo = QComboBox(self)
+        self.orderCombo.addItems(['max', 'min'])
+
+        self.distanceSpin = QDoubleSpinBox(self)
+        self.distanceSpin.setRange(0.01, 1000000000)
+        self.distanceSpin.setDecimals(2)
+        self.distanceSpin.setValue(20000)
+
+        self.zoomsSpin = QSpinBox(self)
+        self.zoomsSpin.setRange(1, 30)
+        self.zoomsSpin.setValue(3)
+
+        self.minZoomSpin = QSpinBox(self)
+        self.minZoomSpin.setRange(0, max(0, len(predefinedScales) - 1))
+        self.minZoomSpin.setValue(Utils.scaleToZoomLevel(predefinedScales, iface.mapCanvas().scale()) if len(predefinedScales) > 0 else 0)
+
+        self.marginSpin = QSpinBox(self)
+        self.marginSpin.setRange(0, 200)
+        self.marginSpin.setSuffix(' %')
+        self.marginSpin.setValue(25)
+
+        self.statusLabel = QLabel(self)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Close, self)
+        self.runButton = self.buttons.addButton('Run on Whole Layer...', QDialogButtonBox.AcceptRole)
+        self.buttons.accepted.connect(self.onRun)
+        self.buttons.rejected.connect(self.close)
+
+        layout = QFormLayout(self)
+        layout.addRow('Algorithm', self.methodCombo)
+        layout.addRow('Priority attribute', self.attributeCombo)
+        layout.addRow('Priority order', self.orderCombo)
+        layout.addRow('Initial distance', self.distanceSpin)
+        layout.addRow('Number of zoom levels', self.zoomsSpin)
+        layout.addRow('Minimum zoom level (minZoom)', self.minZoomSpin)
+        layout.addRow('Margin around the canvas extent', self.marginSpin)
+        layout.addRow(self.statusLabel)
+        layout.addRow(self.buttons)
+
+        # Changes are debounced: dragging a spin box or panning the map runs the engine once at the end
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(UPDATE_DELAY)
+        self.timer.timeout.connect(self.updatePreview)
+
+        self.methodCombo.currentIndexChanged.connect(self.onMethodChanged)
+        self.attributeCombo.fieldChanged.connect(self.timer.start)
+        self.orderCombo.currentIndexChanged.connect(self.timer.start)
+        self.distanceSpin.valueChanged.connect(self.timer.start)
+        self.zoomsSpin.valueChanged.connect(self.timer.start)
+        self.minZoomSpin.valueChanged.connect(self.timer.start)
+        self.marginSpin.valueChanged.connect(self.timer.start)
+        self.iface.mapCanvas().extentsChanged.connect(self.timer.start)
+        self.finished.connect(self.onFinished)
+
+        self.onMethodChanged()
+
+    def onMethodChanged(self):
+        usesPriority = self.methodCombo.currentIndex() != METHOD_GRID
+        self.attributeCombo.setEnabled(usesPriority)
+        self.orderCombo.setEnabled(usesPriority)
+        self.timer.start()
+
+    def previewExtent(self):
+        extent = QgsRectangle(self.iface.mapCanvas().extent())
+        extent.scale(1 + 2 * self.marginSpin.value() / 100)
+        return extent
+
+    def updatePreview(self):
+        method = self.methodCombo.currentIndex()
+        attribute = self.attributeCombo.currentField() if method != METHOD_GRID else ''
+        features, seconds = self.preview.update(
+            method,
+            attribute,
+            self.orderCombo.currentIndex() == 0,
+            self.distanceSpin.value(),
+            self.zoomsSpin.value(),
+            self.minZoomSpin.value(),
+            self.previewExtent(),
+            self.iface.mapCanvas().mapSettings().destinationCrs()
+        )
+        if features is None:
+            self.statusLabel.setText(f'More than {maxPreviewFeatures(method)} features around the canvas extent, zoom in to update the preview')
+            return
+
+        self.statusLabel.setText(f'{features} features previewed in {seconds:.2f} s')
+
+    def algorithmParameters(self):
+        method = self.methodCombo.currentIndex()
+        if method == METHOD_CLUSTERED:
+            return CreateClusteredVisualization(), {
+                'VECTOR_LAYER': self.layer,
+                'ELECTION_ATTRIBUTE': self.attributeCombo.currentField(),
+                'ELECTION_METHOD': self.orderCombo.currentIndex(),
+                'INITIAL_MAX_CLUSTER_MEMBER_DISTANCE': self.distanceSpin.value(),
+                'NUMBER_OF_ZOOM_LEVELS': self.zoomsSpin.value()
+            }
+
+        if method == METHOD_GRID:
+            xMin, yMin, xMax, yMax = self.preview.gridExtent()
+            return CreateGridVisualization(), {
+                'VECTOR_LAYER': self.layer,
+                'EXTENT': f'{xMin},{xMax},{yMin},{yMax} [{QgsProject.instance().crs().authid()}]',
+                'GRID_SQUARE_LENGTH_METERS': self.distanceSpin.value(),
+                'NUMBER_OF_ZOOMS': self.zoomsSpin.value()
+            }
+
+        return CreateSpacingVisualization(), {
+            'VECTOR_LAYER': self.layer,
+            'PRIORITY_ATTRIBUTE': self.attributeCombo.currentField(),
+            'PRIORITY_ORDER': self.orderCombo.currentIndex(),
+            'INITIAL_SPACING': self.distanceSpin.value(),
+            'NUMBER_OF_ZOOM_LEVELS': self.zoomsSpin.value()
+        }
+
+    def onRun(self):
+        alg, parameters = self.algorithmParameters()
+        self.close()
+        processing.execAlgorithmDialog(alg, parameters)
+
+    def onFinished(self, result):
+        self.timer.stop()
+        self.iface.mapCanvas().extentsChanged.disconnect(self.timer.start)
+        self.preview.remove()
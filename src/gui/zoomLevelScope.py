@@ -0,0 +1,37 @@
+from qgis.core import QgsProject
+from qgis.gui import QgsMapCanvas
+from ..utils.webmapCommons import Utils
+
+ZOOM_LEVEL_VARIABLE = 'zoom_level'
+
+class ZoomLevelScope:
+    """
+    Keeps the zoom_level variable of the map canvas expression scope equal to the index of the project scale
+    closest to the canvas scale. The canvas copies its scope into the map settings of every render job, so
+    expressions read one stable value per render, without writing global settings on each scale change.
+    Without project scales the variable is removed and QGIS's own zoom_level is used.
+    """
+
+    def __init__(self, canvas: QgsMapCanvas):
+        self.canvas = canvas
+        self.zoomLevel = None
+
+    def update(self, scale = None):
+        scope = self.canvas.expressionContextScope()
+        predefinedScales = QgsProject.instance().viewSettings().mapScales()
+
+        if predefinedScales is None or len(predefinedScales) == 0:
+            if self.zoomLevel is not None:
+                scope.removeVariable(ZOOM_LEVEL_VARIABLE)
+                self.zoomLevel = None
+            return
+
+        zoomLevel = Utils.scaleToZoomLevel(predefinedScales, self.canvas.scale() if scale is None else scale)
+        if zoomLevel != self.zoomLevel:
+            scope.setVariable(ZOOM_LEVEL_VARIABLE, zoomLevel, True)
+            self.zoomLevel = zoomLevel
+
+    def remove(self):
+        if self.zoomLevel is not None:
+            self.canvas.expressionContextScope().removeVariable(ZOOM_LEVEL_VARIABLE)
+            self.zoomLevel = None
\ No newline at end of file
@@ -0,0 +1,73 @@
+from qgis.core import QgsProject, QgsVectorLayer, QgsVectorDataProvider, QgsExpression
+from ..utils.logUtils import warning
+
+PROPERTY_ATTRIBUTE = 'webmap_utilities/zoom_filter_attribute'
+PROPERTY_MIN_ZOOM = 'webmap_utilities/zoom_filter_min_zoom'
+PROPERTY_ORIGINAL_SUBSET = 'webmap_utilities/zoom_filter_original_subset'
+
+class ZoomSubsetFilter:
+    """
+    Keeps the subset string of a layer in sync with the zoom level, so the data provider only returns the
+    features visibilityByOffset(minZoom, attribute) would show: "attribute" <= zoom + 1 - minZoom. The
+    settings and the subset string the user had are stored as layer custom properties (saved with the
+    project), and that subset string is kept in the filter.
+    """
+
+    def isEnabled(layer):
+        return isinstance(layer, QgsVectorLayer) and layer.customProperty(PROPERTY_ATTRIBUTE) is not None
+
+    def settings(layer: QgsVectorLayer):
+        """(attribute, minZoom) or None when the filter is not enabled."""
+        if not ZoomSubsetFilter.isEnabled(layer):
+            return None
+
+        return layer.customProperty(PROPERTY_ATTRIBUTE), int(layer.customProperty(PROPERTY_MIN_ZOOM, 0))
+
+    def enable(layer: QgsVectorLayer, attribute: str, minZoom: int, zoomLevel: int):
+        if not ZoomSubsetFilter.isEnabled(layer):
+            layer.setCustomProperty(PROPERTY_ORIGINAL_SUBSET, layer.subsetString())
+
+        layer.setCustomProperty(PROPERTY_ATTRIBUTE, attribute)
+        layer.setCustomProperty(PROPERTY_MIN_ZOOM, minZoom)
+        ZoomSubsetFilter.createAttributeIndex(layer, attribute)
+        ZoomSubsetFilter.apply(layer, zoomLevel)
+
+    def disable(layer: QgsVectorLayer):
+        if not ZoomSubsetFilter.isEnabled(layer):
+            return
+
+        layer.setSubsetString(layer.customProperty(PROPERTY_ORIGINAL_SUBSET, ''))
+        for name in [PROPERTY_ATTRIBUTE, PROPERTY_MIN_ZOOM, PROPERTY_ORIGINAL_SUBSET]:
+            layer.removeCustomProperty(name)
+
+    def createAttributeIndex(layer: QgsVectorLayer, attribute: str):
+        provider = layer.dataProvider()
+        fieldIdx = layer.fields().indexFromName(attribute)
+        if fieldIdx == -1 or not (provider.capabilities() & QgsVectorDataProvider.CreateAttributeIndex):
+            return
+
+        if not provider.createAttributeIndex(fieldIdx):
+            warning(f'Could not create an index on {attribute} of {layer.name()}')
+
+    def subsetString(layer: QgsVectorLayer, zoomLevel: int):
+        attribute, minZoom = ZoomSubsetFilter.settings(layer)
+        zoomFilter = '{} <= {}'.format(QgsExpression.quotedColumnRef(attribute), zoomLevel + 1 - minZoom)
+        originalSubset = layer.customProperty(PROPERTY_ORIGINAL_SUBSET, '')
+        return f'({originalSubset}) AND {zoomFilter}' if originalSubset else zoomFilter
+
+    def apply(layer: QgsVectorLayer, zoomLevel: int):
+        # Changing the subset string reloads the layer, so it is only done when the filter changes
+        subsetString = ZoomSubsetFilter.subsetString(layer, zoomLevel)
+        if subsetString == layer.subsetString() or layer.isEditable():
+            return
+
+        if not layer.setSubsetString(subsetString):
+            warning(f'Could not filter {layer.name()} with {subsetString}')
+
+    def applyToProject(zoomLevel: int):
+        if zoomLevel is None:
+            return
+
+        for layer in QgsProject.instance().mapLayers().values():
+            if ZoomSubsetFilter.isEnabled(layer):
+                ZoomSubsetFilter.apply(layer, zoomLevel)
\ No newline at end of file
@@ -0,0 +1,15 @@
+from qgis.core import QgsMapLayer, QgsVectorLayer
+from qgis.PyQt.QtWidgets import QMenu
+from .zoomSubsetFilterDialog import ZoomSubsetFilterDialog
+
+class ZoomSubsetFilterContextMenuHandler:
+    def __init__(self, iface, parent=None):
+        self.iface = iface
+        self.parent = parent
+
+    def handle(self, menu: QMenu, selectedLayers: list[QgsMapLayer]):
+        if selectedLayers.__len__() != 1 or not isinstance(selectedLayers[0], QgsVectorLayer):
+            return
+
+        action = menu.addAction('Filter Features by Zoom Level...')
+        action.triggered.connect(lambda: ZoomSubsetFilterDialog(self.iface, selectedLayers[0], self.parent).exec_())
\ No newline at end of file
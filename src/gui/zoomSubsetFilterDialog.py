@@ -0,0 +1,61 @@
+from qgis.core import QgsProject, QgsVectorLayer, QgsFieldProxyModel
+from qgis.gui import QgsFieldComboBox
+from qgis.PyQt import QtWidgets
+from qgis.PyQt.QtWidgets import QCheckBox, QDialogButtonBox, QFormLayout, QLabel, QSpinBox
+from .zoomSubsetFilter import ZoomSubsetFilter
+from ..utils.webmapCommons import Utils
+
+DEFAULT_ATTRIBUTE = '_visibility_offset'
+
+class ZoomSubsetFilterDialog(QtWidgets.QDialog):
+    def __init__(self, iface, layer: QgsVectorLayer, parent=None):
+        super(ZoomSubsetFilterDialog, self).__init__(parent)
+        self.setWindowTitle(f'Filter Features by Zoom Level - {layer.name()}')
+
+        self.iface = iface
+        self.layer = layer
+        settings = ZoomSubsetFilter.settings(layer)
+        attribute, minZoom = settings if settings is not None else (DEFAULT_ATTRIBUTE, 0)
+        predefinedScales = QgsProject.instance().viewSettings().mapScales()
+        # Zoom levels are positions in the project scales, so the filter can't be changed without them
+        self.hasScales = len(predefinedScales) > 0
+
+        self.enabledCheck = QCheckBox('Only request the features visible at the current zoom level', self)
+        self.enabledCheck.setChecked(settings is not None)
+        self.enabledCheck.setEnabled(self.hasScales)
+
+        self.attributeCombo = QgsFieldComboBox(self)
+        self.attributeCombo.setFilters(QgsFieldProxyModel.Numeric)
+        self.attributeCombo.setLayer(layer)
+        self.attributeCombo.setField(attribute)
+
+        self.minZoomSpin = QSpinBox(self)
+        self.minZoomSpin.setRange(0, max(0, len(predefinedScales) - 1))
+        self.minZoomSpin.setValue(minZoom)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        self.buttons.accepted.connect(self.onApply)
+        self.buttons.rejected.connect(self.close)
+
+        layout = QFormLayout(self)
+        layout.addRow(self.enabledCheck)
+        if not self.hasScales:
+            layout.addRow(QLabel('The project has no predefined scales. Configure the project scales to filter features by zoom level.', self))
+        layout.addRow('Attribute that controls visibility', self.attributeCombo)
+        layout.addRow('Minimum zoom level (minZoom)', self.minZoomSpin)
+        layout.addRow(self.buttons)
+
+    def onApply(self):
+        if not self.hasScales:
+            self.close()
+            return
+
+        if self.enabledCheck.isChecked() and self.attributeCombo.currentField() != '':
+            predefinedScales = QgsProject.instance().viewSettings().mapScales()
+            zoomLevel = Utils.scaleToZoomLevel(predefinedScales, self.iface.mapCanvas().scale())
+            ZoomSubsetFilter.enable(self.layer, self.attributeCombo.currentField(), self.minZoomSpin.value(), zoomLevel)
+        else:
+            ZoomSubsetFilter.disable(self.layer)
+
+        self.layer.triggerRepaint()
+        self.close()
\ No newline at end of file
@@ -0,0 +1,40 @@
+from qgis.core import QgsVectorLayer, QgsProcessingException
+
+DEFAULT_BATCH_SIZE = 50000
+
+class BulkAttributeWriter:
+    """
+    Collects attribute changes as {fid: {fieldIdx: value}} and applies them straight to the data provider,
+    one changeAttributeValues call per batch, instead of one edit buffer update per feature.
+    Use it as a context manager so the last batch is flushed on exit.
+    """
+
+    def __init__(self, layer: QgsVectorLayer, batchSize: int = DEFAULT_BATCH_SIZE):
+        self.layer = layer
+        self.batchSize = max(1, batchSize)
+        self.pending = {}
+        self.written = 0
+
+    def setValue(self, fid: int, fieldIdx: int, value):
+        self.pending.setdefault(fid, {})[fieldIdx] = value
+
+        if len(self.pending) >= self.batchSize:
+            self.flush()
+
+    def flush(self):
+        if len(self.pending) == 0:
+            return
+
+        if not self.layer.dataProvider().changeAttributeValues(self.pending):
+            raise QgsProcessingException(f'Could not write attribute values to layer {self.layer.name()}')
+
+        self.written += len(self.pending)
+        self.pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.flush()
+        return False
@@ -1,14 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
 from ..utils.logUtils import info
 
+DEFAULT_MAX_SIZE = 4096
+
+# Minimum seconds between two log lines of the same cache
+LOG_STATS_INTERVAL = 60
+
 class Cache:
-    def __init__(self, context):
-        self.context = context
+    """
+    Bounded least recently used cache for expensive results. It may be shared by several threads (e.g.
+    Processing algorithms running in the background), so every access is guarded by a lock. Hits, misses and evictions are counted and can be written to the WMU log.
+    """
+
+    def __init__(self, name, maxSize = DEFAULT_MAX_SIZE):
+        self.name = name
+        self.maxSize = maxSize
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loggedStats = None
+        self.loggedAt = None
 
     def cachedSection(self, key, work):
-        value = self.context.cachedValue(key)
+        with self.lock:
+            if key in self.values:
+                self.values.move_to_end(key)
+                self.hits += 1
+                return self.values[key]
+
+            self.misses += 1
+
+        value = work()
+
+        with self.lock:
+            self.values[key] = value
+            if len(self.values) > self.maxSize:
+                self.values.popitem(last=False)
+                self.evictions += 1
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.values), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def logStats(self):
+        """
+        Writes the counters to the WMU log, unless they did not change or were logged less than
+        LOG_STATS_INTERVAL seconds ago, so it can be called after every lookup.
+        """
+        now = time.monotonic()
+        if self.loggedAt is not None and now - self.loggedAt < LOG_STATS_INTERVAL:
+            return
+
+        stats = self.stats()
+        if stats == self.loggedStats:
+            return
 
-        if value is None:
-            value = work()
-            self.context.setCachedValue(key, value)
-        
-        return value
\ No newline at end of file
+        self.loggedStats = stats
+        self.loggedAt = now
+        info(f"{self.name} cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, {stats['size']}/{self.maxSize} entries")
\ No newline at end of file
@@ -0,0 +1,68 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from qgis.core import QgsApplication
+from ..utils.logUtils import info, warning
+
+CHECKPOINT_FOLDER = os.path.join('webmap_utilities', 'checkpoints')
+
+class Checkpoint:
+    """
+    Arrays computed at each zoom level of a long run, one .npz file per level, in a folder whose name is
+    a hash of the input (feature ids and coordinates) and of the parameters that change the result.
+    Only what a level adds is saved, so the files of all levels together stay as large as the result.
+    A new run with the same input and parameters resumes after the last saved level. The folder is
+    deleted when the run ends.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def forRun(name: str, fids, x, y, parameters: dict):
+        fingerprint = hashlib.sha1()
+        fingerprint.update(name.encode())
+        fingerprint.update(json.dumps(parameters, sort_keys=True, default=str).encode())
+        for values in [fids, x, y]:
+            fingerprint.update(np.ascontiguousarray(values).tobytes())
+
+        folder = os.path.join(QgsApplication.qgisSettingsDirPath(), CHECKPOINT_FOLDER)
+        return Checkpoint(os.path.join(folder, f'{name}_{fingerprint.hexdigest()}'))
+
+    def levelPath(self, sequence: int):
+        return os.path.join(self.path, f'level_{sequence:04d}.npz')
+
+    def load(self):
+        """[(level, {name: array})] saved by a previous run, in the order they were saved, or None."""
+        paths = sorted(glob.glob(os.path.join(self.path, 'level_????.npz')))
+        if len(paths) == 0:
+            return None
+
+        levels = []
+        try:
+            for path in paths:
+                with np.load(path) as saved:
+                    levels.append((int(saved['level']), {name: saved[name] for name in saved.files if name != 'level'}))
+        except (OSError, ValueError, KeyError) as e:
+            warning(f'Ignoring unreadable checkpoint {self.path}: {e}')
+            return None
+
+        info(f'Resuming from checkpoint {self.path} (level {levels[-1][0]})')
+        return levels
+
+    def save(self, level: int, **arrays):
+        """Saves the arrays of a level, next to the ones of the levels saved before."""
+        os.makedirs(self.path, exist_ok=True)
+        path = self.levelPath(len(glob.glob(os.path.join(self.path, 'level_????.npz'))))
+
+        # Written to a temporary file first, so a crash while saving leaves no partial level behind
+        temporaryPath = path + '.tmp.npz'
+        np.savez(temporaryPath, level=level, **arrays)
+        os.replace(temporaryPath, path)
+
+    def delete(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,156 @@
+import numpy as np
+from qgis.core import QgsVectorLayer, QgsFeatureRequest, QgsFeatureSink, QgsCoordinateTransform, NULL
+
+FEATURES_PER_REQUEST = 10000
+
+def toReal(value):
+    try:
+        return float(value) if value != NULL else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+class PointFeatureStore:
+    """
+    Columnar snapshot of a point layer: fids, x and y as arrays plus the requested attributes as float64
+    columns (NULL and non numeric values become NaN). Features without geometry are left out and
+    multipoints are represented by their centroid.
+    """
+
+    def __init__(self, fids, x, y, columns: dict):
+        self.fids = fids
+        self.x = x
+        self.y = y
+        self.columns = columns
+        self.fidOrder = np.argsort(fids, kind='stable')
+
+    def __len__(self):
+        return len(self.fids)
+
+    def column(self, name: str):
+        return self.columns[name]
+
+    @staticmethod
+    def fromLayer(layer: QgsVectorLayer, attributes: list[str] = None, destinationCrs=None, transformContext=None, feedback=None, filterRect=None, limit: int = None):
+        """
+        Reads the layer with a single request, fetching only the given attributes. Coordinates are
+        transformed to destinationCrs when it is given. filterRect (in layer CRS) limits the request to
+        the features inside it and limit to that many features. Returns None if canceled.
+        """
+        attributes = attributes or []
+        request = QgsFeatureRequest()
+        if filterRect is not None:
+            request.setFilterRect(filterRect)
+        if limit is not None:
+            request.setLimit(limit)
+        if len(attributes) > 0:
+            request.setSubsetOfAttributes(attributes, layer.fields())
+        else:
+            request.setNoAttributes()
+
+        transform = None
+        if destinationCrs is not None and destinationCrs != layer.crs():
+            transform = QgsCoordinateTransform(layer.crs(), destinationCrs, transformContext)
+
+        fids, xs, ys = [], [], []
+        values = [[] for _ in attributes]
+        total = max(1, layer.featureCount())
+
+        for current, feature in enumerate(layer.getFeatures(request)):
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return None
+                feedback.setProgress(100 * current / total)
+
+            geometry = feature.geometry()
+            if geometry.isEmpty():
+                continue
+
+            point = geometry.centroid().asPoint() if geometry.isMultipart() else geometry.asPoint()
+            if transform is not None:
+                point = transform.transform(point)
+
+            fids.append(feature.id())
+            xs.append(point.x())
+            ys.append(point.y())
+            for column, name in zip(values, attributes):
+                column.append(toReal(feature[name]))
+
+        return PointFeatureStore(
+            np.array(fids, dtype=np.int64),
+            np.array(xs, dtype=np.float64),
+            np.array(ys, dtype=np.float64),
+            {name: np.array(column, dtype=np.float64) for name, column in zip(attributes, values)}
+        )
+
+    def rowOf(self, fid: int, hint: int = 0):
+        """Row of a feature id, or None if the feature is not in the store."""
+        # Features usually come back in the order they were read, so the hint is checked before searching
+        if hint < len(self.fids) and self.fids[hint] == fid:
+            return hint
+
+        position = np.searchsorted(self.fids, fid, sorter=self.fidOrder)
+        if position < len(self.fids) and self.fids[self.fidOrder[position]] == fid:
+            return int(self.fidOrder[position])
+
+        return None
+
+    def writeFeatures(self, layer: QgsVectorLayer, sink, fieldCount: int, values: dict, feedback=None, order=None):
+        """
+        Copies every feature of the layer to the sink, setting each attribute index of values to
+        column[row], values being {fieldIdx: (column, default)}. Features left out of the store get the
+        default. When order (rows of the store) is given, features are written in that order, followed by
+        the features left out of the store. Returns False if canceled.
+        """
+        def write(feature, row):
+            attributes = feature.attributes()
+            attributes.extend([NULL] * (fieldCount - len(attributes)))
+
+            for fieldIdx, (column, default) in values.items():
+                attributes[fieldIdx] = default if row is None else column[row].item()
+
+            feature.setAttributes(attributes)
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+        if order is not None:
+            return self.writeFeaturesInOrder(layer, write, order, feedback)
+
+        total = max(1, layer.featureCount())
+        nextRow = 0
+
+        for current, feature in enumerate(layer.getFeatures()):
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return False
+                feedback.setProgress(100 * current / total)
+
+            row = self.rowOf(feature.id(), nextRow)
+            if row is not None:
+                nextRow = row + 1
+
+            write(feature, row)
+
+        return True
+
+    def writeFeaturesInOrder(self, layer: QgsVectorLayer, write, order, feedback=None):
+        # Features are requested by fid in batches, as providers return them in their own order
+        for start in range(0, len(order), FEATURES_PER_REQUEST):
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return False
+                feedback.setProgress(100 * start / max(1, len(order)))
+
+            rows = order[start:start + FEATURES_PER_REQUEST]
+            request = QgsFeatureRequest().setFilterFids(self.fids[rows].tolist())
+            features = {feature.id(): feature for feature in layer.getFeatures(request)}
+            for row in rows:
+                feature = features.get(self.fids[row].item())
+                if feature is not None:
+                    write(feature, int(row))
+
+        request = QgsFeatureRequest().setNoAttributes().setFlags(QgsFeatureRequest.NoGeometry)
+        leftOut = [feature.id() for feature in layer.getFeatures(request) if self.rowOf(feature.id()) is None]
+        if len(leftOut) > 0:
+            for feature in layer.getFeatures(QgsFeatureRequest().setFilterFids(leftOut)):
+                write(feature, None)
+
+        return True
\ No newline at end of file
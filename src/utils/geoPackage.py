@@ -0,0 +1,90 @@
+import numpy as np
+from osgeo import gdal
+from qgis.core import QgsProviderRegistry, QgsProcessingException
+
+HILBERT_BITS = 16
+
+def hilbertKeys(x, y, bits: int = HILBERT_BITS):
+    """
+    Position of each point along a Hilbert curve covering the bounding box of the points, on a grid of
+    2**bits x 2**bits cells. Points close on the curve are close in space.
+    """
+    side = 1 << bits
+    if len(x) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    def toCells(values):
+        valuesMin, valuesMax = values.min(), values.max()
+        if valuesMax <= valuesMin:
+            return np.zeros(len(values), dtype=np.int64)
+        return np.minimum(((values - valuesMin) / (valuesMax - valuesMin) * side).astype(np.int64), side - 1)
+
+    cellX, cellY = toCells(np.asarray(x, dtype=np.float64)), toCells(np.asarray(y, dtype=np.float64))
+    keys = np.zeros(len(cellX), dtype=np.int64)
+
+    s = side >> 1
+    while s > 0:
+        rx = (cellX & s) > 0
+        ry = (cellY & s) > 0
+        keys += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+
+        # Rotates the quadrant so the curve keeps its orientation at the next level
+        flip = ~ry & rx
+        cellX = np.where(flip, side - 1 - cellX, cellX)
+        cellY = np.where(flip, side - 1 - cellY, cellY)
+        swap = ~ry
+        cellX, cellY = np.where(swap, cellY, cellX), np.where(swap, cellX, cellY)
+        s >>= 1
+
+    return keys
+
+def visibilityOrder(offsets, x, y):
+    """Rows sorted by (visibility offset, Hilbert key), so a zoom level filter reads contiguous pages."""
+    return np.lexsort((hilbertKeys(x, y), offsets))
+
+def geoPackageLayer(destination: str):
+    """(path, layer name) of a GeoPackage destination, or None for other formats. The layer name may be None."""
+    parts = QgsProviderRegistry.instance().decodeUri('ogr', destination)
+    path = parts.get('path') or ''
+    if not path.lower().endswith('.gpkg'):
+        return None
+
+    return path, parts.get('layerName') or None
+
+def quotedIdentifier(name: str):
+    return '"' + name.replace('"', '""') + '"'
+
+def quotedLiteral(value: str):
+    return "'" + value.replace("'", "''") + "'"
+
+def indexGeoPackageLayer(path: str, layerName: str, attribute: str, feedback=None):
+    """
+    Creates a B-tree index on the attribute and, if the writer did not create one, the R-tree spatial index
+    of the layer, then refreshes the SQLite statistics used by the query planner.
+    """
+    dataset = gdal.OpenEx(path, gdal.OF_VECTOR | gdal.OF_UPDATE)
+    if dataset is None:
+        raise QgsProcessingException(f'Could not open {path} to create its indexes')
+
+    layer = dataset.GetLayerByName(layerName) if layerName else dataset.GetLayer(0)
+    table = layer.GetName()
+    geometryColumn = layer.GetGeometryColumn()
+
+    if feedback is not None:
+        feedback.pushInfo('Indexing {} of {}...'.format(attribute, table))
+
+    dataset.ExecuteSQL('CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(
+        quotedIdentifier(f'{table}_{attribute}_idx'), quotedIdentifier(table), quotedIdentifier(attribute)
+    ))
+
+    if geometryColumn:
+        result = dataset.ExecuteSQL('SELECT HasSpatialIndex({}, {})'.format(quotedLiteral(table), quotedLiteral(geometryColumn)))
+        hasSpatialIndex = result is not None and result.GetNextFeature().GetField(0) == 1
+        dataset.ReleaseResultSet(result)
+
+        if not hasSpatialIndex:
+            result = dataset.ExecuteSQL('SELECT CreateSpatialIndex({}, {})'.format(quotedLiteral(table), quotedLiteral(geometryColumn)))
+            dataset.ReleaseResultSet(result)
+
+    dataset.ExecuteSQL('ANALYZE')
+    dataset = None
\ No newline at end of file
@@ -0,0 +1,80 @@
+import math
+import numpy as np
+from osgeo import gdal
+from qgis.core import QgsRasterLayer, QgsRasterBandStats, QgsProcessingException
+from ..utils.cache import Cache
+
+STATISTICS_EXACT = 0
+STATISTICS_APPROXIMATE = 1
+
+# Pixels read by approximate statistics, from the smallest overview having that many pixels or a strided sample
+APPROXIMATE_PIXELS = 1024 * 1024
+
+# Shared by all algorithms and runs of the session. Keys include the modification time, so edited rasters are read again
+rasterStatisticsCache = Cache('Raster statistics', 64)
+
+def sampleSource(band):
+    """The smallest overview with at least APPROXIMATE_PIXELS pixels, or the band itself."""
+    source = band
+    for index in range(band.GetOverviewCount()):
+        overview = band.GetOverview(index)
+        pixels = overview.XSize * overview.YSize
+        if APPROXIMATE_PIXELS <= pixels < source.XSize * source.YSize:
+            source = overview
+
+    return source
+
+def approximateMinMax(band):
+    """
+    Min and max of about APPROXIMATE_PIXELS pixels, read from an overview when the raster has one and
+    otherwise sampled every few rows and columns of the full resolution.
+    """
+    source = sampleSource(band)
+    stride = max(1, math.sqrt(source.XSize * source.YSize / APPROXIMATE_PIXELS))
+    values = source.ReadAsArray(
+        0, 0, source.XSize, source.YSize,
+        buf_xsize=max(1, int(source.XSize / stride)),
+        buf_ysize=max(1, int(source.YSize / stride))
+    ).astype(np.float64)
+
+    noData = band.GetNoDataValue()
+    if noData is not None:
+        values[values == noData] = np.nan
+
+    if np.isnan(values).all():
+        raise QgsProcessingException('The raster sample only has nodata pixels, use exact statistics instead')
+
+    return float(np.nanmin(values)), float(np.nanmax(values))
+
+def computeMinMax(path: str, bandIndex: int, exact: bool):
+    dataset = gdal.Open(path, gdal.GA_ReadOnly)
+    if dataset is None:
+        raise QgsProcessingException(f'Could not open raster {path}')
+
+    band = dataset.GetRasterBand(bandIndex)
+    if not exact:
+        return approximateMinMax(band)
+
+    minimum, maximum = band.ComputeRasterMinMax(False)
+    return minimum, maximum
+
+def rasterMinMax(path: str, bandIndex: int = 1, exact: bool = True):
+    """
+    (min, max) of a raster band. Exact statistics read every pixel, approximate ones about a million of
+    them (see approximateMinMax). Results are cached by path, modification time, band and mode.
+    """
+    stat = gdal.VSIStatL(path)
+    if stat is None:
+        return computeMinMax(path, bandIndex, exact)
+
+    minMax = rasterStatisticsCache.cachedSection((path, stat.mtime, bandIndex, exact), lambda: computeMinMax(path, bandIndex, exact))
+    rasterStatisticsCache.logStats()
+    return minMax
+
+def layerMinMax(layer: QgsRasterLayer, exact: bool = True):
+    """rasterMinMax of the first band of a layer. Layers not read by GDAL are asked for their band statistics."""
+    if layer.providerType() == 'gdal':
+        return rasterMinMax(layer.source(), 1, exact)
+
+    stats = layer.dataProvider().bandStatistics(1, QgsRasterBandStats.Min | QgsRasterBandStats.Max, layer.extent(), 0 if exact else APPROXIMATE_PIXELS)
+    return stats.minimumValue, stats.maximumValue
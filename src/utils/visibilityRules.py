@@ -0,0 +1,128 @@
+import re
+from qgis.core import QgsVectorLayer, QgsExpression, QgsRuleBasedRenderer, QgsRuleBasedLabeling, QgsPalLayerSettings, QgsVectorLayerSimpleLabeling
+
+VISIBILITY_FUNCTION = 'visibilityByOffset'
+RANGE_RULE_DESCRIPTION = re.compile(r'Offset -?\d+ \(zoom \d+\+\)')
+
+def firstVisibleZoomLevel(minZoom: int, offset: int):
+    """First zoom level at which visibilityByOffset(minZoom, offset) is 1 (the function adds 1 to zoom_level)."""
+    return max(0, minZoom + offset - 1)
+
+def minimumScaleFromZoomLevel(scales: list[float], zoomLevel: int):
+    """
+    Most zoomed out scale at which a rule must be active to show from zoomLevel onwards: halfway between
+    the scales of zoomLevel - 1 and zoomLevel, the same boundary the zoom level selector uses (closest
+    scale). 0 means no limit.
+    """
+    if zoomLevel <= 0:
+        return 0
+
+    return (scales[zoomLevel - 1] + scales[zoomLevel]) / 2
+
+def distinctOffsets(layer: QgsVectorLayer, attribute: str):
+    """Sorted distinct integer values of the visibility attribute. NULLs are left out."""
+    offsets = set()
+    for value in layer.uniqueValues(layer.fields().indexFromName(attribute)):
+        try:
+            offsets.add(int(value))
+        except (TypeError, ValueError):
+            continue
+
+    return sorted(offsets)
+
+def visibilityRanges(layer: QgsVectorLayer, attribute: str, scales: list[float], minZoom: int):
+    """(offset, first visible zoom level, minimum scale) of every offset visible at some project scale."""
+    ranges = []
+    for offset in distinctOffsets(layer, attribute):
+        zoomLevel = firstVisibleZoomLevel(minZoom, offset)
+        if zoomLevel < len(scales):
+            ranges.append((offset, zoomLevel, minimumScaleFromZoomLevel(scales, zoomLevel)))
+
+    return ranges
+
+def disableVisibilityOverrides(properties):
+    """Deactivates data defined properties calling visibilityByOffset, as the rules filter the features instead."""
+    for key in properties.propertyKeys():
+        prop = properties.property(key)
+        if VISIBILITY_FUNCTION in (prop.expressionString() or ''):
+            prop.setActive(False)
+            properties.setProperty(key, prop)
+
+    return properties
+
+def disableSymbolVisibilityOverrides(symbol):
+    if symbol is None:
+        return
+
+    for symbolLayer in symbol.symbolLayers():
+        symbolLayer.setDataDefinedProperties(disableVisibilityOverrides(symbolLayer.dataDefinedProperties()))
+        disableSymbolVisibilityOverrides(symbolLayer.subSymbol())
+
+def rangeRuleDescription(offset: int, zoomLevel: int):
+    return f'Offset {offset} (zoom {zoomLevel}+)'
+
+def styleRuleChildren(rootRule):
+    """
+    Children of a root rule, except when they are the parent rules of a previous run (described by
+    rangeRuleDescription): then the rules under them, which hold the original style, so running again
+    does not nest the offset rules.
+    """
+    children = rootRule.children()
+    if len(children) > 0 and all(RANGE_RULE_DESCRIPTION.fullmatch(child.description() or '') for child in children):
+        return children[0].children()
+
+    return children
+
+def createRuleBasedRenderer(layer: QgsVectorLayer, attribute: str, ranges: list):
+    """
+    One parent rule per offset, filtering "attribute" = offset and active from its first visible zoom level,
+    each one holding a copy of the rules of the current renderer (converted to rules). Rules created by a
+    previous run are replaced, see styleRuleChildren.
+    """
+    styleRules = styleRuleChildren(QgsRuleBasedRenderer.convertFromRenderer(layer.renderer()).rootRule())
+    root = QgsRuleBasedRenderer.Rule(None)
+
+    for offset, zoomLevel, minimumScale in ranges:
+        # The scales of the Rule constructor are ints, the setters take the fractional scale between zoom levels
+        rangeRule = QgsRuleBasedRenderer.Rule(None)
+        rangeRule.setFilterExpression(QgsExpression.createFieldEqualityExpression(attribute, offset))
+        rangeRule.setMinimumScale(minimumScale)
+        rangeRule.setDescription(rangeRuleDescription(offset, zoomLevel))
+        for styleRule in styleRules:
+            rule = styleRule.clone()
+            for descendant in [rule] + rule.descendants():
+                disableSymbolVisibilityOverrides(descendant.symbol())
+
+            rangeRule.appendChild(rule)
+
+        root.appendChild(rangeRule)
+
+    return QgsRuleBasedRenderer(root)
+
+def createRuleBasedLabeling(layer: QgsVectorLayer, attribute: str, ranges: list):
+    """Same rules for the labels. Returns None when the layer has no simple or rule based labeling."""
+    labeling = layer.labeling()
+    if isinstance(labeling, QgsVectorLayerSimpleLabeling):
+        styleRules = [QgsRuleBasedLabeling.Rule(QgsPalLayerSettings(labeling.settings()))]
+    elif isinstance(labeling, QgsRuleBasedLabeling):
+        styleRules = styleRuleChildren(labeling.rootRule())
+    else:
+        return None
+
+    root = QgsRuleBasedLabeling.Rule(None)
+    for offset, zoomLevel, minimumScale in ranges:
+        rangeRule = QgsRuleBasedLabeling.Rule(None, 0, minimumScale, QgsExpression.createFieldEqualityExpression(attribute, offset), rangeRuleDescription(offset, zoomLevel))
+        for styleRule in styleRules:
+            rule = styleRule.clone()
+            for descendant in [rule] + rule.descendants():
+                settings = descendant.settings()
+                if settings is not None:
+                    settings = QgsPalLayerSettings(settings)
+                    settings.setDataDefinedProperties(disableVisibilityOverrides(settings.dataDefinedProperties()))
+                    descendant.setSettings(settings)
+
+            rangeRule.appendChild(rule)
+
+        root.appendChild(rangeRule)
+
+    return QgsRuleBasedLabeling(root)
\ No newline at end of file
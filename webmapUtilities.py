@@ -3,7 +3,7 @@
 import math
 import os.path
 
-from qgis.core import QgsProject, QgsExpressionContextUtils, QgsApplication
+from qgis.core import QgsProject, QgsApplication
 from qgis.gui import QgisInterface
 from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication
 from qgis.PyQt.QtGui import QIcon
@@ -13,6 +13,8 @@ from .resources import *
 from .src.utils.logUtils import info
 from .src.expressions.visibilityControlExpressions import *
 from .src.gui.eventListeners import EventListeners
+from .src.gui.zoomLevelScope import ZoomLevelScope
+from .src.gui.zoomSubsetFilter import ZoomSubsetFilter
 from .src.algorithms.shadedReliefCreator import ShadedReliefCreator
 from .src.algorithms.createGridVisualization import CreateGridVisualization
 from .src.algorithms.createClusteredVisualization import CreateClusteredVisualization
@@ -57,6 +59,7 @@ class WebmapUtilities:
         self.menu = '&Webmap Utilities'
         self.tagRequiredActions: list[QAction] = []
         self.zoomLevelComboWidget = None
+        self.zoomLevelScope = None
         self.provider = None
 
     def initProcessing(self):
@@ -140,8 +143,13 @@ class WebmapUtilities:
         self.toolbar.addSeparator()
         self.addZoomLevelWidget()
 
+        self.zoomLevelScope = ZoomLevelScope(self.iface.mapCanvas())
+        self.zoomLevelScope.update()
+
         QgsProject().instance().viewSettings().mapScalesChanged.connect(self.addZoomLevelWidget)
-        self.iface.mapCanvas().scaleChanged.connect(self.setZoomLevelVariable)
+        QgsProject().instance().viewSettings().mapScalesChanged.connect(self.zoomLevelScope.update)
+        self.iface.mapCanvas().scaleChanged.connect(self.zoomLevelScope.update)
+        self.iface.mapCanvas().scaleChanged.connect(self.updateZoomSubsetFilters)
         self.iface.layerTreeView().contextMenuAboutToShow.connect(self.contextMenuAboutToShow)
         self.iface.currentLayerChanged.connect(self.currentLayerChanged)
 
@@ -151,16 +159,18 @@ class WebmapUtilities:
         QgsApplication.processingRegistry().removeProvider(self.provider)
         self.iface.layerTreeView().contextMenuAboutToShow.disconnect(self.contextMenuAboutToShow)
         self.iface.currentLayerChanged.disconnect(self.currentLayerChanged)
+        self.iface.mapCanvas().scaleChanged.disconnect(self.zoomLevelScope.update)
+        self.iface.mapCanvas().scaleChanged.disconnect(self.updateZoomSubsetFilters)
+        QgsProject().instance().viewSettings().mapScalesChanged.disconnect(self.zoomLevelScope.update)
+        self.zoomLevelScope.remove()
 
         """Removes the plugin menu item and icon from QGIS GUI."""
         for action in self.actions:
             self.iface.removeToolBarIcon(action)
     
-    def setZoomLevelVariable(self, scale):
-        predefinedScales = QgsProject.instance().viewSettings().mapScales()
-        if predefinedScales is not None and predefinedScales.__len__() > 0:
-            targetScale = min(predefinedScales, key=lambda x:abs(x-scale))
-            QgsExpressionContextUtils.setGlobalVariable('zoomLevel', targetScale)
+    def updateZoomSubsetFilters(self, scale):
+        # Connected after the zoom level scope, so its zoom level is the one of this scale
+        ZoomSubsetFilter.applyToProject(self.zoomLevelScope.zoomLevel)
 
     def runConfigureProject(self):
         mercatorScales = [554678932,277339466,138669733,69334866,34667433,17333716,8666858,4333429,2166714,1083357,541678,270839,135419,67709,33854,16927,8463,4231,2115]
@@ -201,7 +211,6 @@ class WebmapUtilities:
             targetScale = min(predefinedScales, key=lambda x:abs(x-scale))
             zoomLevelComboIndex = predefinedScales.index(targetScale)
             self.zoomLevelComboWidget.setCurrentIndex(zoomLevelComboIndex)
-            QgsExpressionContextUtils.setGlobalVariable('zoomLevel', zoomLevelComboIndex)
 
     def updateScale(self, index):
         if index == None or index < 0: